@@ -0,0 +1,228 @@
+"""Precomputed perfect-play table for 3x3 Tic-Tac-Toe.
+
+Every reachable, unfinished position is reduced to a canonical form under
+the 8 symmetries of the board and stored with its best move and minimax
+score for the side to move. The table is small enough to keep on disk
+(a few KB) and turns AI move selection into a dictionary lookup.
+
+Usage:
+    python perfect_play_table.py --build     # (re)generate the table file
+    python perfect_play_table.py --verify    # cross-check every entry against minimax
+"""
+import argparse
+import os
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from tic_tac_toe_engine import CELLS, SIZE, TicTacToeEngine
+
+TABLE_MAGIC = b'TTTB'
+TABLE_VERSION = 1
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perfect_play.tbl')
+
+_HEADER = struct.Struct('<4sBH')   # magic, version, entry count
+_RECORD = struct.Struct('<IBb')    # canonical key, best cell, score
+
+
+def _symmetries() -> List[Tuple[int, ...]]:
+    """Cell permutations for the 4 rotations, each with and without a mirror."""
+    def rotate(cell):
+        r, c = divmod(cell, SIZE)
+        return c * SIZE + (SIZE - 1 - r)
+
+    def mirror(cell):
+        r, c = divmod(cell, SIZE)
+        return r * SIZE + (SIZE - 1 - c)
+
+    perms = []
+    perm = tuple(range(CELLS))
+    for _ in range(4):
+        perms.append(perm)
+        perms.append(tuple(mirror(p) for p in perm))
+        perm = tuple(rotate(p) for p in perm)
+    return perms
+
+
+SYMMETRIES = _symmetries()
+INVERSE_SYMMETRIES = [tuple(perm.index(c) for c in range(CELLS)) for perm in SYMMETRIES]
+
+# MASK_IMAGES[s][mask] is the 9-bit mask after applying symmetry s
+MASK_IMAGES = [
+    [sum(1 << perm[c] for c in range(CELLS) if mask >> c & 1) for mask in range(1 << CELLS)]
+    for perm in SYMMETRIES
+]
+
+
+def position_key(x_mask: int, o_mask: int) -> int:
+    return x_mask | o_mask << CELLS
+
+
+def canonicalize(x_mask: int, o_mask: int) -> Tuple[int, int]:
+    """Return (canonical key, symmetry index that maps the position onto it)."""
+    best_key, best_sym = None, 0
+    for sym, images in enumerate(MASK_IMAGES):
+        key = images[x_mask] | images[o_mask] << CELLS
+        if best_key is None or key < best_key:
+            best_key, best_sym = key, sym
+    return best_key, best_sym
+
+
+def side_to_move(x_mask: int, o_mask: int) -> int:
+    # X (player 1) always opens, so equal stone counts mean X is to move
+    return 1 if bin(x_mask).count('1') == bin(o_mask).count('1') else 2
+
+
+def _engine_for(key: int, player: int) -> TicTacToeEngine:
+    engine = TicTacToeEngine(ai_player=player, human_player=3 - player)
+    for cell in range(CELLS):
+        if key >> cell & 1:
+            engine.make_move(cell, 1)
+        elif key >> (cell + CELLS) & 1:
+            engine.make_move(cell, 2)
+    return engine
+
+
+class PerfectPlayTable:
+    def __init__(self, path: Optional[str] = DEFAULT_TABLE_PATH):
+        self.path = path
+        self.entries: Dict[int, Tuple[int, int]] = {}
+        self.loaded = False
+        if path and os.path.exists(path):
+            self.loaded = self.load(path)
+
+    def build(self):
+        """Solve every reachable canonical position with the engine's minimax."""
+        entries = {}
+        seen = set()
+        engine = TicTacToeEngine()
+
+        def walk(player):
+            key, _ = canonicalize(engine.masks[1], engine.masks[2])
+            if key in seen:
+                return
+            seen.add(key)
+            if engine.check_winner() or engine.is_board_full():
+                return
+            entries[key] = self._solve(key, player)
+            for cell in range(CELLS):
+                if not engine.occupied >> cell & 1:
+                    engine.make_move(cell, player)
+                    walk(3 - player)
+                    engine.undo_move(cell, player)
+
+        walk(1)
+        self.entries = entries
+        self.loaded = True
+
+    @staticmethod
+    def _solve(key: int, player: int) -> Tuple[int, int]:
+        score, move = _engine_for(key, player).minimax(0, float('-inf'), float('inf'), True)
+        row, col = move
+        return row * SIZE + col, int(score)
+
+    def save(self, path: Optional[str] = None):
+        path = path or self.path
+        data = [_HEADER.pack(TABLE_MAGIC, TABLE_VERSION, len(self.entries))]
+        for key in sorted(self.entries):
+            cell, score = self.entries[key]
+            data.append(_RECORD.pack(key, cell, score))
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(b''.join(data))
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> bool:
+        """Load a table file; returns False if it is missing, corrupt or from another version."""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            magic, version, count = _HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return False
+        if magic != TABLE_MAGIC or version != TABLE_VERSION:
+            return False
+        if len(data) != _HEADER.size + count * _RECORD.size:
+            return False
+        entries = {}
+        for key, cell, score in _RECORD.iter_unpack(data[_HEADER.size:]):
+            entries[key] = (cell, score)
+        self.entries = entries
+        return True
+
+    def ensure_loaded(self):
+        if self.loaded:
+            return
+        self.build()
+        if self.path:
+            try:
+                self.save()
+            except OSError:
+                pass  # read-only install: keep the in-memory table
+
+    def lookup(self, x_mask: int, o_mask: int) -> Optional[Tuple[int, int]]:
+        """Best cell and score for the side to move, or None for finished positions."""
+        self.ensure_loaded()
+        key, sym = canonicalize(x_mask, o_mask)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        cell, score = entry
+        return INVERSE_SYMMETRIES[sym][cell], score
+
+    def best_move(self, engine: TicTacToeEngine) -> Optional[Tuple[int, int]]:
+        entry = self.lookup(engine.masks[1], engine.masks[2])
+        if engine.stats is not None:
+            if entry is None:
+                engine.stats.table_misses += 1
+            else:
+                engine.stats.table_hits += 1
+        if entry is None:
+            return None
+        return divmod(entry[0], SIZE)
+
+    def verify(self) -> List[str]:
+        """Re-solve every entry with minimax; returns a description of each mismatch."""
+        self.ensure_loaded()
+        errors = []
+        for key, (cell, score) in sorted(self.entries.items()):
+            player = side_to_move(key & ((1 << CELLS) - 1), key >> CELLS)
+            _, expected = self._solve(key, player)
+            if score != expected:
+                errors.append(f"key {key}: score {score}, minimax {expected}")
+                continue
+
+            engine = _engine_for(key, player)
+            if engine.occupied >> cell & 1:
+                errors.append(f"key {key}: cell {cell} is occupied")
+                continue
+            engine.make_move(cell, player)
+            # minimax scores a won position on entry, so a winning cell needs no special case
+            move_score, _ = engine.minimax(1, float('-inf'), float('inf'), False)
+            if move_score != score:
+                errors.append(f"key {key}: cell {cell} scores {move_score}, expected {score}")
+        return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or verify the perfect-play table.")
+    parser.add_argument('--path', default=DEFAULT_TABLE_PATH, help="table file location")
+    parser.add_argument('--build', action='store_true', help="regenerate the table file")
+    parser.add_argument('--verify', action='store_true', help="cross-check every entry against minimax")
+    args = parser.parse_args()
+
+    table = PerfectPlayTable(None if args.build else args.path)
+    if args.build:
+        table.build()
+        table.save(args.path)
+        print(f"Wrote {len(table.entries)} positions to {args.path}")
+    if args.verify:
+        errors = table.verify()
+        for error in errors:
+            print(error)
+        print(f"Verified {len(table.entries)} positions: {len(errors)} mismatches")
+        if errors:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
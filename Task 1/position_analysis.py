@@ -0,0 +1,284 @@
+"""Batched position analysis for labelling Tic-Tac-Toe positions offline.
+
+Feeds any number of boards through the engine and streams back, for each
+one, the score and best move for the side to move. Positions are read and
+answered in fixed-size batches; within a batch they are deduplicated by
+canonical form under the board's symmetries and the unique ones are solved
+on a process pool. A bounded cache carries solved positions across batches,
+so memory stays flat however long the input is.
+
+Accepted position formats:
+    "XO.|.X.|..O"      a string of X/O/. (or 1/2/0); '|', '/' and spaces are ignored
+    [[1, 2, 0], ...]   nested or flat sequences of 0/1/2, including NumPy rows
+    88                 a base-3 integer, cell i being digit i (0 empty, 1 X, 2 O)
+
+On the command line a line of digits is read as a base-3 integer, unless it
+has exactly one 0/1/2 digit per cell, in which case it is read as the cells.
+
+Scores are from the side to move's point of view: +/-(10 - plies to the
+result) on 3x3, search scores (see tic_tac_toe_engine.MATE_SCORE) on larger boards.
+
+Usage:
+    python position_analysis.py boards.txt --output labels.jsonl
+    cat boards.txt | python position_analysis.py - --workers 8
+"""
+import argparse
+import json
+import multiprocessing
+import numbers
+import sys
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from tic_tac_toe_engine import CELLS, DEFAULT_TIME_BUDGET_MS, SIZE, TicTacToeEngine
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_CACHE_SIZE = 100000
+
+_CELL_CODES = {'.': 0, '0': 0, '-': 0, '_': 0, 'X': 1, 'x': 1, '1': 1, 'O': 2, 'o': 2, '2': 2}
+
+
+class BoardConfig(NamedTuple):
+    rows: int = SIZE
+    cols: int = SIZE
+    win_length: int = SIZE
+    budget_ms: float = DEFAULT_TIME_BUDGET_MS  # only used on boards larger than 3x3
+
+
+class AnalysisResult(NamedTuple):
+    index: int
+    board: str                      # normalised X/O/. string, row-major
+    status: str                     # 'ok', 'finished' or 'invalid'
+    to_move: Optional[int]          # 1 for X, 2 for O
+    score: Optional[float]
+    best_move: Optional[Tuple[int, int]]
+
+    def to_dict(self) -> Dict:
+        return {
+            'index': self.index,
+            'board': self.board,
+            'status': self.status,
+            'to_move': {1: 'X', 2: 'O'}.get(self.to_move),
+            'score': self.score,
+            'best_move': list(self.best_move) if self.best_move else None,
+        }
+
+
+@lru_cache(maxsize=None)
+def board_symmetries(rows: int, cols: int) -> Tuple[Tuple[int, ...], ...]:
+    """Cell permutations preserving the board: 8 on a square board, 4 otherwise."""
+    def cell(r, c):
+        return r * cols + c
+
+    maps = [
+        lambda r, c: (r, c),
+        lambda r, c: (r, cols - 1 - c),
+        lambda r, c: (rows - 1 - r, c),
+        lambda r, c: (rows - 1 - r, cols - 1 - c),
+    ]
+    if rows == cols:
+        maps += [
+            lambda r, c: (c, r),
+            lambda r, c: (c, rows - 1 - r),
+            lambda r, c: (cols - 1 - c, r),
+            lambda r, c: (cols - 1 - c, rows - 1 - r),
+        ]
+    return tuple(tuple(cell(*m(*divmod(i, cols))) for i in range(rows * cols)) for m in maps)
+
+
+def _permute(mask: int, perm: Tuple[int, ...]) -> int:
+    image = 0
+    while mask:
+        bit = mask & -mask
+        mask ^= bit
+        image |= 1 << perm[bit.bit_length() - 1]
+    return image
+
+
+def canonical_form(x_mask: int, o_mask: int, rows: int, cols: int) -> Tuple[Tuple[int, int], int]:
+    """Return ((x, o) of the canonical orientation, index of the symmetry that produced it)."""
+    best, best_sym = None, 0
+    for sym, perm in enumerate(board_symmetries(rows, cols)):
+        image = (_permute(x_mask, perm), _permute(o_mask, perm))
+        if best is None or image < best:
+            best, best_sym = image, sym
+    return best, best_sym
+
+
+def parse_position(position, cells: int) -> Tuple[int, int]:
+    """Decode one position in any accepted format into (x_mask, o_mask)."""
+    if isinstance(position, numbers.Integral):
+        values, code = [], int(position)
+        for _ in range(cells):
+            code, digit = divmod(code, 3)
+            values.append(digit)
+        if code:
+            raise ValueError(f"code {position} does not fit {cells} cells")
+    elif isinstance(position, str):
+        values = [_CELL_CODES[ch] for ch in position if ch not in '|/ \t\r\n']
+    else:
+        if hasattr(position, 'ravel'):  # NumPy arrays
+            position = position.ravel().tolist()
+        values = []
+        for item in position:
+            if isinstance(item, (list, tuple)):
+                values.extend(item)
+            else:
+                values.append(item)
+    if len(values) != cells:
+        raise ValueError(f"expected {cells} cells, got {len(values)}")
+
+    x_mask = o_mask = 0
+    for cell, value in enumerate(values):
+        if value == 1:
+            x_mask |= 1 << cell
+        elif value == 2:
+            o_mask |= 1 << cell
+        elif value != 0:
+            raise ValueError(f"bad cell value {value!r}")
+    return x_mask, o_mask
+
+
+def _read_line(line: str, cells: int):
+    """A stripped input line as a position: digit-only lines are base-3 codes unless they spell out every cell."""
+    if line.isdigit() and not (len(line) == cells and set(line) <= set('012')):
+        return int(line)
+    return line
+
+
+def format_board(x_mask: int, o_mask: int, config: BoardConfig) -> str:
+    chars = ['X' if x_mask >> i & 1 else 'O' if o_mask >> i & 1 else '.' for i in range(config.rows * config.cols)]
+    return '|'.join(''.join(chars[r * config.cols:(r + 1) * config.cols]) for r in range(config.rows))
+
+
+_engines: Dict[BoardConfig, TicTacToeEngine] = {}
+
+
+def solve_position(config: BoardConfig, x_mask: int, o_mask: int) -> Tuple[str, Optional[int], Optional[float], Optional[int]]:
+    """Return (status, side to move, score, best cell) for one position."""
+    engine = _engines.get(config)
+    if engine is None:
+        engine = _engines[config] = TicTacToeEngine(rows=config.rows, cols=config.cols, win_length=config.win_length)
+
+    x_count, o_count = bin(x_mask).count('1'), bin(o_mask).count('1')
+    if x_mask & o_mask or not 0 <= x_count - o_count <= 1:
+        return 'invalid', None, None, None
+    player = 1 if x_count == o_count else 2
+    engine.load_position(x_mask, o_mask)
+    winner = engine.check_winner()
+    if winner or engine.is_board_full():
+        return 'finished', player, None, None
+
+    engine.ai_player, engine.human_player = player, 3 - player
+    if engine.cells <= CELLS:
+        score, move = engine.minimax(0, float('-inf'), float('inf'), True)
+    else:
+        result = engine.search(config.budget_ms)
+        score, move = result.score, result.move
+    cell = move[0] * engine.cols + move[1] if move else None
+    return 'ok', player, score, cell
+
+
+def _solve(job):
+    return solve_position(*job)
+
+
+def _batches(items: Iterable, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def analyze_positions(positions: Iterable, config: BoardConfig = BoardConfig(), workers: int = 1,
+                      batch_size: int = DEFAULT_BATCH_SIZE, cache_size: int = DEFAULT_CACHE_SIZE) -> Iterator[AnalysisResult]:
+    """Stream an AnalysisResult for every input position, in input order."""
+    cells = config.rows * config.cols
+    symmetries = board_symmetries(config.rows, config.cols)
+    inverses = [tuple(perm.index(c) for c in range(cells)) for perm in symmetries]
+    cache: 'OrderedDict[Tuple[int, int], tuple]' = OrderedDict()
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+
+    try:
+        index = 0
+        for batch in _batches(positions, batch_size):
+            parsed = []
+            pending: Dict[Tuple[int, int], None] = {}
+            for position in batch:
+                try:
+                    x_mask, o_mask = parse_position(position, cells)
+                except (KeyError, ValueError, TypeError):
+                    parsed.append(position if isinstance(position, str) else '')
+                    continue
+                canonical, sym = canonical_form(x_mask, o_mask, config.rows, config.cols)
+                parsed.append((x_mask, o_mask, canonical, sym))
+                if canonical in cache:
+                    cache.move_to_end(canonical)
+                else:
+                    pending[canonical] = None
+
+            jobs = [(config, x, o) for x, o in pending]
+            if pool is not None:
+                solved = pool.imap(_solve, jobs, chunksize=max(1, len(jobs) // (workers * 4)))
+            else:
+                solved = map(_solve, jobs)
+            batch_results = dict(zip(pending, solved))
+
+            for entry in parsed:
+                if isinstance(entry, str):
+                    yield AnalysisResult(index, entry, 'invalid', None, None, None)
+                    index += 1
+                    continue
+                x_mask, o_mask, canonical, sym = entry
+                status, player, score, cell = batch_results.get(canonical) or cache[canonical]
+                move = divmod(inverses[sym][cell], config.cols) if cell is not None else None
+                yield AnalysisResult(index, format_board(x_mask, o_mask, config), status, player, score, move)
+                index += 1
+
+            for canonical, solution in batch_results.items():
+                cache[canonical] = solution
+            while len(cache) > cache_size:
+                cache.popitem(last=False)
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score Tic-Tac-Toe positions in bulk.")
+    parser.add_argument('input', help="file with one position per line, or '-' for stdin")
+    parser.add_argument('--output', help="write JSON lines here instead of stdout")
+    parser.add_argument('--rows', type=int, default=SIZE)
+    parser.add_argument('--cols', type=int, default=SIZE)
+    parser.add_argument('--win-length', type=int, default=SIZE)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_TIME_BUDGET_MS,
+                        help="per-position search budget on boards larger than 3x3")
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE)
+    args = parser.parse_args()
+
+    config = BoardConfig(args.rows, args.cols, args.win_length, args.budget_ms)
+    source = sys.stdin if args.input == '-' else open(args.input)
+    sink = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        cells = config.rows * config.cols
+        lines = (line.strip() for line in source)
+        positions = (_read_line(line, cells) for line in lines if line)
+        for result in analyze_positions(positions, config, max(1, args.workers),
+                                        args.batch_size, args.cache_size):
+            sink.write(json.dumps(result.to_dict()) + '\n')
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Opt-in search instrumentation for the Tic-Tac-Toe engine.
+
+Attach a SearchStats to an engine (`engine.stats = SearchStats()`) and the
+search fills in node counts, cutoffs per depth, terminal and horizon
+evaluations, cache hits and a per-move latency histogram. With `stats` left
+at None the engine only pays for one `is None` test per node.
+"""
+import json
+from typing import Dict, List
+
+# Upper bounds (ms) of the latency histogram buckets; the last one catches the rest
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+
+class SearchStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.moves = 0
+        self.nodes = 0
+        self.terminal_evals = 0      # wins and full boards reached by the search
+        self.horizon_evals = 0       # heuristic evaluations at the depth limit
+        self.nodes_by_depth: List[int] = []
+        self.cutoffs_by_depth: List[int] = []
+        self.tt_probes = 0
+        self.tt_hits = 0             # a stored entry was found
+        self.tt_cutoffs = 0          # ... and its bound answered the node outright
+        self.table_hits = 0          # perfect-play table lookups
+        self.table_misses = 0
+        self.latency_counts = [0] * len(LATENCY_BUCKETS_MS)
+        self.latency_total_ms = 0.0
+        self.latency_max_ms = 0.0
+        self.last_move: Dict = {}
+        self._move_start_nodes = 0
+
+    def begin_move(self, max_depth: int):
+        """Make room for `max_depth` plies and remember where this move's counts start."""
+        missing = max_depth + 1 - len(self.nodes_by_depth)
+        if missing > 0:
+            self.nodes_by_depth.extend([0] * missing)
+            self.cutoffs_by_depth.extend([0] * missing)
+        self._move_start_nodes = self.nodes
+
+    def record_move(self, elapsed_ms: float, **details):
+        self.moves += 1
+        self.latency_total_ms += elapsed_ms
+        self.latency_max_ms = max(self.latency_max_ms, elapsed_ms)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.latency_counts[i] += 1
+                break
+        self.last_move = dict(details, elapsed_ms=elapsed_ms, nodes=self.nodes - self._move_start_nodes)
+
+    def to_dict(self) -> Dict:
+        return {
+            'moves': self.moves,
+            'nodes': self.nodes,
+            'terminal_evals': self.terminal_evals,
+            'horizon_evals': self.horizon_evals,
+            'nodes_by_depth': list(self.nodes_by_depth),
+            'cutoffs_by_depth': list(self.cutoffs_by_depth),
+            'tt': {'probes': self.tt_probes, 'hits': self.tt_hits, 'cutoffs': self.tt_cutoffs},
+            'table': {'hits': self.table_hits, 'misses': self.table_misses},
+            'latency_ms': {
+                'buckets': [{'le': 'inf' if b == float('inf') else b, 'count': c}
+                            for b, c in zip(LATENCY_BUCKETS_MS, self.latency_counts)],
+                'total': self.latency_total_ms,
+                'max': self.latency_max_ms,
+                'mean': self.latency_total_ms / self.moves if self.moves else 0.0,
+            },
+            'last_move': dict(self.last_move),
+        }
+
+    def to_json(self, indent: int = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def dump(self, path: str):
+        with open(path, 'w') as f:
+            f.write(self.to_json())
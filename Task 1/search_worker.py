@@ -0,0 +1,200 @@
+"""Long-lived background search for the Tic-Tac-Toe AI.
+
+One worker thread owns its own engine (and so its own transposition table)
+for the whole session. Move requests can be cancelled, and while the human
+is thinking the worker ponders: it searches the replies to the human's most
+likely moves so that, after the click, the answer is usually already known.
+
+Positions are passed around as (x_mask, o_mask) pairs, i.e. the engine's
+`masks[1]` and `masks[2]`.
+"""
+import itertools
+import logging
+import queue
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from tic_tac_toe_engine import CELLS, TicTacToeEngine
+
+logger = logging.getLogger(__name__)
+
+Move = Tuple[int, int]
+Position = Tuple[int, int]
+
+MOVE_PRIORITY = 0
+PONDER_PRIORITY = 1
+MAX_PONDER_MOVES = 8
+
+
+class CancellationToken:
+    """Cancels one search; also usable as the engine's `stop_event`."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+class _Job:
+    __slots__ = ('position', 'token', 'callback')
+
+    def __init__(self, position: Position, token: CancellationToken, callback: Optional[Callable[[Move], None]]):
+        self.position = position
+        self.token = token
+        self.callback = callback  # None while the job is only a ponder
+
+
+def default_choose_move(engine: TicTacToeEngine, token: CancellationToken) -> Optional[Move]:
+    if engine.cells <= CELLS:
+        return engine.get_ai_move()
+    return engine.search(stop_event=token).move
+
+
+class SearchWorker:
+    def __init__(self, engine: TicTacToeEngine,
+                 choose_move: Callable[[TicTacToeEngine, CancellationToken], Optional[Move]] = default_choose_move,
+                 max_ponder_moves: int = MAX_PONDER_MOVES):
+        # The worker searches on its own copy of the board geometry; `planner`
+        # is used on the caller's thread to pick which replies to ponder.
+        self.engine = TicTacToeEngine(engine.ai_player, engine.human_player,
+                                      rows=engine.rows, cols=engine.cols, win_length=engine.win_length)
+        self.planner = TicTacToeEngine(engine.ai_player, engine.human_player,
+                                       rows=engine.rows, cols=engine.cols, win_length=engine.win_length)
+        self.choose_move = choose_move
+        self.max_ponder_moves = max_ponder_moves
+
+        self._lock = threading.Lock()
+        self._queue: 'queue.PriorityQueue' = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._pondering: Dict[Position, _Job] = {}
+        self._ponder_results: Dict[Position, Optional[Move]] = {}
+        self.ponder_hits = 0
+        self.errors = 0
+        self._current: Optional[_Job] = None
+
+        self._thread = threading.Thread(target=self._run, name="search-worker", daemon=True)
+        self._thread.start()
+
+    def request_move(self, x_mask: int, o_mask: int, callback: Callable[[Move], None]) -> CancellationToken:
+        """Ask for the AI's move in this position.
+
+        `callback(move)` runs on the worker thread, or straight away on the
+        caller's thread when pondering already produced the answer. If the
+        search fails the callback still runs, with a legal fallback move.
+        """
+        position = (x_mask, o_mask)
+        with self._lock:
+            if position in self._ponder_results:
+                self.ponder_hits += 1
+                move = self._ponder_results[position]
+                job = None
+            else:
+                job = self._pondering.pop(position, None)
+                if job is not None and not job.token.cancelled:
+                    job.callback = callback  # the guessed position came up: keep searching it
+                else:
+                    job = _Job(position, CancellationToken(), callback)
+                    self._queue.put((MOVE_PRIORITY, next(self._seq), job))
+            self._cancel_ponder_locked()
+
+        if job is None:
+            token = CancellationToken()
+            callback(move)
+            return token
+        return job.token
+
+    def ponder(self, x_mask: int, o_mask: int):
+        """Speculatively search the AI's reply to the human's most likely moves."""
+        planner = self.planner
+        human = planner.human_player
+        planner.load_position(x_mask, o_mask)
+        if planner.check_winner() or planner.is_board_full():
+            return
+
+        with self._lock:
+            self._cancel_ponder_locked()
+            self._ponder_results.clear()
+            for cell in planner.candidate_moves()[:self.max_ponder_moves]:
+                planner.make_move(cell, human)
+                finished = planner.check_winner() or planner.is_board_full()
+                position = (planner.masks[1], planner.masks[2])
+                planner.undo_move(cell, human)
+                if finished:
+                    continue
+                job = _Job(position, CancellationToken(), None)
+                self._pondering[position] = job
+                self._queue.put((PONDER_PRIORITY, next(self._seq), job))
+
+    def cancel_all(self):
+        """Drop every pending and running search, e.g. when a new game starts."""
+        with self._lock:
+            self._cancel_ponder_locked()
+            self._ponder_results.clear()
+            pending = []
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for _, _, job in pending:
+                if job is not None:
+                    job.token.cancel()
+            if self._current is not None:
+                self._current.token.cancel()
+
+    def shutdown(self):
+        self.cancel_all()
+        self._queue.put((MOVE_PRIORITY - 1, next(self._seq), None))
+        self._thread.join()
+
+    def _cancel_ponder_locked(self):
+        for job in self._pondering.values():
+            job.token.cancel()
+        self._pondering.clear()
+
+    def _run(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.token.cancelled:
+                    continue
+                self._current = job
+            self.engine.load_position(*job.position)
+            failed = False
+            try:
+                move = self.choose_move(self.engine, job.token)
+            except Exception:
+                # An exception must not end the thread: the caller is waiting for a move
+                logger.exception("Search failed in position %r", job.position)
+                failed = True
+                move = self._fallback_move(job.position)
+            self._current = None
+
+            with self._lock:
+                if failed:
+                    self.errors += 1
+                if job.token.cancelled:
+                    continue
+                callback = job.callback
+                if callback is None:
+                    if not failed:  # a fallback is no answer to keep for later
+                        self._ponder_results[job.position] = move
+                    self._pondering.pop(job.position, None)
+            if callback is not None:
+                callback(move)
+
+    def _fallback_move(self, position: Position) -> Optional[Move]:
+        engine = self.engine
+        engine.load_position(*position)
+        moves = engine.candidate_moves()
+        return divmod(moves[0], engine.cols) if moves else None
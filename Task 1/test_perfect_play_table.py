@@ -0,0 +1,108 @@
+"""The perfect-play table: building, the on-disk format and --verify."""
+import sys
+
+import pytest
+
+import perfect_play_table
+from perfect_play_table import CELLS, SYMMETRIES, PerfectPlayTable, canonicalize, side_to_move
+from tic_tac_toe_engine import TicTacToeEngine
+
+
+@pytest.fixture(scope='module')
+def built_table(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('table') / 'perfect_play.tbl')
+    table = PerfectPlayTable(None)
+    table.build()
+    table.save(path)
+    return path, table
+
+
+def test_build_covers_every_canonical_position(built_table):
+    _, table = built_table
+    # 4520 unfinished reachable positions fall into 627 symmetry classes
+    assert len(table.entries) == 627
+
+
+def test_save_and_load_round_trip(built_table):
+    path, table = built_table
+    loaded = PerfectPlayTable(path)
+    assert loaded.loaded
+    assert loaded.entries == table.entries
+
+
+def test_verify_finds_no_mismatches(built_table):
+    path, _ = built_table
+    assert PerfectPlayTable(path).verify() == []
+
+
+def test_verify_reports_a_corrupted_entry(built_table):
+    path, _ = built_table
+    corrupted = PerfectPlayTable(path)
+    key = min(corrupted.entries)
+    cell, score = corrupted.entries[key]
+    corrupted.entries[key] = (cell, score - 1)
+    errors = corrupted.verify()
+    assert len(errors) == 1 and errors[0].startswith(f"key {key}:")
+
+
+def test_verify_command_line(built_table, monkeypatch, capsys):
+    path, _ = built_table
+    monkeypatch.setattr(sys, 'argv', ['perfect_play_table.py', '--path', path, '--verify'])
+    perfect_play_table.main()
+    assert "Verified 627 positions: 0 mismatches" in capsys.readouterr().out
+
+
+def test_load_rejects_truncated_file(built_table, tmp_path):
+    path, _ = built_table
+    with open(path, 'rb') as f:
+        data = f.read()
+    broken = tmp_path / 'broken.tbl'
+    broken.write_bytes(data[:-1])
+    assert not PerfectPlayTable(str(broken)).loaded
+
+
+def test_lookup_matches_minimax_under_every_symmetry(built_table):
+    path, _ = built_table
+    table = PerfectPlayTable(path)
+    for key, (cell, score) in table.entries.items():
+        x_mask, o_mask = key & ((1 << CELLS) - 1), key >> CELLS
+        player = side_to_move(x_mask, o_mask)
+        for perm in SYMMETRIES:
+            x = sum(1 << perm[c] for c in range(CELLS) if x_mask >> c & 1)
+            o = sum(1 << perm[c] for c in range(CELLS) if o_mask >> c & 1)
+            assert canonicalize(x, o)[0] == key
+            move, move_score = table.lookup(x, o)
+            assert move_score == score
+            assert not (x | o) >> move & 1
+            # The looked-up move is as good as the one minimax picks here
+            engine = TicTacToeEngine(ai_player=player, human_player=3 - player)
+            engine.load_position(x, o)
+            expected, _ = engine.minimax(0, float('-inf'), float('inf'), True)
+            assert move_score == expected
+
+
+def test_search_agrees_with_table_on_the_classic_board(built_table):
+    # The generalised depth-limited search must solve 3x3 to the same result
+    path, _ = built_table
+    table = PerfectPlayTable(path)
+    for key, (_, score) in table.entries.items():
+        x_mask, o_mask = key & ((1 << CELLS) - 1), key >> CELLS
+        player = side_to_move(x_mask, o_mask)
+        engine = TicTacToeEngine(ai_player=player, human_player=3 - player)
+        engine.load_position(x_mask, o_mask)
+        result = engine.search(time_budget_ms=None)
+        assert (result.score > 0) - (result.score < 0) == (score > 0) - (score < 0), key
+
+
+def test_verify_follows_the_engine_scoring(monkeypatch):
+    # Nothing in the table or its check may assume the classic +/-10 scores
+    class RescoredEngine(TicTacToeEngine):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.win_score = 100
+
+    monkeypatch.setattr(perfect_play_table, 'TicTacToeEngine', RescoredEngine)
+    table = PerfectPlayTable(None)
+    table.build()
+    assert max(score for _, score in table.entries.values()) == 99
+    assert table.verify() == []
@@ -0,0 +1,152 @@
+"""Batched position analysis: input formats, deduplication and batching."""
+import json
+import sys
+
+import pytest
+
+import position_analysis
+from position_analysis import BoardConfig, analyze_positions, board_symmetries, canonical_form, parse_position
+from tic_tac_toe_engine import TicTacToeEngine
+
+# X in the top-left corner and the centre, O top middle: O to move
+BOARD = 'XO.|.X.|...'
+MASKS = (0b000010001, 0b000000010)
+
+
+@pytest.mark.parametrize('position', [
+    BOARD,
+    'xo./.x./...',
+    'X O .  . X .  . . .',
+    '120010000',
+    [[1, 2, 0], [0, 1, 0], [0, 0, 0]],
+    [1, 2, 0, 0, 1, 0, 0, 0, 0],
+    ((1, 2, 0), (0, 1, 0), (0, 0, 0)),
+    1 + 2 * 3 + 1 * 3 ** 4,
+])
+def test_parse_every_format(position):
+    assert parse_position(position, 9) == MASKS
+
+
+def test_parse_numpy_rows():
+    np = pytest.importorskip('numpy')
+    assert parse_position(np.array([[1, 2, 0], [0, 1, 0], [0, 0, 0]]), 9) == MASKS
+
+
+@pytest.mark.parametrize('position, error', [
+    ('XO.|.X.', ValueError),
+    ('XO.|.X.|..Z', KeyError),
+    ([1, 2, 3, 0, 0, 0, 0, 0, 0], ValueError),
+    (3 ** 9, ValueError),
+])
+def test_parse_rejects_bad_positions(position, error):
+    with pytest.raises(error):
+        parse_position(position, 9)
+
+
+def test_canonical_form_is_shared_by_every_symmetry():
+    x_mask, o_mask = MASKS
+    canonical, _ = canonical_form(x_mask, o_mask, 3, 3)
+    for perm in board_symmetries(3, 3):
+        x = sum(1 << perm[c] for c in range(9) if x_mask >> c & 1)
+        o = sum(1 << perm[c] for c in range(9) if o_mask >> c & 1)
+        assert canonical_form(x, o, 3, 3)[0] == canonical
+    assert len(board_symmetries(3, 4)) == 4
+
+
+def minimax_score(x_mask, o_mask):
+    engine = TicTacToeEngine()
+    engine.load_position(x_mask, o_mask)
+    player = 1 if bin(x_mask).count('1') == bin(o_mask).count('1') else 2
+    engine.ai_player, engine.human_player = player, 3 - player
+    return engine.minimax(0, float('-inf'), float('inf'), True)[0]
+
+
+def parent_score(child_score):
+    """A child position's score seen from the side that moved into it"""
+    return -(child_score - (child_score > 0) + (child_score < 0))
+
+
+@pytest.fixture
+def solves(monkeypatch):
+    """Counts the positions actually handed to the solver"""
+    solved = []
+    solve = position_analysis._solve
+
+    def counting_solve(job):
+        solved.append(job[1:])
+        return solve(job)
+
+    monkeypatch.setattr(position_analysis, '_solve', counting_solve)
+    return solved
+
+
+def test_symmetric_positions_are_solved_once(solves):
+    x_mask, o_mask = MASKS
+    variants = []
+    for perm in board_symmetries(3, 3):
+        x = sum(1 << perm[c] for c in range(9) if x_mask >> c & 1)
+        o = sum(1 << perm[c] for c in range(9) if o_mask >> c & 1)
+        variants.append((x, o))
+    positions = [[1 if x >> c & 1 else 2 if o >> c & 1 else 0 for c in range(9)] for x, o in variants]
+
+    results = list(analyze_positions(positions))
+    assert len(solves) == 1
+    assert [r.index for r in results] == list(range(8))
+    expected = minimax_score(x_mask, o_mask)
+    for (x, o), result in zip(variants, results):
+        assert result.status == 'ok' and result.to_move == 2 and result.score == expected
+        # Each best move is mapped back onto its own orientation
+        row, col = result.best_move
+        cell = row * 3 + col
+        assert not (x | o) >> cell & 1
+        assert parent_score(minimax_score(x, o | 1 << cell)) == expected
+
+
+def test_statuses():
+    results = list(analyze_positions(['...|...|...', 'XXX|OO.|...', 'XX.|...|...', 'XO.|.X.', 'OO.|X..|...']))
+    assert [r.status for r in results] == ['ok', 'finished', 'invalid', 'invalid', 'invalid']
+    assert results[0].to_move == 1 and results[0].score == 0
+    assert results[1].to_move == 2 and results[1].best_move is None
+    assert results[3].board == 'XO.|.X.'
+
+
+def test_cache_spans_batches_and_stays_bounded(solves):
+    boards = ['...|...|...', BOARD, '...|...|...', 'X..|...|...', BOARD, '...|...|...']
+    results = list(analyze_positions(boards, batch_size=2, cache_size=1))
+    assert [r.board for r in results] == boards
+    empty = (0, 0)
+    board, corner = canonical_form(*MASKS, 3, 3)[0], canonical_form(1, 0, 3, 3)[0]
+    # Only the last position solved outlives its batch
+    assert solves == [empty, board, empty, corner, board, empty]
+
+    solves.clear()
+    assert [r.to_dict() for r in analyze_positions(boards, batch_size=2)] == [r.to_dict() for r in results]
+    assert solves == [empty, board, corner]
+
+
+def test_pool_gives_the_serial_answers():
+    boards = ['...|...|...', BOARD, 'X..|.O.|..X', 'XO.|XO.|...', BOARD]
+    serial = list(analyze_positions(boards))
+    assert list(analyze_positions(boards, workers=2, batch_size=3)) == serial
+
+
+def test_larger_boards_use_the_timed_search():
+    config = BoardConfig(rows=4, cols=4, win_length=3, budget_ms=20)
+    result, = analyze_positions(['XX..|OO..|....|....'], config)
+    assert result.status == 'ok' and result.best_move in ((0, 2), (1, 2))
+
+
+def test_command_line(monkeypatch, capsys, tmp_path):
+    path = tmp_path / 'boards.txt'
+    path.write_text('\n'.join([BOARD, '', '88', '120010000', '  xo.|.x.|...  ', '5123']))
+    output = tmp_path / 'labels.jsonl'
+    monkeypatch.setattr(sys, 'argv', ['position_analysis.py', str(path), '--output', str(output), '--workers', '1'])
+    position_analysis.main()
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [r['index'] for r in records] == list(range(5))
+    # A base-3 code and a digit per cell are both read as positions
+    assert [r['board'] for r in records[:4]] == [BOARD] * 4
+    assert {r['status'] for r in records[:4]} == {'ok'}
+    assert records[0]['to_move'] == 'O' and records[0]['best_move'] == [2, 2]
+    # 5123 decodes to a board with more O's than X's
+    assert records[4]['board'] == 'O.O|...|XO.' and records[4]['status'] == 'invalid'
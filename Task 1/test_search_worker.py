@@ -0,0 +1,179 @@
+"""The background search worker: answers, cancellation, pondering and failures."""
+import threading
+import time
+
+import pytest
+
+from search_worker import SearchWorker, default_choose_move
+from tic_tac_toe_engine import TicTacToeEngine
+
+TIMEOUT = 10
+
+
+class Replies:
+    """Collects callback moves and the thread each one arrived on"""
+
+    def __init__(self):
+        self.moves = []
+        self.threads = []
+        self.arrived = threading.Event()
+
+    def __call__(self, move):
+        self.moves.append(move)
+        self.threads.append(threading.current_thread())
+        self.arrived.set()
+
+    def wait(self):
+        assert self.arrived.wait(TIMEOUT)
+        return self.moves[-1]
+
+
+class Searches:
+    """A choose_move that records its positions and can be held open or made to fail"""
+
+    def __init__(self):
+        self.positions = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+        self.failing = set()
+
+    def __call__(self, engine, token):
+        position = (engine.masks[1], engine.masks[2])
+        self.positions.append(position)
+        self.started.set()
+        while not self.release.wait(0.01):
+            if token.cancelled:
+                return None
+        if position in self.failing:
+            raise RuntimeError("search broke")
+        return default_choose_move(engine, token)
+
+
+@pytest.fixture
+def searches():
+    return Searches()
+
+
+@pytest.fixture
+def worker(searches):
+    worker = SearchWorker(TicTacToeEngine(), choose_move=searches)
+    yield worker
+    searches.release.set()
+    worker.shutdown()
+
+
+def expected_move(x_mask, o_mask):
+    engine = TicTacToeEngine()
+    engine.load_position(x_mask, o_mask)
+    return engine.get_ai_move()
+
+
+def wait_for_ponder(worker, count):
+    for _ in range(TIMEOUT * 100):
+        with worker._lock:
+            if len(worker._ponder_results) >= count and not worker._pondering:
+                return
+        time.sleep(0.01)
+    raise AssertionError("pondering did not finish")
+
+
+def test_request_move_answers_on_the_worker_thread(worker):
+    replies = Replies()
+    worker.request_move(0b000010000, 0, replies)
+    assert replies.wait() == expected_move(0b000010000, 0)
+    assert replies.threads == [worker._thread]
+
+
+def test_cancelled_request_never_calls_back(worker, searches):
+    searches.release.clear()
+    cancelled = Replies()
+    token = worker.request_move(1, 0, cancelled)
+    assert searches.started.wait(TIMEOUT)
+    token.cancel()
+    searches.release.set()
+
+    # The worker moves on to the next request
+    replies = Replies()
+    worker.request_move(0b000010000, 0, replies)
+    assert replies.wait() == expected_move(0b000010000, 0)
+    assert cancelled.moves == []
+
+
+def test_cancel_all_drops_running_and_queued_searches(worker, searches):
+    searches.release.clear()
+    first, second = Replies(), Replies()
+    worker.request_move(1, 0, first)
+    assert searches.started.wait(TIMEOUT)
+    worker.request_move(2, 0, second)
+    worker.cancel_all()
+    searches.release.set()
+
+    replies = Replies()
+    worker.request_move(4, 0, replies)
+    assert replies.wait() == expected_move(4, 0)
+    assert first.moves == second.moves == []
+    assert (2, 0) not in searches.positions
+
+
+def test_ponder_hit_answers_on_the_callers_thread(worker, searches):
+    worker.ponder(0, 0)
+    # X's eight most likely openings, the centre first
+    wait_for_ponder(worker, 8)
+    searched = len(searches.positions)
+
+    replies = Replies()
+    worker.request_move(0b000010000, 0, replies)
+    assert replies.moves == [expected_move(0b000010000, 0)]
+    assert replies.threads == [threading.current_thread()]
+    assert worker.ponder_hits == 1 and len(searches.positions) == searched
+
+
+def test_request_adopts_the_ponder_search_in_progress(worker, searches):
+    searches.release.clear()
+    worker.ponder(0, 0)
+    assert searches.started.wait(TIMEOUT)
+    pondering = searches.positions[0]
+
+    replies = Replies()
+    worker.request_move(*pondering, replies)
+    searches.release.set()
+    assert replies.wait() == expected_move(*pondering)
+    # Searched once, by the ponder job, and the other guesses were dropped
+    assert searches.positions == [pondering]
+    assert worker.ponder_hits == 0
+
+
+def test_failed_search_still_answers_with_a_legal_move(worker, searches, caplog):
+    searches.failing.add((1, 0))
+    replies = Replies()
+    worker.request_move(1, 0, replies)
+    row, col = replies.wait()
+    assert (row, col) != (0, 0)
+    assert worker.errors == 1
+    assert "search broke" in caplog.text
+
+    # The thread survived and keeps answering
+    replies = Replies()
+    worker.request_move(0b000010000, 0, replies)
+    assert replies.wait() == expected_move(0b000010000, 0)
+
+
+def test_failed_ponder_is_not_kept_as_an_answer(worker, searches):
+    searches.failing.add((0b000010000, 0))
+    worker.ponder(0, 0)
+    wait_for_ponder(worker, 7)
+    assert worker.errors == 1
+    assert (0b000010000, 0) not in worker._ponder_results
+
+    searches.failing.clear()
+    replies = Replies()
+    worker.request_move(0b000010000, 0, replies)
+    assert replies.wait() == expected_move(0b000010000, 0)
+    assert worker.ponder_hits == 0
+
+
+def test_shutdown_stops_the_thread(searches):
+    worker = SearchWorker(TicTacToeEngine(), choose_move=searches)
+    worker.shutdown()
+    assert not worker._thread.is_alive()
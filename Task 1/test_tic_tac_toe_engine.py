@@ -0,0 +1,212 @@
+"""The bitboard engine against the list-board minimax it replaced, and the m x n search."""
+import time
+from typing import List, Optional, Tuple
+
+import pytest
+
+from tic_tac_toe_engine import MATE_SCORE, MATE_THRESHOLD, TicTacToeEngine, win_masks
+
+AI, HUMAN = 2, 1
+
+
+class BaselineBoard:
+    """The original TicTacToeAI search, minus the GUI."""
+
+    def __init__(self, board: List[List[int]], ai_player: int = AI, human_player: int = HUMAN):
+        self.board = [row[:] for row in board]
+        self.ai_player = ai_player
+        self.human_player = human_player
+
+    def check_winner(self) -> Optional[int]:
+        for row in self.board:
+            if row[0] == row[1] == row[2] != 0:
+                return row[0]
+        for col in range(3):
+            if self.board[0][col] == self.board[1][col] == self.board[2][col] != 0:
+                return self.board[0][col]
+        if self.board[0][0] == self.board[1][1] == self.board[2][2] != 0:
+            return self.board[0][0]
+        if self.board[0][2] == self.board[1][1] == self.board[2][0] != 0:
+            return self.board[0][2]
+        return None
+
+    def is_board_full(self):
+        return all(cell != 0 for row in self.board for cell in row)
+
+    def get_available_moves(self) -> List[Tuple[int, int]]:
+        return [(r, c) for r in range(3) for c in range(3) if self.board[r][c] == 0]
+
+    def minimax(self, depth, alpha, beta, maximizing):
+        winner = self.check_winner()
+        if winner == self.ai_player:
+            return 10.0 - depth, None
+        elif winner == self.human_player:
+            return depth - 10.0, None
+        elif self.is_board_full():
+            return 0.0, None
+
+        best_eval = float('-inf') if maximizing else float('inf')
+        best_move = None
+        for r, c in self.get_available_moves():
+            self.board[r][c] = self.ai_player if maximizing else self.human_player
+            eval, _ = self.minimax(depth + 1, alpha, beta, not maximizing)
+            self.board[r][c] = 0
+            if maximizing:
+                if eval > best_eval:
+                    best_eval, best_move = eval, (r, c)
+                alpha = max(alpha, eval)
+            else:
+                if eval < best_eval:
+                    best_eval, best_move = eval, (r, c)
+                beta = min(beta, eval)
+            if beta <= alpha:
+                break
+        return best_eval, best_move
+
+
+def reachable_positions():
+    """Every position reachable from the empty board with X opening, finished or not."""
+    seen = {}
+    board = [[0] * 3 for _ in range(3)]
+
+    def walk(player):
+        key = tuple(cell for row in board for cell in row)
+        if key in seen:
+            return
+        seen[key] = player
+        if BaselineBoard(board).check_winner() or all(key):
+            return
+        for r in range(3):
+            for c in range(3):
+                if not board[r][c]:
+                    board[r][c] = player
+                    walk(3 - player)
+                    board[r][c] = 0
+
+    walk(1)
+    return [([list(key[i:i + 3]) for i in range(0, 9, 3)], player) for key, player in seen.items()]
+
+
+POSITIONS = reachable_positions()
+
+
+def test_reachable_position_count():
+    assert len(POSITIONS) == 5478
+
+
+def test_winner_and_full_board_match_baseline():
+    for board, _ in POSITIONS:
+        engine = TicTacToeEngine.from_board(board)
+        baseline = BaselineBoard(board)
+        assert engine.check_winner() == baseline.check_winner()
+        assert engine.is_board_full() == baseline.is_board_full()
+        assert engine.get_available_moves() == baseline.get_available_moves()
+        assert engine.to_board() == board
+
+
+@pytest.mark.parametrize('ai_player', [2, 1])
+def test_minimax_matches_baseline(ai_player):
+    # Same score and same move, ties included, from either seat
+    checked = 0
+    for board, player in POSITIONS:
+        if player != ai_player:
+            continue
+        engine = TicTacToeEngine.from_board(board, ai_player=ai_player, human_player=3 - ai_player)
+        baseline = BaselineBoard(board, ai_player=ai_player, human_player=3 - ai_player)
+        expected = baseline.minimax(0, float('-inf'), float('inf'), True)
+        assert engine.minimax(0, float('-inf'), float('inf'), True) == expected, board
+        checked += 1
+    assert checked > 2000
+
+
+def test_get_ai_move_matches_baseline():
+    for board, player in POSITIONS:
+        engine = TicTacToeEngine.from_board(board)
+        baseline = BaselineBoard(board)
+        if player != AI or baseline.check_winner() or baseline.is_board_full():
+            continue
+        _, move = baseline.minimax(0, float('-inf'), float('inf'), True)
+        assert engine.get_ai_move() == (move if move else baseline.get_available_moves()[0])
+
+
+def five_by_five(human, ai):
+    """A 5x5, four-in-a-row engine with O (the AI) to move"""
+    engine = TicTacToeEngine(rows=5, cols=5, win_length=4)
+    for player, stones in ((HUMAN, human), (AI, ai)):
+        for r, c in stones:
+            engine.make_move(r * 5 + c, player)
+    return engine
+
+
+def test_win_masks_on_larger_boards():
+    # 5x5, k=4: two runs per row and column, eight diagonals
+    assert len(win_masks(5, 5, 4)) == 28
+    assert len(win_masks(1, 9, 3)) == 7
+    with pytest.raises(ValueError):
+        TicTacToeEngine(rows=3, cols=3, win_length=4)
+
+
+def test_zobrist_hash_is_independent_of_move_order():
+    first = TicTacToeEngine(rows=5, cols=5, win_length=4)
+    second = TicTacToeEngine(rows=5, cols=5, win_length=4)
+    for cell, player in ((12, 1), (6, 2), (7, 1)):
+        first.make_move(cell, player)
+    for cell, player in ((7, 1), (12, 1), (6, 2), (20, 2)):
+        second.make_move(cell, player)
+    second.undo_move(20, 2)
+    assert first.hash == second.hash
+    second.load_position(second.masks[1], second.masks[2])
+    assert first.hash == second.hash
+
+
+def test_search_takes_the_immediate_win_over_a_block():
+    # Both sides have three in a row; O completes its own
+    engine = five_by_five(human=[(0, 0), (0, 1), (0, 2)], ai=[(2, 0), (2, 1), (2, 2)])
+    result = engine.search(time_budget_ms=None, max_depth=4)
+    assert result.move == (2, 3) and result.score == MATE_SCORE - 1
+    assert five_by_five(human=[(0, 0), (0, 1), (0, 2)], ai=[(2, 0), (2, 1), (2, 2)]).get_ai_move(200) == (2, 3)
+
+
+def test_search_blocks_the_only_losing_cell():
+    # X threatens (0, 3); anything else loses on the next move
+    engine = five_by_five(human=[(0, 0), (0, 1), (0, 2)], ai=[(2, 2), (4, 0)])
+    result = engine.search(time_budget_ms=None, max_depth=2)
+    assert result.move == (0, 3) and result.score > -MATE_THRESHOLD
+    assert five_by_five(human=[(0, 0), (0, 1), (0, 2)], ai=[(2, 2), (4, 0)]).get_ai_move(200) == (0, 3)
+
+
+def test_search_finds_a_forced_win_in_three():
+    # (2, 3) makes an open three: X cannot cover both (2, 0) and (2, 4)
+    engine = five_by_five(human=[(0, 0), (4, 4), (4, 0)], ai=[(2, 1), (2, 2)])
+    result = engine.search(time_budget_ms=500)
+    assert result.move == (2, 3) and result.score == MATE_SCORE - 3
+    # A forced result ends the deepening early
+    assert result.depth == 3
+
+
+@pytest.mark.parametrize('budget_ms', [50, 200])
+def test_get_ai_move_respects_the_time_budget(budget_ms):
+    # 7x7, five in a row is far too deep to finish within the budget
+    engine = TicTacToeEngine(rows=7, cols=7, win_length=5)
+    engine.make_move(24, HUMAN)
+    start = time.perf_counter()
+    row, col = engine.get_ai_move(budget_ms)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    assert engine.is_valid_move(row, col)
+    assert elapsed_ms < budget_ms * 1.5 + 50
+
+    result = engine.search(budget_ms)
+    assert result.depth < engine.cells - 1
+    assert result.elapsed_ms < budget_ms * 1.5 + 50
+
+
+def test_stop_event_ends_the_search():
+    class Stopped:
+        def is_set(self):
+            return True
+
+    engine = TicTacToeEngine(rows=7, cols=7, win_length=5)
+    engine.make_move(24, HUMAN)
+    result = engine.search(time_budget_ms=None, stop_event=Stopped())
+    # Only the depths that finished before the first check count
+    assert result.move is not None and result.depth <= 2
@@ -0,0 +1,82 @@
+"""Smoke tests for the self-play tournament harness."""
+import json
+import sys
+
+import pytest
+
+import tournament
+from tournament import GameConfig, percentile, play_game, run_tournament
+
+
+def config(first, second, rows=3, cols=3, win_length=3, budget_ms=5.0, seed=0):
+    return GameConfig((first, second), rows, cols, win_length, budget_ms, seed, True)
+
+
+def run_main(monkeypatch, *argv):
+    monkeypatch.setattr(sys, 'argv', ['tournament.py', *argv])
+    tournament.main()
+
+
+def test_perfect_players_always_draw():
+    report = run_tournament(config('table', 'minimax'), games=12, workers=1)
+    assert report['draws'] == 12 and report['total_moves'] == 12 * 9
+    assert [a['moves'] for a in report['per_agent']] == [54, 54]
+
+
+def test_minimax_never_loses_to_random():
+    report = run_tournament(config('minimax', 'random'), games=40, workers=1)
+    minimax, rand = report['per_agent']
+    assert minimax['losses'] == 0 and minimax['wins'] > 0
+    assert minimax['wins'] == rand['losses']
+    assert minimax['wins'] + rand['wins'] + report['draws'] == 40
+
+
+def test_games_are_repeatable_across_workers():
+    # Each game seeds its own random agent, so the pool changes nothing but speed
+    serial = run_tournament(config('random', 'random', seed=3), games=30, workers=1)
+    pooled = run_tournament(config('random', 'random', seed=3), games=30, workers=2)
+    for key in ('draws', 'total_moves'):
+        assert serial[key] == pooled[key]
+    assert [a['wins'] for a in serial['per_agent']] == [a['wins'] for a in pooled['per_agent']]
+
+
+def test_search_plays_larger_boards():
+    result = play_game(config('search', 'random', rows=4, cols=4, win_length=3, budget_ms=5.0), 0)
+    assert 5 <= result.moves <= 16
+    assert len(result.latencies_ms[0]) + len(result.latencies_ms[1]) == result.moves
+
+
+def test_percentile():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 51.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([], 90) == 0.0
+
+
+@pytest.mark.parametrize('board', [
+    ['--rows', '1', '--cols', '9'],
+    ['--win-length', '2'],
+    ['--rows', '4', '--cols', '4', '--win-length', '3'],
+])
+def test_table_agent_needs_the_classic_board(monkeypatch, board):
+    with pytest.raises(SystemExit) as exit_info:
+        run_main(monkeypatch, 'table', 'random', '--games', '1', *board)
+    assert exit_info.value.code == 2
+
+
+def test_command_line_writes_the_json_report(monkeypatch, capsys, tmp_path):
+    path = tmp_path / 'report.json'
+    run_main(monkeypatch, 'table', 'random', '--games', '10', '--workers', '1',
+             '--json', str(path), '--fail-on-loss', 'table')
+    report = json.loads(path.read_text())
+    assert report['board'] == '3x3/3' and report['games'] == 10
+    assert report['per_agent'][0]['losses'] == 0
+    assert "table vs random on 3x3/3: 10 games" in capsys.readouterr().out
+
+
+def test_fail_on_loss(monkeypatch, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        run_main(monkeypatch, 'random', 'minimax', '--games', '20', '--workers', '1', '--fail-on-loss', 'random')
+    assert exit_info.value.code == 1
+    assert "random lost" in capsys.readouterr().out
@@ -1,17 +1,28 @@
 import time
 import tkinter as tk
 from tkinter import messagebox, ttk
-import threading
 from typing import List, Tuple, Optional
 
+from perfect_play_table import PerfectPlayTable
+from search_stats import SearchStats
+from search_worker import SearchWorker
+from tic_tac_toe_engine import TicTacToeEngine
+
 class TicTacToeAI:
-    def __init__(self):
-        self.board = [[0, 0, 0], [0, 0, 0], [0, 0, 0]]
+    def __init__(self, collect_stats: bool = False):
+        self.engine = TicTacToeEngine(ai_player=2, human_player=1)
+        self.table = PerfectPlayTable()
+        self.worker = SearchWorker(self.engine, choose_move=self.choose_move)
+        # Search counters for every AI move, whichever engine instance made it
+        self.stats = SearchStats() if collect_stats else None
+        self.engine.stats = self.worker.engine.stats = self.stats
+        self.game_id = 0         # bumped on reset so late AI replies are dropped
         self.current_player = 1  # X
         self.ai_player = 2       # O
         self.human_player = 1
         self.game_over = False
         self.ai_thinking = False
+        self.worker.ponder(0, 0)
         self.setup_gui()
     
     def setup_gui(self):
@@ -77,14 +88,20 @@ class TicTacToeAI:
                 self.ai_thinking = True
                 self.status_label.config(text="🤖 AI is thinking...")
                 self.root.update()
-                threading.Thread(target=self.make_ai_move, daemon=True).start()
+                self.make_ai_move()
 
     def make_ai_move(self):
         start_time = time.time()
-        row, col = self.get_ai_move()
-        self.root.after(0, lambda: self.complete_ai_move(row, col, start_time))
+        game_id = self.game_id
+
+        def on_move(move):
+            self.root.after(0, lambda: self.complete_ai_move(move[0], move[1], start_time, game_id))
 
-    def complete_ai_move(self, row, col, start_time):
+        self.worker.request_move(self.engine.masks[1], self.engine.masks[2], on_move)
+
+    def complete_ai_move(self, row, col, start_time, game_id=None):
+        if game_id is not None and game_id != self.game_id:
+            return  # the game was reset while the AI was thinking
         end_time = time.time()
         self.make_move(row, col, self.ai_player)
         self.update_button(row, col, "O")
@@ -94,7 +111,8 @@ class TicTacToeAI:
         thinking_time = end_time - start_time
         self.status_label.config(text=f"AI took {thinking_time:.2f}s")
 
-        self.check_game_over()
+        if not self.check_game_over():
+            self.worker.ponder(self.engine.masks[1], self.engine.masks[2])
 
     def update_button(self, row, col, symbol):
         btn = self.buttons[row][col]
@@ -126,7 +144,9 @@ class TicTacToeAI:
         self.status_label.config(text="Your turn (X)")
 
     def reset_game(self):
-        self.board = [[0] * 3 for _ in range(3)]
+        self.worker.cancel_all()
+        self.game_id += 1
+        self.engine.reset()
         self.current_player = 1
         self.game_over = False
         self.ai_thinking = False
@@ -137,79 +157,46 @@ class TicTacToeAI:
                 btn.config(text="", state=tk.NORMAL, bg="SystemButtonFace", fg="black")
 
         self.status_label.config(text="Your turn (X)")
+        self.worker.ponder(0, 0)
+
+    @property
+    def board(self) -> List[List[int]]:
+        return self.engine.to_board()
 
     def is_valid_move(self, row, col):
-        return self.board[row][col] == 0
+        return self.engine.is_valid_move(row, col)
 
     def make_move(self, row, col, player):
-        self.board[row][col] = player
+        self.engine.make_move(row * 3 + col, player)
 
     def check_winner(self) -> Optional[int]:
-        for row in self.board:
-            if row[0] == row[1] == row[2] != 0:
-                return row[0]
-        for col in range(3):
-            if self.board[0][col] == self.board[1][col] == self.board[2][col] != 0:
-                return self.board[0][col]
-        if self.board[0][0] == self.board[1][1] == self.board[2][2] != 0:
-            return self.board[0][0]
-        if self.board[0][2] == self.board[1][1] == self.board[2][0] != 0:
-            return self.board[0][2]
-        return None
+        return self.engine.check_winner()
 
     def is_board_full(self):
-        return all(cell != 0 for row in self.board for cell in row)
+        return self.engine.is_board_full()
 
     def get_available_moves(self) -> List[Tuple[int, int]]:
-        return [(r, c) for r in range(3) for c in range(3) if self.board[r][c] == 0]
+        return self.engine.get_available_moves()
 
     def evaluate_board(self):
-        winner = self.check_winner()
-        if winner == self.ai_player:
-            return 10
-        elif winner == self.human_player:
-            return -10
-        return 0
+        return self.engine.evaluate_board()
 
     def minimax(self, depth: int, alpha: float, beta: float, maximizing: bool) -> Tuple[float, Optional[Tuple[int, int]]]:
-        winner = self.check_winner()
-        if winner == self.ai_player:
-            return 10.0 - depth, None
-        elif winner == self.human_player:
-            return depth - 10.0, None
-        elif self.is_board_full():
-            return 0.0, None
-
-        if maximizing:
-            max_eval = float('-inf')
-            best_move = None
-            for r, c in self.get_available_moves():
-                self.board[r][c] = self.ai_player
-                eval, _ = self.minimax(depth + 1, alpha, beta, False)
-                self.board[r][c] = 0
-                if eval > max_eval:
-                    max_eval, best_move = eval, (r, c)
-                alpha = max(alpha, eval)
-                if beta <= alpha:
-                    break
-            return max_eval, best_move
-        else:
-            min_eval = float('inf')
-            best_move = None
-            for r, c in self.get_available_moves():
-                self.board[r][c] = self.human_player
-                eval, _ = self.minimax(depth + 1, alpha, beta, True)
-                self.board[r][c] = 0
-                if eval < min_eval:
-                    min_eval, best_move = eval, (r, c)
-                beta = min(beta, eval)
-                if beta <= alpha:
-                    break
-            return min_eval, best_move
+        return self.engine.minimax(depth, alpha, beta, maximizing)
 
     def get_ai_move(self) -> Tuple[int, int]:
-        _, best_move = self.minimax(0, float('-inf'), float('inf'), True)
-        return best_move if best_move else self.get_available_moves()[0]
+        return self.choose_move(self.engine)
+
+    def choose_move(self, engine: TicTacToeEngine, token=None) -> Tuple[int, int]:
+        # Table lookup first; a full search only for positions it does not cover
+        start = time.perf_counter()
+        move = self.table.best_move(engine)
+        if not move:
+            return engine.get_ai_move()
+        if engine.stats is not None:
+            engine.stats.begin_move(engine.cells)
+            engine.stats.record_move((time.perf_counter() - start) * 1000, method='table')
+        return move
 
 # Run the GUI
 if __name__ == "__main__":
@@ -0,0 +1,462 @@
+"""Headless bitboard engine behind the Tic-Tac-Toe AI.
+
+Cells are numbered row-major (cell = row * cols + col) and each player's
+stones are kept as an integer bitmask, so win detection is a few AND tests
+and make/unmake is a pair of OR/XOR operations. Nothing here touches tkinter.
+
+The board size and win length are configurable (m x n, k-in-a-row). The
+classic 3x3 board is solved exactly by `minimax`; larger boards use `search`,
+an iterative-deepening alpha-beta with a Zobrist-hashed transposition table
+and a heuristic evaluation at the depth horizon, bounded by a time budget.
+"""
+import random
+import time
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from search_stats import SearchStats
+
+SIZE = 3
+CELLS = SIZE * SIZE
+FULL_MASK = (1 << CELLS) - 1
+
+# Search scores: a win found n plies from the root scores MATE_SCORE - n, so
+# anything beyond MATE_THRESHOLD is a forced result rather than a heuristic.
+MATE_SCORE = 1_000_000
+MATE_THRESHOLD = MATE_SCORE // 2
+DEFAULT_TIME_BUDGET_MS = 1000
+TT_MAX_ENTRIES = 1 << 20
+
+# Transposition table bound types
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+def _line_mask(cells) -> int:
+    mask = 0
+    for cell in cells:
+        mask |= 1 << cell
+    return mask
+
+
+@lru_cache(maxsize=None)
+def win_masks(rows: int, cols: int, win_length: int) -> Tuple[int, ...]:
+    """Every run of `win_length` cells in a row, column or diagonal."""
+    masks = []
+    for r in range(rows):
+        for c in range(cols):
+            for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_r, end_c = r + dr * (win_length - 1), c + dc * (win_length - 1)
+                if 0 <= end_r < rows and 0 <= end_c < cols:
+                    masks.append(_line_mask((r + dr * i) * cols + c + dc * i for i in range(win_length)))
+    return tuple(masks)
+
+
+@lru_cache(maxsize=None)
+def cell_win_masks(rows: int, cols: int, win_length: int) -> Tuple[Tuple[int, ...], ...]:
+    # Only the lines through the cell just played can have been completed by it
+    masks = win_masks(rows, cols, win_length)
+    return tuple(tuple(m for m in masks if m >> cell & 1) for cell in range(rows * cols))
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(cells: int) -> Tuple[Tuple[int, ...], ...]:
+    """Fixed-seed random keys per (player, cell); slot 0 holds the side-to-move key."""
+    rng = random.Random(0x7A0B)
+    return (
+        (rng.getrandbits(64),),
+        tuple(rng.getrandbits(64) for _ in range(cells)),
+        tuple(rng.getrandbits(64) for _ in range(cells)),
+    )
+
+
+WIN_MASKS = win_masks(SIZE, SIZE, SIZE)
+CELL_WIN_MASKS = cell_win_masks(SIZE, SIZE, SIZE)
+
+
+class SearchAborted(Exception):
+    """Raised inside `search` when the time budget runs out or a stop is requested."""
+
+
+class SearchResult(NamedTuple):
+    move: Optional[Tuple[int, int]]
+    score: int
+    depth: int          # deepest fully completed iteration
+    nodes: int
+    elapsed_ms: float
+
+
+class TicTacToeEngine:
+    def __init__(self, ai_player: int = 2, human_player: int = 1,
+                 rows: int = SIZE, cols: int = SIZE, win_length: int = SIZE):
+        if win_length > max(rows, cols):
+            raise ValueError(f"win_length {win_length} does not fit a {rows}x{cols} board")
+        self.ai_player = ai_player
+        self.human_player = human_player
+        self.rows = rows
+        self.cols = cols
+        self.win_length = win_length
+        self.cells = rows * cols
+        self.full_mask = (1 << self.cells) - 1
+        self.win_masks = win_masks(rows, cols, win_length)
+        self.cell_win_masks = cell_win_masks(rows, cols, win_length)
+        # Classic scoring is +/-10 on 3x3; one more than the cell count keeps
+        # every depth-adjusted win score positive on any board
+        self.win_score = self.cells + 1
+        self.zobrist = zobrist_keys(self.cells)
+
+        # Moves are tried centre-out when nothing better is known
+        centre_r, centre_c = (rows - 1) / 2, (cols - 1) / 2
+        self.centre_order = sorted(range(self.cells),
+                                   key=lambda cell: abs(cell // cols - centre_r) + abs(cell % cols - centre_c))
+        # Large boards only consider cells next to existing stones
+        self.neighbourhood_pruning = self.cells > 16
+        self.not_first_col = self.full_mask & ~_line_mask(r * cols for r in range(rows))
+        self.not_last_col = self.full_mask & ~_line_mask(r * cols + cols - 1 for r in range(rows))
+
+        self.tt: Dict[int, Tuple[int, int, int, Optional[int]]] = {}
+        self.history = [0] * self.cells
+        self.nodes = 0
+        self.stats: Optional[SearchStats] = None  # opt-in instrumentation
+        self._deadline = None
+        self._stop_event = None
+        self.reset()
+
+    @classmethod
+    def from_board(cls, board: List[List[int]], ai_player: int = 2, human_player: int = 1,
+                   win_length: int = SIZE) -> 'TicTacToeEngine':
+        rows, cols = len(board), len(board[0])
+        engine = cls(ai_player, human_player, rows=rows, cols=cols, win_length=win_length)
+        for r in range(rows):
+            for c in range(cols):
+                if board[r][c]:
+                    engine.make_move(r * cols + c, board[r][c])
+        return engine
+
+    def to_board(self) -> List[List[int]]:
+        return [[self.cell_owner(r * self.cols + c) for c in range(self.cols)] for r in range(self.rows)]
+
+    def reset(self):
+        self.masks = [0, 0, 0]  # indexed by player id, slot 0 unused
+        self.occupied = 0
+        self.hash = 0
+
+    def load_position(self, x_mask: int, o_mask: int):
+        """Replace the board with the given stone masks, keeping the transposition table."""
+        self.reset()
+        for player, stones in ((1, x_mask), (2, o_mask)):
+            while stones:
+                bit = stones & -stones
+                stones ^= bit
+                self.make_move(bit.bit_length() - 1, player)
+
+    def cell_owner(self, cell: int) -> int:
+        bit = 1 << cell
+        if self.masks[1] & bit:
+            return 1
+        if self.masks[2] & bit:
+            return 2
+        return 0
+
+    def is_valid_move(self, row: int, col: int) -> bool:
+        return not self.occupied >> (row * self.cols + col) & 1
+
+    def make_move(self, cell: int, player: int):
+        bit = 1 << cell
+        self.masks[player] |= bit
+        self.occupied |= bit
+        self.hash ^= self.zobrist[player][cell]
+
+    def undo_move(self, cell: int, player: int):
+        bit = 1 << cell
+        self.masks[player] ^= bit
+        self.occupied ^= bit
+        self.hash ^= self.zobrist[player][cell]
+
+    def check_winner(self) -> Optional[int]:
+        for player in (1, 2):
+            stones = self.masks[player]
+            for mask in self.win_masks:
+                if stones & mask == mask:
+                    return player
+        return None
+
+    def is_board_full(self) -> bool:
+        return self.occupied == self.full_mask
+
+    def get_available_moves(self) -> List[Tuple[int, int]]:
+        return [divmod(cell, self.cols) for cell in range(self.cells) if not self.occupied >> cell & 1]
+
+    def evaluate_board(self) -> int:
+        winner = self.check_winner()
+        if winner == self.ai_player:
+            return self.win_score
+        elif winner == self.human_player:
+            return -self.win_score
+        return 0
+
+    def minimax(self, depth: int, alpha: float, beta: float, maximizing: bool) -> Tuple[float, Optional[Tuple[int, int]]]:
+        """Full-depth alpha-beta; only practical on the classic 3x3 board."""
+        winner = self.check_winner()
+        if winner == self.ai_player:
+            return float(self.win_score) - depth, None
+        elif winner == self.human_player:
+            return depth - float(self.win_score), None
+        if self.stats is not None:
+            self.stats.begin_move(self.cells)
+        score, cell = self._minimax(depth, alpha, beta, maximizing)
+        return score, (divmod(cell, self.cols) if cell is not None else None)
+
+    def _minimax(self, depth: int, alpha: float, beta: float, maximizing: bool) -> Tuple[float, Optional[int]]:
+        # Called only on positions without a winner: a winning move is scored
+        # as soon as it is made instead of on entry to the child node.
+        self.nodes += 1
+        stats = self.stats
+        if stats is not None:
+            stats.nodes += 1
+            stats.nodes_by_depth[depth] += 1
+        if self.occupied == self.full_mask:
+            if stats is not None:
+                stats.terminal_evals += 1
+            return 0.0, None
+
+        masks = self.masks
+        cell_win_masks = self.cell_win_masks
+        player = self.ai_player if maximizing else self.human_player
+        own = masks[player]
+        occupied = self.occupied
+        win_score = self.win_score - 1.0 - depth if maximizing else depth + 1.0 - self.win_score
+        best_eval = float('-inf') if maximizing else float('inf')
+        best_cell = None
+
+        # Lowest set bit first keeps the row-major move order of the list board
+        free = self.full_mask & ~occupied
+        while free:
+            bit = free & -free
+            free ^= bit
+            cell = bit.bit_length() - 1
+            stones = own | bit
+            for mask in cell_win_masks[cell]:
+                if stones & mask == mask:
+                    eval = win_score
+                    if stats is not None:
+                        stats.terminal_evals += 1
+                    break
+            else:
+                masks[player] = stones
+                self.occupied = occupied | bit
+                eval, _ = self._minimax(depth + 1, alpha, beta, not maximizing)
+                masks[player] = own
+                self.occupied = occupied
+
+            if maximizing:
+                if eval > best_eval:
+                    best_eval, best_cell = eval, cell
+                alpha = max(alpha, eval)
+            else:
+                if eval < best_eval:
+                    best_eval, best_cell = eval, cell
+                beta = min(beta, eval)
+            if beta <= alpha:
+                if stats is not None:
+                    stats.cutoffs_by_depth[depth] += 1
+                break
+        return best_eval, best_cell
+
+    def get_ai_move(self, time_budget_ms: Optional[float] = None) -> Tuple[int, int]:
+        if self.cells <= CELLS and time_budget_ms is None:
+            self.nodes = 0
+            start = time.perf_counter()
+            _, best_move = self.minimax(0, float('-inf'), float('inf'), True)
+            if self.stats is not None:
+                self.stats.record_move((time.perf_counter() - start) * 1000, method='minimax')
+        else:
+            best_move = self.search(time_budget_ms or DEFAULT_TIME_BUDGET_MS).move
+        return best_move if best_move else self.get_available_moves()[0]
+
+    # Depth-limited search for boards too large to solve
+
+    def search(self, time_budget_ms: Optional[float] = DEFAULT_TIME_BUDGET_MS,
+               max_depth: Optional[int] = None, stop_event=None) -> SearchResult:
+        """Iterative deepening for `ai_player`, returning the best move of the last completed depth.
+
+        `stop_event` is any object with an `is_set()` method (e.g. threading.Event);
+        setting it ends the search as if the time budget had run out.
+        """
+        start = time.perf_counter()
+        self._deadline = start + time_budget_ms / 1000 if time_budget_ms else None
+        self._stop_event = stop_event
+        self.nodes = 0
+        self.history = [0] * self.cells
+        if len(self.tt) > TT_MAX_ENTRIES:
+            self.tt.clear()
+        if self.stats is not None:
+            self.stats.begin_move(self.cells)
+
+        player = self.ai_player
+        moves = self._ordered_moves(None)
+        result = SearchResult(divmod(moves[0], self.cols) if moves else None, 0, 0, 0, 0.0)
+        if not moves or self.check_winner():
+            return result
+
+        max_depth = min(max_depth or self.cells, self.cells - bin(self.occupied).count('1'))
+        for depth in range(1, max_depth + 1):
+            try:
+                score, cell = self._search_root(depth, player)
+            except SearchAborted:
+                break
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            result = SearchResult(divmod(cell, self.cols), score, depth, self.nodes, elapsed_ms)
+            if abs(score) > MATE_THRESHOLD:
+                break  # forced result, deeper iterations cannot change it
+        result = result._replace(nodes=self.nodes, elapsed_ms=(time.perf_counter() - start) * 1000)
+        if self.stats is not None:
+            self.stats.record_move(result.elapsed_ms, method='search', depth=result.depth, score=result.score)
+        return result
+
+    def _search_root(self, depth: int, player: int) -> Tuple[int, int]:
+        alpha, beta = -MATE_SCORE - 1, MATE_SCORE + 1
+        best_score, best_cell = -MATE_SCORE - 1, None
+        entry = self.tt.get(self._tt_key(player))
+        for cell in self._ordered_moves(entry[3] if entry else None):
+            score = self._try_move(cell, player, depth, 0, alpha, beta)
+            if score > best_score:
+                best_score, best_cell = score, cell
+            alpha = max(alpha, score)
+        self.tt[self._tt_key(player)] = (depth, EXACT, best_score, best_cell)
+        return best_score, best_cell
+
+    def _try_move(self, cell: int, player: int, depth: int, ply: int, alpha: int, beta: int) -> int:
+        stones = self.masks[player] | 1 << cell
+        for mask in self.cell_win_masks[cell]:
+            if stones & mask == mask:
+                if self.stats is not None:
+                    self.stats.terminal_evals += 1
+                return MATE_SCORE - ply - 1
+        self.make_move(cell, player)
+        try:
+            return -self._negamax(depth - 1, ply + 1, -beta, -alpha, 3 - player)
+        finally:
+            self.undo_move(cell, player)
+
+    def _negamax(self, depth: int, ply: int, alpha: int, beta: int, player: int) -> int:
+        self.nodes += 1
+        stats = self.stats
+        if stats is not None:
+            stats.nodes += 1
+            stats.nodes_by_depth[ply] += 1
+        if not self.nodes & 31:
+            if self._deadline is not None and time.perf_counter() > self._deadline:
+                raise SearchAborted()
+            if self._stop_event is not None and self._stop_event.is_set():
+                raise SearchAborted()
+        if self.occupied == self.full_mask:
+            if stats is not None:
+                stats.terminal_evals += 1
+            return 0
+
+        key = self._tt_key(player)
+        entry = self.tt.get(key)
+        if stats is not None:
+            stats.tt_probes += 1
+        tt_move = None
+        if entry is not None:
+            if stats is not None:
+                stats.tt_hits += 1
+            entry_depth, flag, score, tt_move = entry
+            if entry_depth >= depth:
+                score = self._score_from_tt(score, ply)
+                if (flag == EXACT or flag == LOWER and score >= beta
+                        or flag == UPPER and score <= alpha):
+                    if stats is not None:
+                        stats.tt_cutoffs += 1
+                    return score
+
+        if depth == 0:
+            if stats is not None:
+                stats.horizon_evals += 1
+            return self._evaluate(player)
+
+        original_alpha = alpha
+        best_score, best_cell = -MATE_SCORE - 1, None
+        for cell in self._ordered_moves(tt_move):
+            score = self._try_move(cell, player, depth, ply, alpha, beta)
+            if score > best_score:
+                best_score, best_cell = score, cell
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self.history[cell] += depth * depth
+                if stats is not None:
+                    stats.cutoffs_by_depth[ply] += 1
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt[key] = (depth, flag, self._score_to_tt(best_score, ply), best_cell)
+        return best_score
+
+    def _tt_key(self, player: int) -> int:
+        return self.hash ^ self.zobrist[0][0] if player == 2 else self.hash
+
+    @staticmethod
+    def _score_to_tt(score: int, ply: int) -> int:
+        # Forced results are stored relative to the node, not the root
+        if score > MATE_THRESHOLD:
+            return score + ply
+        if score < -MATE_THRESHOLD:
+            return score - ply
+        return score
+
+    @staticmethod
+    def _score_from_tt(score: int, ply: int) -> int:
+        if score > MATE_THRESHOLD:
+            return score - ply
+        if score < -MATE_THRESHOLD:
+            return score + ply
+        return score
+
+    def candidate_moves(self) -> List[int]:
+        """Cells worth searching in the current position, most promising first."""
+        return self._ordered_moves(None)
+
+    def _candidate_mask(self) -> int:
+        occupied = self.occupied
+        free = self.full_mask & ~occupied
+        if not self.neighbourhood_pruning or not occupied:
+            return free
+        # Grow the occupied cells by one step in every direction
+        grown = occupied | (occupied << 1) & self.not_first_col | (occupied >> 1) & self.not_last_col
+        grown |= grown << self.cols | grown >> self.cols
+        return grown & free
+
+    def _ordered_moves(self, tt_move: Optional[int]) -> List[int]:
+        candidates = self._candidate_mask()
+        if self.neighbourhood_pruning and not self.occupied:
+            candidates = 1 << self.centre_order[0]  # open in the centre
+        moves = [cell for cell in self.centre_order if candidates >> cell & 1]
+        history = self.history
+        moves.sort(key=lambda cell: -history[cell])  # stable: centre order breaks ties
+        if tt_move is not None and candidates >> tt_move & 1:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+        return moves
+
+    def _evaluate(self, player: int) -> int:
+        """Open-line heuristic from `player`'s point of view.
+
+        Each line free of opponent stones is worth 4**stones to its owner, so
+        a line one stone from completion dominates any number of weaker ones.
+        """
+        own, other = self.masks[player], self.masks[3 - player]
+        score = 0
+        for mask in self.win_masks:
+            mine, theirs = own & mask, other & mask
+            if mine and not theirs:
+                score += 1 << 2 * mine.bit_count()
+            elif theirs and not mine:
+                score -= 1 << 2 * theirs.bit_count()
+        return max(-MATE_THRESHOLD, min(MATE_THRESHOLD, score))
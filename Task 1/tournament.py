@@ -0,0 +1,201 @@
+"""Self-play tournament and benchmark harness for the Tic-Tac-Toe AI.
+
+Plays batches of games between two agents across a process pool and reports
+throughput, per-move latency percentiles and win/draw/loss counts.
+
+Agents:
+    minimax  engine.get_ai_move() (exact minimax on 3x3, timed search on larger boards)
+    search   engine.search() with --budget-ms per move
+    table    perfect-play table lookup (3x3 only)
+    random   uniformly random legal move
+
+Examples:
+    python tournament.py minimax random --games 2000
+    python tournament.py table minimax --games 500 --workers 4 --json results.json
+    python tournament.py search random --rows 5 --cols 5 --win-length 4 --budget-ms 50
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from tic_tac_toe_engine import SIZE, TicTacToeEngine
+
+AGENTS = ('minimax', 'search', 'table', 'random')
+
+
+class GameConfig(NamedTuple):
+    agents: Tuple[str, str]  # agent names as given on the command line
+    rows: int
+    cols: int
+    win_length: int
+    budget_ms: float
+    seed: int
+    alternate: bool          # swap who plays X every other game
+
+
+class GameResult(NamedTuple):
+    winner: Optional[int]    # index into GameConfig.agents, None for a draw
+    moves: int
+    latencies_ms: Tuple[List[float], List[float]]
+    nodes: Tuple[int, int]
+
+
+_table = None
+
+
+def _perfect_play_table():
+    global _table
+    if _table is None:
+        from perfect_play_table import PerfectPlayTable
+        _table = PerfectPlayTable()
+        _table.ensure_loaded()
+    return _table
+
+
+def choose_move(agent: str, engine: TicTacToeEngine, budget_ms: float, rng: random.Random) -> int:
+    engine.nodes = 0
+    if agent == 'random':
+        return rng.choice([r * engine.cols + c for r, c in engine.get_available_moves()])
+    if agent == 'table':
+        row, col = _perfect_play_table().best_move(engine)
+    elif agent == 'search':
+        row, col = engine.search(budget_ms).move
+    else:
+        row, col = engine.get_ai_move()
+    return row * engine.cols + col
+
+
+def play_game(config: GameConfig, game_index: int) -> GameResult:
+    rng = random.Random(config.seed * 1_000_003 + game_index)
+    engine = TicTacToeEngine(rows=config.rows, cols=config.cols, win_length=config.win_length)
+    # seat[player] is the index of the agent playing that side; X (1) moves first
+    first = game_index % 2 if config.alternate else 0
+    seat = {1: first, 2: 1 - first}
+    latencies: Tuple[List[float], List[float]] = ([], [])
+    nodes = [0, 0]
+
+    player, moves, winner = 1, 0, None
+    while True:
+        index = seat[player]
+        engine.ai_player, engine.human_player = player, 3 - player
+        start = time.perf_counter()
+        cell = choose_move(config.agents[index], engine, config.budget_ms, rng)
+        latencies[index].append((time.perf_counter() - start) * 1000)
+        nodes[index] += engine.nodes
+        engine.make_move(cell, player)
+        moves += 1
+        if engine.check_winner() == player:
+            winner = index
+            break
+        if engine.is_board_full():
+            break
+        player = 3 - player
+    return GameResult(winner, moves, latencies, (nodes[0], nodes[1]))
+
+
+def _play(job: Tuple[GameConfig, int]) -> GameResult:
+    return play_game(*job)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def run_tournament(config: GameConfig, games: int, workers: int) -> Dict:
+    jobs = [(config, i) for i in range(games)]
+    start = time.perf_counter()
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            results = list(pool.imap_unordered(_play, jobs, chunksize=max(1, games // (workers * 8))))
+    else:
+        results = [_play(job) for job in jobs]
+    wall = time.perf_counter() - start
+
+    report = {
+        'agents': list(config.agents),
+        'board': f"{config.rows}x{config.cols}/{config.win_length}",
+        'games': games,
+        'workers': workers,
+        'wall_seconds': wall,
+        'games_per_second': games / wall if wall else 0.0,
+        'total_moves': sum(r.moves for r in results),
+        'draws': sum(1 for r in results if r.winner is None),
+        'per_agent': [],
+    }
+    for index, name in enumerate(config.agents):
+        latencies = sorted(ms for r in results for ms in r.latencies_ms[index])
+        search_seconds = sum(latencies) / 1000
+        nodes = sum(r.nodes[index] for r in results)
+        report['per_agent'].append({
+            'agent': name,
+            'wins': sum(1 for r in results if r.winner == index),
+            'losses': sum(1 for r in results if r.winner == 1 - index),
+            'moves': len(latencies),
+            'nodes': nodes,
+            'nodes_per_second': nodes / search_seconds if search_seconds else 0.0,
+            'latency_ms': {
+                'p50': percentile(latencies, 50),
+                'p90': percentile(latencies, 90),
+                'p99': percentile(latencies, 99),
+                'max': latencies[-1] if latencies else 0.0,
+                'mean': sum(latencies) / len(latencies) if latencies else 0.0,
+            },
+        })
+    return report
+
+
+def print_report(report: Dict):
+    print(f"{report['agents'][0]} vs {report['agents'][1]} on {report['board']}: "
+          f"{report['games']} games in {report['wall_seconds']:.2f}s "
+          f"({report['games_per_second']:.1f} games/s, {report['workers']} workers)")
+    print(f"Draws: {report['draws']}")
+    for agent in report['per_agent']:
+        lat = agent['latency_ms']
+        print(f"  {agent['agent']:>8}: W {agent['wins']:>6}  L {agent['losses']:>6}  "
+              f"{agent['nodes_per_second']:>12,.0f} nodes/s  "
+              f"latency p50 {lat['p50']:.3f}ms p90 {lat['p90']:.3f}ms p99 {lat['p99']:.3f}ms max {lat['max']:.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play AI-vs-AI Tic-Tac-Toe tournaments and report performance.")
+    parser.add_argument('first', choices=AGENTS, help="agent A")
+    parser.add_argument('second', choices=AGENTS, help="agent B")
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--rows', type=int, default=SIZE)
+    parser.add_argument('--cols', type=int, default=SIZE)
+    parser.add_argument('--win-length', type=int, default=SIZE)
+    parser.add_argument('--budget-ms', type=float, default=100.0, help="per-move budget for timed search")
+    parser.add_argument('--seed', type=int, default=0, help="seed for the random agent")
+    parser.add_argument('--no-alternate', action='store_true', help="agent A always plays X")
+    parser.add_argument('--json', metavar='PATH', help="also write the report as JSON")
+    parser.add_argument('--fail-on-loss', choices=AGENTS, metavar='AGENT',
+                        help="exit with status 1 if this agent loses any game (regression check)")
+    args = parser.parse_args()
+
+    if 'table' in (args.first, args.second) and not args.rows == args.cols == args.win_length == SIZE:
+        parser.error("the table agent only plays the 3x3 board with three in a row")
+
+    config = GameConfig((args.first, args.second), args.rows, args.cols, args.win_length,
+                        args.budget_ms, args.seed, not args.no_alternate)
+    report = run_tournament(config, args.games, max(1, args.workers))
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.fail_on_loss:
+        losses = sum(a['losses'] for a in report['per_agent'] if a['agent'] == args.fail_on_loss)
+        if losses:
+            print(f"{args.fail_on_loss} lost {losses} games")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
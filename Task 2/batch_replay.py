@@ -0,0 +1,248 @@
+import argparse
+import json
+import multiprocessing
+import queue
+import sys
+import time
+import zlib
+from collections import Counter, OrderedDict
+
+from chatbot import RuleBasedChatbot
+from rule_pack import DEFAULT_RULES_PATH, load_rule_pack
+
+DEFAULT_BLOCK_SIZE = 5000
+# Input lines a session may stay silent before its state is dropped
+DEFAULT_SESSION_WINDOW = 100000
+
+
+def session_shard(session_id, shards):
+    """Worker that owns a session: stable across runs and processes, unlike hash()"""
+    return zlib.crc32(session_id.encode()) % shards
+
+
+def message_seed(seed, session_id, count):
+    """Seed for the `count`-th message of a session; independent of how the work is split"""
+    return zlib.crc32(f"{seed}:{session_id}:{count}".encode())
+
+
+class SessionReplayer:
+    """Answers the messages of any number of sessions with one chatbot.
+
+    Only what later answers depend on is kept per session (the user's name
+    and how many messages it has sent), and the bot is reseeded before each
+    message, so a message's response depends only on its session's earlier
+    messages and the seed, never on what other sessions were interleaved
+    with it or which worker ran it. Time and date answers still follow the
+    clock.
+
+    A session silent for more than `session_window` input lines starts over,
+    like an expired chat session. Idleness is counted in line numbers, which
+    every worker sees the same way, so the cut-off is as deterministic as the
+    answers; it keeps the state of one-message sessions (every plain-text
+    line) from piling up on long inputs.
+    """
+
+    def __init__(self, rules_path=DEFAULT_RULES_PATH, seed=0, session_window=DEFAULT_SESSION_WINDOW):
+        self.bot = RuleBasedChatbot(rules_path, history_size=1, seed=seed)
+        self.seed = seed
+        self.session_window = session_window
+        # session id -> [user name, messages so far, line of the last message],
+        # least recently active first
+        self.sessions = OrderedDict()
+
+    def reply(self, number, session_id, message):
+        sessions = self.sessions
+        state = sessions.get(session_id)
+        if state is None or number - state[2] > self.session_window:
+            state = sessions[session_id] = [None, 0, number]
+        bot = self.bot
+        bot.user_name = state[0]
+        bot.rng.seed(message_seed(self.seed, session_id, state[1]))
+        response, rule = bot.respond(message)
+        state[0] = bot.user_name
+        state[1] += 1
+        state[2] = number
+        sessions.move_to_end(session_id)
+        # Lines arrive in increasing order, so idle sessions are at the front
+        while number - next(iter(sessions.values()))[2] > self.session_window:
+            sessions.popitem(last=False)
+        return number, session_id, message, response, rule
+
+
+def _replay_worker(rules_path, seed, session_window, inbox, outbox):
+    replayer = SessionReplayer(rules_path, seed, session_window)
+    while True:
+        job = inbox.get()
+        if job is None:
+            break
+        block, items = job
+        outbox.put((block, [replayer.reply(*item) for item in items]))
+
+
+def parse_line(number, line):
+    """Return (number, session id, message) for a plain-text or JSON line.
+
+    A JSON line is {"session": ..., "message": ...}; a plain-text line is a
+    session of its own, named after its line number.
+    """
+    if line.startswith('{'):
+        record = json.loads(line)
+        message = record['message']
+        if not isinstance(message, str):
+            raise ValueError("message is not a string")
+        return number, str(record.get('session', number)), message
+    return number, str(number), line
+
+
+def _blocks(lines, size):
+    block = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line:
+            block.append((number, line))
+            if len(block) >= size:
+                yield block
+                block = []
+    if block:
+        yield block
+
+
+def _parse_block(block):
+    """Split a block into parsed messages and error results for unreadable lines"""
+    items, errors = [], []
+    for number, line in block:
+        try:
+            items.append(parse_line(number, line))
+        except (ValueError, KeyError, TypeError) as e:
+            errors.append((number, None, line, None, f"unreadable line: {e}"))
+    return items, errors
+
+
+def replay(lines, rules_path=DEFAULT_RULES_PATH, workers=1, seed=0, block_size=DEFAULT_BLOCK_SIZE,
+           session_window=DEFAULT_SESSION_WINDOW):
+    """Stream (line number, session, message, response, rule index) for every input line, in input order.
+
+    Lines are read in blocks. Each block's messages go to the worker that
+    owns their session (by CRC32 of the session id), so a session's
+    messages are answered in order by one process; results are put back in
+    input order before they are yielded. At most a few blocks per worker
+    are in flight and session state is dropped after `session_window`
+    silent lines, so memory stays flat on inputs of any length.
+    Unreadable lines yield an error string in place of the rule index.
+    """
+    if workers <= 1:
+        replayer = SessionReplayer(rules_path, seed, session_window)
+        for block in _blocks(lines, block_size):
+            items, errors = _parse_block(block)
+            results = [replayer.reply(*item) for item in items] + errors
+            results.sort()
+            yield from results
+        return
+
+    # Compile (or refresh) the on-disk rule cache once, before the workers load it
+    load_rule_pack(rules_path)
+    inboxes = [multiprocessing.Queue() for _ in range(workers)]
+    outbox = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_replay_worker, args=(rules_path, seed, session_window, inbox, outbox),
+                                         daemon=True)
+                 for inbox in inboxes]
+    for process in processes:
+        process.start()
+
+    in_flight = {}  # block number -> [workers still busy with it, results so far]
+    next_block = 0
+
+    def collect():
+        while True:
+            try:
+                block, results = outbox.get(timeout=1.0)
+                break
+            except queue.Empty:
+                if not all(process.is_alive() for process in processes):
+                    raise RuntimeError("a replay worker died")
+        entry = in_flight[block]
+        entry[0] -= 1
+        entry[1].extend(results)
+
+    def ready():
+        nonlocal next_block
+        while next_block in in_flight and in_flight[next_block][0] == 0:
+            results = in_flight.pop(next_block)[1]
+            results.sort()
+            next_block += 1
+            yield from results
+
+    try:
+        for block_number, block in enumerate(_blocks(lines, block_size)):
+            items, errors = _parse_block(block)
+            shards = [[] for _ in range(workers)]
+            for item in items:
+                shards[session_shard(item[1], workers)].append(item)
+            sent = 0
+            for inbox, shard in zip(inboxes, shards):
+                if shard:
+                    inbox.put((block_number, shard))
+                    sent += 1
+            in_flight[block_number] = [sent, errors]
+            while len(in_flight) > 2 * workers:
+                collect()
+                yield from ready()
+            yield from ready()
+        while in_flight:
+            collect()
+            yield from ready()
+    finally:
+        for inbox in inboxes:
+            inbox.put(None)
+        for process in processes:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay logged utterances through the chatbot.")
+    parser.add_argument('input', help="plain text or JSON lines ({\"session\", \"message\"}); '-' for stdin")
+    parser.add_argument('--output', help="write JSON lines here instead of stdout")
+    parser.add_argument('--rules', default=DEFAULT_RULES_PATH, help="rule pack to replay against")
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--seed', type=int, default=0, help="seed for picking among a rule's responses")
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument('--session-window', type=int, default=DEFAULT_SESSION_WINDOW,
+                        help="input lines a session may stay silent before it starts over")
+    args = parser.parse_args()
+
+    patterns = load_rule_pack(args.rules).patterns
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    sink = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    fired = Counter()
+    count = errors = 0
+    start = time.perf_counter()
+    try:
+        for number, session_id, message, response, rule in replay(source, args.rules, args.workers, args.seed,
+                                                                   args.block_size, args.session_window):
+            count += 1
+            if response is None:
+                errors += 1
+                record = {'line': number, 'error': rule}
+            else:
+                fired[rule] += 1
+                record = {'line': number, 'session': session_id, 'message': message, 'response': response,
+                          'rule': rule, 'pattern': patterns[rule] if rule is not None else None}
+            sink.write(json.dumps(record) + '\n')
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"{count} lines in {elapsed:.2f} s ({count / elapsed if elapsed else 0:.0f}/s), {errors} unreadable",
+          file=sys.stderr)
+    for rule, hits in fired.most_common():
+        pattern = patterns[rule] if rule is not None else '(no rule)'
+        print(f"  {hits:10d}  {pattern}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import argparse
+import random
+import re
+import time
+
+from chatbot import NAME_PATTERNS, RuleBasedChatbot
+from rule_matcher import RuleMatcher
+
+# Fragments the synthetic corpus is assembled from: one per rule plus noise
+UTTERANCE_TEMPLATES = [
+    "hi there", "hello!", "good morning chatbot", "hey, how are you?",
+    "how do you do", "are you doing well today", "what is your name?", "who are you",
+    "my name is {name}", "i'm {name}", "call me {name} please", "i am {name} and i like tea",
+    "what time is it", "tell me the current time", "what is the date today", "what day is it",
+    "is it raining outside?", "what's the weather forecast", "help", "what can you do",
+    "thanks a lot", "thank you so much", "tell me a joke", "that was funny",
+    "what is {a} + {b}", "calculate {a} * {b}", "compute {a} / {b}", "what is {a} - {b}",
+    "bye", "see you later", "I like turtles", "the quick brown fox jumps over the lazy dog",
+    "can you recommend a good book about history and science", "asdfgh qwerty",
+]
+NAMES = ["alice", "bob", "priya", "rahul", "chen", "maria", "ahmed", "olga"]
+
+
+def make_corpus(size, seed=0):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        text = rng.choice(UTTERANCE_TEMPLATES).format(name=rng.choice(NAMES), a=rng.randint(0, 999),
+                                                     b=rng.randint(1, 999))
+        if rng.random() < 0.3:
+            text = text + " " + rng.choice(UTTERANCE_TEMPLATES[-4:])
+        if rng.random() < 0.3:
+            text = text.upper()
+        corpus.append(text)
+    return corpus
+
+
+def synthetic_rules(count, seed=0):
+    """`count` keyword rules in the style of the built-in ones, over made-up words."""
+    rng = random.Random(seed)
+    syllables = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'pa', 'qu', 'fi']
+
+    def word():
+        return ''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+
+    rules = []
+    for _ in range(count):
+        phrases = [' '.join(word() for _ in range(rng.randint(1, 2))) for _ in range(rng.randint(2, 5))]
+        rules.append(r'\b(' + '|'.join(phrases) + r')\b')
+    return rules
+
+
+def legacy_select(patterns, message):
+    """The matching work the original get_response did for one message."""
+    for pattern in NAME_PATTERNS:
+        match = re.search(pattern, message.lower())
+        if match:
+            break
+    lowered = message.lower()
+    for index, pattern in enumerate(patterns):
+        match = re.search(pattern, lowered)
+        if match:
+            return index, match
+    return None
+
+
+def combined_pattern(patterns):
+    """All rules in one regex; alternation order keeps the first-match priority."""
+    return re.compile('^(?:' + '|'.join(f'(?=[\\s\\S]*?({p}))' for p in patterns) + ')')
+
+
+def combined_select(bot, combined, group_rule, message):
+    lowered = message.lower()
+    bot.extract_user_name(lowered, lowered=True)
+    match = combined.match(lowered)
+    return group_rule[match.lastindex], match
+
+
+def compiled_select(bot, message):
+    lowered = message.lower()
+    bot.extract_user_name(lowered, lowered=True)
+    return bot.rule_pack.match(lowered)
+
+
+def time_per_message(select, corpus, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in corpus:
+            select(message)
+        best = min(best, time.perf_counter() - start)
+    return best / len(corpus) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-message rule matching latency.")
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rules', type=int, default=0,
+                        help="also compare linear vs indexed matching with this many synthetic rules")
+    args = parser.parse_args()
+
+    bot = RuleBasedChatbot()
+    patterns = list(bot.rule_pack.patterns)
+    corpus = make_corpus(args.messages, args.seed)
+
+    # Both paths must pick the same rule and capture the same groups
+    for message in corpus:
+        old = legacy_select(patterns, message)
+        new = compiled_select(bot, message)
+        if old[0] != new[0] or old[1].group(0) != new[1].group(0) or old[1].groups() != new[1].groups():
+            raise SystemExit(f"Mismatch on {message!r}: rule {old[0]} vs {new[0]}")
+
+    combined = combined_pattern(patterns)
+    group_rule, group = {}, 1
+    for index, compiled in enumerate(bot.rule_pack.matcher.compiled):
+        group_rule[group] = index
+        group += 1 + compiled.groups
+
+    legacy_us = time_per_message(lambda m: legacy_select(patterns, m), corpus, args.repeat)
+    combined_us = time_per_message(lambda m: combined_select(bot, combined, group_rule, m), corpus, args.repeat)
+    compiled_us = time_per_message(lambda m: compiled_select(bot, m), corpus, args.repeat)
+    print(f"{len(corpus)} messages, {len(patterns)} rules, identical rule selection")
+    print(f"  per-pattern re.search:  {legacy_us:8.2f} us/message")
+    print(f"  one combined regex:     {combined_us:8.2f} us/message ({legacy_us / combined_us:.1f}x)")
+    print(f"  compiled RuleMatcher:   {compiled_us:8.2f} us/message ({legacy_us / compiled_us:.1f}x)")
+
+    if args.rules:
+        compare_index(patterns, corpus, args)
+
+
+def compare_index(patterns, corpus, args):
+    """Linear scan vs keyword index on a large rule pack (catch-all kept last)."""
+    extra = synthetic_rules(args.rules, args.seed)
+    big_patterns = patterns[:-1] + extra + patterns[-1:]
+    rng = random.Random(args.seed)
+    # Mix in messages that hit the synthetic rules
+    messages = [m.lower() for m in corpus]
+    for i in range(0, len(messages), 3):
+        phrase = rng.choice(extra)[3:-3].split('|')[0]
+        messages[i] = f"{messages[i]} {phrase}"
+
+    start = time.perf_counter()
+    linear = RuleMatcher(big_patterns, use_index=False)
+    linear_build = time.perf_counter() - start
+    start = time.perf_counter()
+    indexed = RuleMatcher(big_patterns, use_index=True)
+    indexed_build = time.perf_counter() - start
+
+    for message in messages:
+        a, b = linear.match(message), indexed.match(message)
+        if a[0] != b[0] or a[1].span() != b[1].span():
+            raise SystemExit(f"Index mismatch on {message!r}: rule {a[0]} vs {b[0]}")
+
+    linear_us = time_per_message(linear.match, messages, args.repeat)
+    indexed_us = time_per_message(indexed.match, messages, args.repeat)
+    print(f"{len(big_patterns)} rules ({len(indexed.always)} unindexed), identical rule selection")
+    print(f"  linear scan:   {linear_us:10.2f} us/message  (build {linear_build * 1000:.0f} ms)")
+    print(f"  keyword index: {indexed_us:10.2f} us/message  (build {indexed_build * 1000:.0f} ms, "
+          f"{linear_us / indexed_us:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
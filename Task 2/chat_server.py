@@ -0,0 +1,300 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import signal
+import time
+from collections import OrderedDict
+
+from chatbot import RuleBasedChatbot
+from metrics import ChatMetrics
+from rule_pack import DEFAULT_RULES_PATH
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_SESSIONS = 100000
+DEFAULT_SESSION_TTL = 30 * 60       # seconds of inactivity before a session is dropped
+DEFAULT_MAX_MEMORY_MB = 256
+DEFAULT_MAX_HISTORY = 50            # exchanges kept per session
+DEFAULT_HOUSEKEEPING_INTERVAL = 5.0
+MAX_LINE_BYTES = 64 * 1024
+
+# Rough sizes used for the memory cap: a session with its bot object and
+# store entry, and one history entry on top of the two strings it holds
+SESSION_OVERHEAD_BYTES = 1200
+ENTRY_OVERHEAD_BYTES = 150
+
+logger = logging.getLogger(__name__)
+
+
+class ChatSession:
+    """One conversation: its own chatbot state on top of the shared rule pack"""
+
+    __slots__ = ('session_id', 'bot', 'last_seen', 'size')
+
+    def __init__(self, session_id, rule_pack, now, history_size=DEFAULT_MAX_HISTORY, transcript_path=None):
+        self.session_id = session_id
+        self.bot = RuleBasedChatbot(rule_pack=rule_pack, history_size=history_size, transcript_path=transcript_path)
+        self.last_seen = now
+        self.size = SESSION_OVERHEAD_BYTES + len(session_id)
+
+
+class SessionStore:
+    """Per-session state with LRU eviction, an idle TTL and a memory cap.
+
+    Sessions are kept in least-recently-used order, so the oldest one is
+    always at the front: eviction and TTL expiry only ever look there.
+    Memory is an estimate from the strings each session holds, which is
+    what grows with traffic; the compiled rules are shared and not counted.
+    """
+
+    def __init__(self, rules_path=DEFAULT_RULES_PATH, max_sessions=DEFAULT_MAX_SESSIONS,
+                 ttl=DEFAULT_SESSION_TTL, max_memory_mb=DEFAULT_MAX_MEMORY_MB, max_history=DEFAULT_MAX_HISTORY,
+                 transcript_dir=None, collect_metrics=False):
+        # The template bot owns the rule pack and watches its file
+        self.template = RuleBasedChatbot(rules_path)
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_memory = max_memory_mb * 1024 * 1024
+        self.max_history = max_history
+        # With a transcript directory every session's full conversation is
+        # kept on disk, so evicting a session loses nothing
+        self.transcript_dir = transcript_dir
+        # One set of rule counters for all sessions
+        self.metrics = ChatMetrics() if collect_metrics else None
+        self.sessions = OrderedDict()
+        self.memory = 0
+        self.created = 0
+        self.evicted = 0
+        self.expired = 0
+
+    @property
+    def rule_pack(self):
+        return self.template.rule_pack
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def get(self, session_id, now=None):
+        """Return the session for `session_id`, creating it (and making room) if needed"""
+        now = time.monotonic() if now is None else now
+        session = self.sessions.get(session_id)
+        if session is not None and now - session.last_seen > self.ttl:
+            self._drop(session_id)
+            self.expired += 1
+            session = None
+        if session is None:
+            session = ChatSession(session_id, self.rule_pack, now, self.max_history,
+                                  self.transcript_path(session_id))
+            session.bot.metrics = self.metrics
+            self.sessions[session_id] = session
+            self.memory += session.size
+            self.created += 1
+            self._enforce_limits(keep=session_id)
+        else:
+            self.sessions.move_to_end(session_id)
+            session.last_seen = now
+        return session
+
+    def respond(self, session_id, message, now=None):
+        """Answer one message in the given session"""
+        session = self.get(session_id, now)
+        bot = session.bot
+        # Pick up a reloaded rule pack; conversation state is untouched
+        bot.rule_pack = self.rule_pack
+        history = bot.conversation_history
+        # A full ring buffer drops its oldest entry on append
+        dropped = history[0] if len(history) == history.max_entries else None
+        total = history.total
+        response = bot.get_response(message)
+        if history.total == total:
+            return response
+
+        added = ENTRY_OVERHEAD_BYTES + len(message) + len(response)
+        if dropped is not None:
+            added -= ENTRY_OVERHEAD_BYTES + len(dropped.user) + len(dropped.bot)
+        session.size += added
+        self.memory += added
+        self._enforce_limits(keep=session_id)
+        return response
+
+    def transcript_path(self, session_id):
+        if self.transcript_dir is None:
+            return None
+        # Session ids come from clients: hash them into safe file names
+        return os.path.join(self.transcript_dir, hashlib.sha1(session_id.encode()).hexdigest() + '.jsonl')
+
+    def _drop(self, session_id):
+        session = self.sessions.pop(session_id)
+        session.bot.conversation_history.flush()
+        self.memory -= session.size
+
+    def flush(self):
+        """Write out every session's buffered transcript entries"""
+        for session in self.sessions.values():
+            session.bot.conversation_history.flush()
+
+    def _enforce_limits(self, keep):
+        while self.sessions and (len(self.sessions) > self.max_sessions or self.memory > self.max_memory):
+            oldest = next(iter(self.sessions))
+            if oldest == keep:
+                break  # never evict the session being answered
+            self._drop(oldest)
+            self.evicted += 1
+
+    def expire(self, now=None):
+        """Drop every session idle for longer than the TTL; returns how many went"""
+        now = time.monotonic() if now is None else now
+        count = 0
+        while self.sessions:
+            oldest, session = next(iter(self.sessions.items()))
+            if now - session.last_seen <= self.ttl:
+                break
+            self._drop(oldest)
+            count += 1
+        self.expired += count
+        return count
+
+    def stats(self):
+        return {
+            'sessions': len(self.sessions),
+            'memory_bytes': self.memory,
+            'created': self.created,
+            'evicted': self.evicted,
+            'expired': self.expired,
+            'rules': len(self.rule_pack.patterns),
+        }
+
+
+class ChatServer:
+    """Line-based TCP chat server: one JSON object per line in each direction.
+
+    Request:  {"session": "alice", "message": "hello"}
+    Response: {"session": "alice", "response": "Hi there!"}
+    Error:    {"session": "alice", "error": "..."} (no "session" if the request is unreadable)
+
+    A connection may carry any number of sessions; answers come back in
+    request order. Messages are answered on the event loop itself: matching
+    takes microseconds, so there is nothing to gain from threads.
+    """
+
+    def __init__(self, store, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                 housekeeping_interval=DEFAULT_HOUSEKEEPING_INTERVAL):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.housekeeping_interval = housekeeping_interval
+        self.requests = 0
+        self.errors = 0
+
+    def handle_line(self, line):
+        try:
+            request = json.loads(line)
+            session_id = str(request['session'])
+            if request.get('stats'):
+                return {'session': session_id, 'stats': self.stats(request['stats'])}
+            message = request['message'].strip()
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.errors += 1
+            return {'error': 'expected {"session": ..., "message": ...}'}
+        self.requests += 1
+        if not message:
+            return {'session': session_id, 'response': "Please say something!"}
+        try:
+            response = self.store.respond(session_id, message)
+        except Exception:
+            # A failing handler or transcript write costs this answer, not the connection
+            self.errors += 1
+            logger.exception("Session %r not answered", session_id)
+            return {'session': session_id, 'error': 'could not answer this message'}
+        return {'session': session_id, 'response': response}
+
+    def stats(self, export=True):
+        """Server counters, plus the rule metrics when collected ('prometheus' for their text format)"""
+        metrics = self.store.metrics
+        if export == 'prometheus':
+            return metrics.to_prometheus(self.store.rule_pack) if metrics is not None else ''
+        stats = dict(self.store.stats(), requests=self.requests, errors=self.errors)
+        if metrics is not None:
+            stats['metrics'] = metrics.snapshot(self.store.rule_pack)
+        return stats
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # line longer than MAX_LINE_BYTES
+                    writer.write(b'{"error": "line too long"}\n')
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                writer.write(json.dumps(self.handle_line(line)).encode() + b'\n')
+                # Only wait when the client is not keeping up with its answers
+                if writer.transport.get_write_buffer_size() > MAX_LINE_BYTES:
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def housekeeping(self):
+        """Expire idle sessions, write out transcripts and pick up edits to the rule pack"""
+        while True:
+            await asyncio.sleep(self.housekeeping_interval)
+            self.store.expire()
+            if self.store.transcript_dir is not None:
+                self.store.flush()
+            try:
+                if self.store.template.check_for_rule_updates():
+                    logger.info("Reloaded %d rules", len(self.store.rule_pack.patterns))
+            except (OSError, ValueError) as e:
+                logger.warning("Rule pack not reloaded, keeping the current rules (%s)", e)
+
+    async def serve(self, ready=None):
+        server = await asyncio.start_server(self.handle_client, self.host, self.port, limit=MAX_LINE_BYTES)
+        self.port = server.sockets[0].getsockname()[1]
+        print(f"Chat server listening on {self.host}:{self.port}", flush=True)
+        if ready is not None:
+            ready.set()
+        housekeeping = asyncio.ensure_future(self.housekeeping())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            housekeeping.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the rule-based chatbot to many sessions over TCP.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="0 picks a free port")
+    parser.add_argument('--rules', default=DEFAULT_RULES_PATH, help="rule pack to serve")
+    parser.add_argument('--max-sessions', type=int, default=DEFAULT_MAX_SESSIONS)
+    parser.add_argument('--session-ttl', type=float, default=DEFAULT_SESSION_TTL, help="idle seconds")
+    parser.add_argument('--max-memory-mb', type=float, default=DEFAULT_MAX_MEMORY_MB)
+    parser.add_argument('--max-history', type=int, default=DEFAULT_MAX_HISTORY, help="exchanges kept in memory")
+    parser.add_argument('--transcript-dir', help="append every session's conversation to a file here")
+    parser.add_argument('--metrics', action='store_true', help="count hits, misses and latency per rule")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    store = SessionStore(args.rules, args.max_sessions, args.session_ttl, args.max_memory_mb, args.max_history,
+                         args.transcript_dir, args.metrics)
+    server = ChatServer(store, args.host, args.port)
+    # Shut down the same way on SIGTERM as on Ctrl-C, so transcripts get flushed
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.flush()
+
+
+if __name__ == "__main__":
+    main()
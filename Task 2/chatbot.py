@@ -1,192 +1,157 @@
-import re
+import argparse
+import os
 import random
-from datetime import datetime
+import re
+import time
+
+from history import DEFAULT_HISTORY_SIZE, ConversationHistory, TranscriptLog
+from metrics import ChatMetrics
+from rule_matcher import RuleMatcher
+from rule_pack import DEFAULT_RULES_PATH, calculate_math, load_rule_pack
+
+NAME_PATTERNS = [
+    r'my name is (\w+)',
+    r'i am (\w+)',
+    r'i\'m (\w+)',
+    r'call me (\w+)'
+]
+# Read-only, so every chatbot can share it
+NAME_MATCHER = RuleMatcher(NAME_PATTERNS)
 
 class RuleBasedChatbot:
-    def __init__(self):
+    def __init__(self, rules_path=DEFAULT_RULES_PATH, rule_pack=None, history_size=DEFAULT_HISTORY_SIZE,
+                 transcript_path=None, seed=None, collect_metrics=False):
         self.name = "ChatBot"
-        self.rules = {
-            # Greetings
-            r'\b(hi|hello|hey|greetings|good morning|good afternoon|good evening)\b': [
-                "Hello! How can I help you today?",
-                "Hi there! Nice to meet you!",
-                "Hey! What can I do for you?",
-                "Greetings! How are you doing?"
-            ],
-            
-            # How are you
-            r'\b(how are you|how do you do|are you ok|are you doing well)\b': [
-                "I'm doing great, thanks for asking! How about you?",
-                "I'm functioning perfectly! How are you?",
-                "All systems operational! How's your day going?",
-                "I'm good, thank you! How are you feeling today?"
-            ],
-            
-            # Name related
-            r'\b(what is your name|what should i call you|who are you|your name)\b': [
-                f"My name is {self.name}! Nice to meet you!",
-                f"I'm {self.name}, your friendly chatbot assistant!",
-                f"You can call me {self.name}!",
-                f"I go by {self.name}. How about you?"
-            ],
-            
-            # User's name
-            r'\b(my name is|i am|i\'m|call me)\s+(\w+)': [
-                "Nice to meet you, {name}!",
-                "Hello {name}! That's a great name!",
-                "Pleased to meet you, {name}!",
-                "Hi {name}! How are you doing?"
-            ],
-            
-            # Time and date
-            r'\b(what time|current time|time now|what is the time)\b': [
-                lambda: f"The current time is {datetime.now().strftime('%H:%M:%S')}",
-                lambda: f"It's {datetime.now().strftime('%I:%M %p')} right now",
-                lambda: f"Current time: {datetime.now().strftime('%H:%M')}"
-            ],
-            
-            r'\b(what date|today\'s date|current date|what day)\b': [
-                lambda: f"Today is {datetime.now().strftime('%A, %B %d, %Y')}",
-                lambda: f"The date is {datetime.now().strftime('%m/%d/%Y')}",
-                lambda: f"It's {datetime.now().strftime('%B %d, %Y')} today"
-            ],
-            
-            # Weather (mock responses)
-            r'\b(weather|temperature|forecast|is it raining|is it sunny)\b': [
-                "I can't check the weather in real-time, but I hope it's nice where you are!",
-                "I don't have access to weather data, but I'm sure it's beautiful outside!",
-                "You might want to check a weather app for accurate information!",
-                "I can't see outside, but I hope the weather is pleasant for you!"
-            ],
-            
-            # Help
-            r'\b(help|what can you do|capabilities|features)\b': [
-                "I can help you with:\n- Greetings and conversations\n- Telling time and date\n- Answering basic questions\n- Having a friendly chat!",
-                "Here's what I can do:\n- Chat with you\n- Tell you the time and date\n- Answer simple questions\n- Keep you company!",
-                "My capabilities include:\n- Basic conversation\n- Time and date information\n- Simple Q&A\n- Friendly interaction!"
-            ],
-            
-            # Goodbye
-            r'\b(bye|goodbye|see you|farewell|exit|quit)\b': [
-                "Goodbye! It was nice chatting with you!",
-                "See you later! Have a great day!",
-                "Take care! Come back anytime!",
-                "Bye! Thanks for the conversation!"
-            ],
-            
-            # Thank you
-            r'\b(thank you|thanks|thx|appreciate it)\b': [
-                "You're welcome! I'm happy to help!",
-                "No problem at all!",
-                "Anytime! That's what I'm here for!",
-                "My pleasure! Is there anything else I can help with?"
-            ],
-            
-            # Jokes
-            r'\b(tell me a joke|joke|funny|humor)\b': [
-                "Why don't scientists trust atoms? Because they make up everything!",
-                "What do you call a fake noodle? An impasta!",
-                "Why did the scarecrow win an award? Because he was outstanding in his field!",
-                "What do you call a bear with no teeth? A gummy bear!"
-            ],
-            
-            # Math (simple calculations)
-            r'\b(what is|calculate|compute)\s+(\d+)\s*([+\-*/])\s*(\d+)': [
-                lambda match: self.calculate_math(match),
-                lambda match: self.calculate_math(match),
-                lambda match: self.calculate_math(match)
-            ],
-            
-            # Default responses for unrecognized input
-            r'.*': [
-                "I'm not sure I understand. Could you rephrase that?",
-                "That's interesting! Tell me more about that.",
-                "I'm still learning. Could you try asking something else?",
-                "I didn't quite catch that. Can you explain differently?"
-            ]
-        }
+        # Responses are picked with the module's generator unless a seed asks
+        # for a reproducible sequence of our own
+        self.rng = random.Random(seed) if seed is not None else random
+        
+        # Patterns and responses live in a JSON rule pack (rules/default.json);
+        # the compiled pack is swapped as a whole on reload. Passing an already
+        # loaded pack lets many conversations share one (see chat_server.py).
+        self.rules_path = rule_pack.path if rule_pack is not None else rules_path
+        self.rule_pack = rule_pack if rule_pack is not None else load_rule_pack(rules_path, bot_name=self.name)
+        # The pack knows which version of the file it came from, so a shared
+        # pack costs each new conversation no stat call
+        self._rules_stat = self.rule_pack.stat
+        self.name_matcher = NAME_MATCHER
         
         self.user_name = None
-        self.conversation_history = []
+        # Only the last `history_size` exchanges stay in memory; with a
+        # transcript the whole conversation is also appended to disk
+        transcript = TranscriptLog(transcript_path) if transcript_path else None
+        self.conversation_history = ConversationHistory(history_size, transcript)
+        
+        # Per-rule hit/miss/latency counters; None keeps them off
+        self.metrics = ChatMetrics() if collect_metrics else None
+    
+    @property
+    def rules(self):
+        """Pattern -> responses of the current rule pack, in priority order"""
+        return self.rule_pack.rules
+    
+    def _stat_rules(self):
+        if self.rules_path is None:
+            return None  # a pack built in memory has no file to watch
+        try:
+            st = os.stat(self.rules_path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+    
+    def reload_rules(self):
+        """Load the rule pack again and swap it in; on error the current rules stay"""
+        pack = load_rule_pack(self.rules_path, bot_name=self.name)
+        # A single reference swap: get_response calls already running keep
+        # the pack they started with, and conversations keep their state
+        self.rule_pack = pack
+        self._rules_stat = pack.stat
+        return pack
+    
+    def check_for_rule_updates(self):
+        """Reload the rules if the pack file changed on disk; returns True if it did"""
+        stat = self._stat_rules()
+        if stat == self._rules_stat:
+            return False
+        # Remember the new state first so a broken file is reported once, not on every message
+        self._rules_stat = stat
+        self.reload_rules()
+        return True
     
     def calculate_math(self, match):
         """Calculate simple math operations"""
-        try:
-            num1 = float(match.group(2))
-            operator = match.group(3)
-            num2 = float(match.group(4))
-            
-            if operator == '+':
-                result = num1 + num2
-            elif operator == '-':
-                result = num1 - num2
-            elif operator == '*':
-                result = num1 * num2
-            elif operator == '/':
-                if num2 == 0:
-                    return "Sorry, I can't divide by zero!"
-                result = num1 / num2
-            else:
-                return "I can only handle basic math operations (+, -, *, /)"
-            
-            return f"The result of {num1} {operator} {num2} is {result}"
-        except:
-            return "Sorry, I couldn't calculate that. Please check your input."
+        return calculate_math(match)
     
-    def extract_user_name(self, message):
+    def extract_user_name(self, message, lowered=False):
         """Extract user's name from the message"""
-        name_patterns = [
-            r'my name is (\w+)',
-            r'i am (\w+)',
-            r'i\'m (\w+)',
-            r'call me (\w+)'
-        ]
-        
-        for pattern in name_patterns:
-            match = re.search(pattern, message.lower())
-            if match:
-                return match.group(1).title()
+        found = self.name_matcher.match(message if lowered else message.lower())
+        if found:
+            return found[1].group(1).title()
         return None
     
     def get_response(self, user_input):
         """Get appropriate response based on user input"""
+        return self.respond(user_input)[0]
+    
+    def respond(self, user_input):
+        """Like get_response, but returns (response, index of the rule that fired or None)"""
         user_input_lower = user_input.lower()
         
         # Extract user name if mentioned
         if not self.user_name:
-            extracted_name = self.extract_user_name(user_input)
+            extracted_name = self.extract_user_name(user_input_lower, lowered=True)
             if extracted_name:
                 self.user_name = extracted_name
         
-        # Check each rule pattern
-        for pattern, responses in self.rules.items():
-            match = re.search(pattern, user_input_lower)
-            if match:
-                # Select a random response from the list
-                response = random.choice(responses)
-                
-                # Handle lambda functions (for dynamic responses)
-                if callable(response):
-                    try:
-                        response = response(match)
-                    except TypeError:
-                        response = response()
-                
-                # Replace placeholders
-                if isinstance(response, str) and '{name}' in response and self.user_name:
-                    response = response.format(name=self.user_name)
-                
-                # Store conversation
-                self.conversation_history.append({
-                    'user': user_input,
-                    'bot': response,
-                    'timestamp': datetime.now()
-                })
-                
-                return response
+        # Find the first rule (in priority order) that matches
+        rule_pack = self.rule_pack
+        metrics = self.metrics
+        if metrics is not None:
+            misses = []
+            start = time.perf_counter_ns()
+        found = rule_pack.match(user_input_lower, misses if metrics is not None else None)
         
+        # Nothing matched but a catch-all rule: answer with the rule whose
+        # example phrases the message is most like, if any is close enough
+        similar = False
+        if rule_pack.similarity is not None and (found is None or found[0] in rule_pack.catch_all):
+            closest = rule_pack.closest_intent(user_input_lower)
+            if closest is not None:
+                found = (closest[0], None)
+                similar = True
+        if metrics is not None:
+            match_ns = time.perf_counter_ns() - start
+        handler_ns = None
+        if found:
+            index, match = found
+            responses = rule_pack.responses[index]
+            # Select a random response from the list
+            response = self.rng.choice(responses)
+            
+            # Handle lambda functions (for dynamic responses)
+            if callable(response):
+                start = time.perf_counter_ns()
+                try:
+                    response = response(match)
+                except TypeError:
+                    response = response()
+                handler_ns = time.perf_counter_ns() - start
+            
+            # Replace placeholders
+            if isinstance(response, str) and '{name}' in response and self.user_name:
+                response = response.format(name=self.user_name)
+            
+            # Store conversation
+            self.conversation_history.append(user_input, response)
+            
+            if metrics is not None:
+                metrics.record(rule_pack, index, misses, match_ns, handler_ns, similar)
+            return response, index
+        
+        if metrics is not None:
+            metrics.record(rule_pack, None, misses, match_ns)
         # Fallback response (shouldn't reach here due to catch-all pattern)
-        return "I'm not sure how to respond to that."
+        return "I'm not sure how to respond to that.", None
     
     def get_conversation_history(self):
         """Get the conversation history"""
@@ -194,20 +159,50 @@ class RuleBasedChatbot:
     
     def reset_conversation(self):
         """Reset conversation history and user name"""
-        self.conversation_history = []
+        self.conversation_history.clear()
         self.user_name = None
 
+def print_stats(chatbot, export):
+    """Show the per-rule counters, or dump them as JSON / Prometheus text"""
+    if export == ['json']:
+        print(chatbot.metrics.to_json(chatbot.rule_pack))
+        return
+    if export == ['prometheus']:
+        print(chatbot.metrics.to_prometheus(chatbot.rule_pack), end='')
+        return
+    
+    snapshot = chatbot.metrics.snapshot(chatbot.rule_pack)
+    print(f"\n{chatbot.name}: {snapshot['messages']} messages, "
+          f"{snapshot['fallthrough_rate']:.0%} answered by the catch-all, "
+          f"{snapshot['similarity_hits']} by similarity to example phrases")
+    print(f"  {'#':>2}  {'hits':>6}  {'misses':>6}  {'match us':>8}  {'handler us':>10}  pattern")
+    for rule in snapshot['rules']:
+        handler = rule['handler_latency']
+        handler_us = f"{handler['mean_us']:.1f}" if handler['count'] else '-'
+        print(f"  {rule['index']:>2}  {rule['hits']:>6}  {rule['misses']:>6}  "
+              f"{rule['match_latency']['mean_us']:>8.1f}  {handler_us:>10}  {rule['pattern'][:50]}")
+    print()
+
 def main():
     """Main function to run the chatbot"""
-    chatbot = RuleBasedChatbot()
+    parser = argparse.ArgumentParser(description="Chat with the rule-based chatbot.")
+    parser.add_argument('--rules', default=DEFAULT_RULES_PATH, help="rule pack to load")
+    parser.add_argument('--history-size', type=int, default=DEFAULT_HISTORY_SIZE,
+                        help="exchanges kept in memory")
+    parser.add_argument('--transcript', help="also append the whole conversation to this file")
+    args = parser.parse_args()
+    chatbot = RuleBasedChatbot(args.rules, history_size=args.history_size, transcript_path=args.transcript,
+                               collect_metrics=True)
     
     print("=" * 50)
     print("🤖 Welcome to Rule-Based ChatBot!")
     print("=" * 50)
     print("Type 'quit' or 'exit' to end the conversation")
     print("Type 'help' to see what I can do")
-    print("Type 'history' to see our conversation")
+    print("Type 'history' to see our conversation ('history 2' for the page before)")
     print("Type 'reset' to start fresh")
+    print("Type 'reload' to reload the rules")
+    print("Type 'stats' to see which rules fired ('stats json' or 'stats prometheus' to export)")
     print("=" * 50)
     print()
     
@@ -215,15 +210,24 @@ def main():
         try:
             user_input = input("You: ").strip()
             
+            # Pick up edits to the rule pack between messages
+            try:
+                chatbot.check_for_rule_updates()
+            except (OSError, ValueError) as e:
+                print(f"{chatbot.name}: Rule pack not reloaded ({e})")
+            
             if user_input.lower() in ['quit', 'exit', 'bye']:
                 print(f"{chatbot.name}: Goodbye! It was nice chatting with you!")
                 break
             
-            elif user_input.lower() == 'history':
-                history = chatbot.get_conversation_history()
-                if history:
+            elif re.fullmatch(r'history(?: +\d+)?', user_input.lower()):
+                words = user_input.split()
+                page = max(int(words[1]) - 1, 0) if len(words) > 1 else 0
+                # Show 5 exchanges per page, older pages come from the transcript
+                entries = chatbot.get_conversation_history().page(page, 5)
+                if entries:
                     print(f"\n{chatbot.name}: Here's our conversation history:")
-                    for entry in history[-5:]:  # Show last 5 exchanges
+                    for entry in entries:
                         print(f"You: {entry['user']}")
                         print(f"{chatbot.name}: {entry['bot']}")
                         print()
@@ -236,6 +240,18 @@ def main():
                 print(f"{chatbot.name}: Conversation reset! Let's start fresh!")
                 continue
             
+            elif user_input.lower() in ['stats', 'stats json', 'stats prometheus']:
+                print_stats(chatbot, user_input.lower().split()[1:])
+                continue
+            
+            elif user_input.lower() == 'reload':
+                try:
+                    pack = chatbot.reload_rules()
+                    print(f"{chatbot.name}: Reloaded {len(pack.patterns)} rules from '{pack.name}'!")
+                except (OSError, ValueError) as e:
+                    print(f"{chatbot.name}: Couldn't reload the rules, keeping the current ones ({e})")
+                continue
+            
             elif not user_input:
                 print(f"{chatbot.name}: Please say something!")
                 continue
@@ -249,6 +265,8 @@ def main():
             break
         except Exception as e:
             print(f"{chatbot.name}: Sorry, something went wrong. Please try again!")
+    
+    chatbot.get_conversation_history().flush()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,208 @@
+import json
+import os
+import struct
+import time
+from collections import deque
+from datetime import datetime
+
+DEFAULT_HISTORY_SIZE = 50
+DEFAULT_FLUSH_EVERY = 32        # entries buffered before a transcript write
+DEFAULT_FLUSH_INTERVAL = 2.0    # ... or seconds since the oldest buffered one
+
+# The index holds one little-endian uint64 per record: the offset its line ends at
+_OFFSET = struct.Struct('<Q')
+
+
+class HistoryEntry:
+    """One exchange; reads like the dicts the history used to hold (entry['user'])"""
+
+    __slots__ = ('user', 'bot', 'created')
+
+    def __init__(self, user, bot, created):
+        self.user = user
+        self.bot = bot
+        self.created = created  # seconds since the epoch
+
+    @property
+    def timestamp(self):
+        return datetime.fromtimestamp(self.created)
+
+    def __getitem__(self, key):
+        if key not in ('user', 'bot', 'timestamp'):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __repr__(self):
+        return f"HistoryEntry(user={self.user!r}, bot={self.bot!r}, created={self.created!r})"
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class TranscriptLog:
+    """Append-only transcript on disk with an offset index, written in batches.
+
+    Records are JSON lines in `path`; `path + '.idx'` holds the end offset
+    of each line, so record i is read with two seeks and no scan. The data
+    is always written before its index entries, and opening a log trims
+    whatever a crash left half-written, so the two files stay consistent.
+    Files are only open while being written or read, so thousands of
+    sessions can each keep a log without holding file descriptors.
+    """
+
+    def __init__(self, path, flush_every=DEFAULT_FLUSH_EVERY, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.pending = []
+        self._pending_since = None
+        self.flushed, self._data_end = self._recover()
+
+    def _recover(self):
+        """Return (records on disk, data size), trimming a torn tail left by a crash.
+
+        Either file may be missing: a missing one counts as empty, so a
+        lone index is emptied and lone data is dropped as never indexed.
+        Files are only ever cut shorter.
+        """
+        data_size = _file_size(self.path)
+        index_size = _file_size(self.index_path)
+        count = index_size // _OFFSET.size
+        end = 0
+        if count:
+            with open(self.index_path, 'rb') as index:
+                while count:
+                    index.seek((count - 1) * _OFFSET.size)
+                    last = _OFFSET.unpack(index.read(_OFFSET.size))[0]
+                    if last <= data_size:
+                        end = last
+                        break
+                    count -= 1  # indexed, but its data never made it to disk
+        if index_size > count * _OFFSET.size:
+            os.truncate(self.index_path, count * _OFFSET.size)
+        if data_size > end:
+            os.truncate(self.path, end)  # data written, index entry not
+        return count, end
+
+    def __len__(self):
+        return self.flushed + len(self.pending)
+
+    def append(self, entry):
+        self.pending.append(entry)
+        now = time.monotonic()
+        if self._pending_since is None:
+            self._pending_since = now
+        if len(self.pending) >= self.flush_every or now - self._pending_since >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        lines = [json.dumps({'t': e.created, 'user': e.user, 'bot': e.bot}).encode() + b'\n' for e in self.pending]
+        offsets = []
+        end = self._data_end
+        for line in lines:
+            end += len(line)
+            offsets.append(_OFFSET.pack(end))
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'ab') as data:
+            data.write(b''.join(lines))
+        with open(self.index_path, 'ab') as index:
+            index.write(b''.join(offsets))
+        self.flushed += len(self.pending)
+        self._data_end = end
+        self.pending = []
+        self._pending_since = None
+
+    def read(self, start, count):
+        """Records [start, start + count) in order, from disk and the unflushed buffer"""
+        start = max(0, start)
+        stop = min(len(self), start + count)
+        entries = []
+        if start < min(stop, self.flushed):
+            disk_stop = min(stop, self.flushed)
+            with open(self.index_path, 'rb') as index:
+                # The end of the record before `start` is where `start` begins
+                index.seek((start - 1) * _OFFSET.size if start else 0)
+                raw = index.read((disk_stop - start + (1 if start else 0)) * _OFFSET.size)
+            ends = [value for (value,) in _OFFSET.iter_unpack(raw)]
+            begin = ends.pop(0) if start else 0
+            with open(self.path, 'rb') as data:
+                data.seek(begin)
+                blob = data.read(ends[-1] - begin)
+            for line in blob.splitlines():
+                record = json.loads(line)
+                entries.append(HistoryEntry(record['user'], record['bot'], record['t']))
+        if stop > self.flushed:
+            entries.extend(self.pending[max(start, self.flushed) - self.flushed:stop - self.flushed])
+        return entries
+
+
+class ConversationHistory:
+    """The last `max_entries` exchanges in memory, optionally backed by a full transcript.
+
+    Memory stays flat however long a conversation runs: older entries
+    fall out of the ring buffer, and with a transcript they can still be
+    paged back from disk. Indexing and slicing work on the in-memory
+    window, like the list this replaces.
+    """
+
+    def __init__(self, max_entries=DEFAULT_HISTORY_SIZE, transcript=None):
+        self.max_entries = max_entries
+        self.transcript = transcript
+        self._entries = deque(maxlen=max_entries)
+        # Exchanges so far, counting those only the transcript still has
+        self.total = len(transcript) if transcript is not None else 0
+        # Where paging stops going back: the exchange after the last clear()
+        self.first = 0
+
+    def append(self, user, bot, created=None):
+        entry = HistoryEntry(user, bot, time.time() if created is None else created)
+        self._entries.append(entry)
+        self.total += 1
+        if self.transcript is not None:
+            self.transcript.append(entry)
+        return entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __bool__(self):
+        return bool(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(self._entries)[key]
+        return self._entries[key]
+
+    def page(self, page=0, per_page=5):
+        """Entries of one page, oldest first; page 0 is the most recent"""
+        stop = self.total - page * per_page
+        start = max(self.first, stop - per_page)
+        if stop <= self.first:
+            return []
+        first_in_memory = self.total - len(self._entries)
+        if start >= first_in_memory:
+            return list(self._entries)[start - first_in_memory:stop - first_in_memory]
+        if self.transcript is None:
+            return list(self._entries)[:max(0, stop - first_in_memory)]
+        return self.transcript.read(start, stop - start)
+
+    def clear(self):
+        """Start over: paging only goes back to here, though a transcript keeps what was said"""
+        self._entries.clear()
+        self.first = self.total
+
+    def flush(self):
+        if self.transcript is not None:
+            self.transcript.flush()
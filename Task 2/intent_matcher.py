@@ -0,0 +1,117 @@
+import math
+import re
+from collections import Counter
+
+# numpy and scipy are optional: without them the chatbot simply has no
+# similarity fallback and unmatched messages go to the catch-all as before
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_NGRAM_RANGE = (3, 5)
+
+_SPACES = re.compile(r'\s+')
+
+
+def available():
+    """True when numpy and scipy are installed"""
+    return np is not None
+
+
+def char_ngrams(text, ngram_range=DEFAULT_NGRAM_RANGE):
+    """Character n-grams of the normalised text, padded so word edges count"""
+    text = ' ' + _SPACES.sub(' ', text.lower()).strip() + ' '
+    low, high = ngram_range
+    return [text[i:i + n] for n in range(low, high + 1) for i in range(len(text) - n + 1)]
+
+
+class IntentMatcher:
+    """Nearest example phrase by TF-IDF cosine similarity over character n-grams.
+
+    Every example becomes an L2-normalised row of sublinear TF-IDF weights,
+    stored transposed (one row per n-gram) in a CSR matrix. A message only
+    touches the rows of the n-grams it contains, so scoring it against all
+    examples is one sparse vector-matrix product whatever the number of
+    examples; the best one above the threshold gives the intent. Character
+    n-grams make the match forgiving of typos and word forms.
+    """
+
+    def __init__(self, examples, threshold=DEFAULT_THRESHOLD, ngram_range=DEFAULT_NGRAM_RANGE):
+        """`examples` is an iterable of (label, phrase); labels can be anything picklable"""
+        if not available():
+            raise ImportError("The similarity fallback needs numpy and scipy. "
+                              "Please install them using: pip install numpy scipy")
+        self.threshold = threshold
+        self.ngram_range = tuple(ngram_range)
+        self.labels = []
+        self.vocabulary = {}
+
+        counts = []
+        document_frequency = Counter()
+        for label, phrase in examples:
+            grams = Counter(char_ngrams(phrase, self.ngram_range))
+            if not grams:
+                continue
+            self.labels.append(label)
+            counts.append(grams)
+            document_frequency.update(grams.keys())
+        if not counts:
+            raise ValueError("no usable example phrases")
+
+        for gram in document_frequency:
+            self.vocabulary[gram] = len(self.vocabulary)
+        total = len(counts)
+        self.idf = np.empty(len(self.vocabulary), dtype=np.float32)
+        for gram, column in self.vocabulary.items():
+            self.idf[column] = math.log((1 + total) / (1 + document_frequency[gram])) + 1
+        # An n-gram no example has would get the highest idf of all
+        self._unknown_weight = float(self.idf.max()) ** 2
+
+        rows, columns, values = [], [], []
+        for row, grams in enumerate(counts):
+            cols = np.fromiter((self.vocabulary[g] for g in grams), dtype=np.int64, count=len(grams))
+            weights = (1 + np.log(np.fromiter(grams.values(), dtype=np.float32, count=len(grams)))) * self.idf[cols]
+            weights /= np.linalg.norm(weights)
+            rows.append(np.full(len(grams), row, dtype=np.int64))
+            columns.append(cols)
+            values.append(weights)
+        # n-gram x example, so a message selects the few rows it needs
+        self.weights = sparse.csr_matrix(
+            (np.concatenate(values), (np.concatenate(columns), np.concatenate(rows))),
+            shape=(len(self.vocabulary), total), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _query(self, text):
+        every_gram = char_ngrams(text, self.ngram_range)
+        grams = Counter(gram for gram in every_gram if gram in self.vocabulary)
+        if not grams:
+            return None, None
+        cols = np.fromiter((self.vocabulary[g] for g in grams), dtype=np.int64, count=len(grams))
+        weights = (1 + np.log(np.fromiter(grams.values(), dtype=np.float32, count=len(grams)))) * self.idf[cols]
+        # Normalised over all of the message's n-grams: unknown ones still
+        # make it less similar to everything
+        unknown = len(every_gram) - sum(grams.values())
+        norm = math.sqrt(float(weights @ weights) + unknown * self._unknown_weight)
+        return cols, weights / norm
+
+    def scores(self, text):
+        """Cosine similarity of `text` to every example, as a dense array"""
+        cols, weights = self._query(text)
+        if cols is None:
+            return np.zeros(len(self.labels), dtype=np.float32)
+        return np.asarray(self.weights[cols].T @ weights).ravel()
+
+    def match(self, text, threshold=None):
+        """Return (label, score) of the most similar example, or None below the threshold"""
+        threshold = self.threshold if threshold is None else threshold
+        similarity = self.scores(text)
+        best = int(similarity.argmax())
+        score = float(similarity[best])
+        if score < threshold:
+            return None
+        return self.labels[best], score
@@ -0,0 +1,135 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from benchmark_chatbot import make_corpus
+from chat_server import DEFAULT_HOST, DEFAULT_PORT, MAX_LINE_BYTES
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def run_connection(host, port, session_ids, corpus, requests, rng, latencies, counters):
+    """Send `requests` messages, one at a time, spread over this connection's sessions"""
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE_BYTES)
+    try:
+        for _ in range(requests):
+            session_id = rng.choice(session_ids)
+            line = json.dumps({'session': session_id, 'message': rng.choice(corpus)}).encode() + b'\n'
+            start = time.perf_counter()
+            writer.write(line)
+            reply = await reader.readline()
+            latencies.append(time.perf_counter() - start)
+            if not reply:
+                counters['errors'] += 1
+                break
+            answer = json.loads(reply)
+            if answer.get('session') != session_id or 'response' not in answer:
+                counters['errors'] += 1
+    finally:
+        writer.close()
+
+
+async def fetch_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"session": "load-generator", "stats": true}\n')
+    reply = json.loads(await reader.readline())
+    writer.close()
+    return reply.get('stats', {})
+
+
+async def run_load(args):
+    corpus = make_corpus(10000, args.seed)
+    rng = random.Random(args.seed)
+    sessions = [f"user-{i}" for i in range(args.sessions)]
+    connections = min(args.connections, args.sessions)
+    per_connection = args.requests // connections
+    latencies = []
+    counters = {'errors': 0}
+
+    # Session i always talks over connection i % connections
+    tasks = [run_connection(args.host, args.port, sessions[c::connections], corpus, per_connection,
+                            random.Random(rng.random()), latencies, counters)
+             for c in range(connections)]
+    start = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    server_stats = await fetch_stats(args.host, args.port)
+
+    latencies.sort()
+    return {
+        'sessions': args.sessions,
+        'connections': connections,
+        'requests': len(latencies),
+        'errors': counters['errors'],
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_s': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 3),
+            'p90': round(percentile(latencies, 0.90) * 1000, 3),
+            'p99': round(percentile(latencies, 0.99) * 1000, 3),
+            'p999': round(percentile(latencies, 0.999) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+        'server': server_stats,
+    }
+
+
+def spawn_server(args):
+    """Start chat_server.py in a child process on a free port and wait until it listens"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chat_server.py')
+    process = subprocess.Popen([sys.executable, script, '--host', args.host, '--port', '0'],
+                               stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith('Chat server listening on'):
+        process.kill()
+        raise SystemExit(f"Server failed to start: {line!r}")
+    args.port = int(line.rsplit(':', 1)[1])
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the chat server with many concurrent sessions.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--spawn', action='store_true', help="start a server of our own to test against")
+    parser.add_argument('--sessions', type=int, default=5000)
+    parser.add_argument('--connections', type=int, default=200, help="concurrent client connections")
+    parser.add_argument('--requests', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help="print the raw report")
+    args = parser.parse_args()
+
+    process = spawn_server(args) if args.spawn else None
+    try:
+        report = asyncio.run(run_load(args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    latency = report['latency_ms']
+    print(f"{report['requests']} requests, {report['sessions']} sessions over {report['connections']} connections, "
+          f"{report['errors']} errors")
+    print(f"  throughput: {report['requests_per_s']:.0f} requests/s")
+    print(f"  latency:    p50 {latency['p50']:.2f} ms  p90 {latency['p90']:.2f} ms  "
+          f"p99 {latency['p99']:.2f} ms  p99.9 {latency['p999']:.2f} ms  max {latency['max']:.2f} ms")
+    server = report['server']
+    if server:
+        print(f"  server:     {server['sessions']} live sessions, ~{server['memory_bytes'] / 1e6:.1f} MB, "
+              f"{server['evicted']} evicted, {server['expired']} expired")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import json
+from bisect import bisect_left
+
+# Upper bounds (microseconds) of the latency histogram buckets; the last one catches the rest
+LATENCY_BUCKETS_US = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float('inf'))
+
+
+class LatencyHistogram:
+    __slots__ = ('counts', 'total_ns', 'max_ns')
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS_US)
+        self.total_ns = 0
+        self.max_ns = 0
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def record(self, ns):
+        self.counts[bisect_left(LATENCY_BUCKETS_US, ns / 1000)] += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def to_dict(self):
+        count = self.count
+        return {
+            'count': count,
+            'mean_us': self.total_ns / count / 1000 if count else 0.0,
+            'max_us': self.max_ns / 1000,
+            'buckets': [{'le': 'inf' if b == float('inf') else b, 'count': c}
+                        for b, c in zip(LATENCY_BUCKETS_US, self.counts)],
+        }
+
+
+class RuleStats:
+    """Counters for one pattern"""
+
+    __slots__ = ('hits', 'misses', 'match', 'handler')
+
+    def __init__(self):
+        self.hits = 0        # messages this rule answered
+        self.misses = 0      # messages its regex was tried on without matching
+        self.match = LatencyHistogram()     # matching time of the messages it answered
+        self.handler = LatencyHistogram()   # time in dynamic responses (time, date, math)
+
+
+class ChatMetrics:
+    """Opt-in per-rule hit, miss and latency counters.
+
+    Attach one to a chatbot (`bot.metrics = ChatMetrics()`, or
+    `RuleBasedChatbot(collect_metrics=True)`) and every answer is counted
+    against the rule that fired; with `metrics` left at None the bot only
+    pays for one `is None` test per message. A rule counts a miss each
+    time its regex runs on a message without matching, so a rule that
+    misses a lot but rarely hits is one to move down the pack. Counters
+    are kept per pattern, so they carry over a rule pack reload for the
+    rules that did not change, and one instance can be shared by many
+    chatbots (see chat_server.py).
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.messages = 0
+        self.unmatched = 0      # no rule matched at all
+        self.similarity_hits = 0    # answered by the similarity fallback instead of the catch-all
+        self.rules = {}         # pattern -> RuleStats
+        self._pack = None
+        self._bound = []
+
+    def for_pack(self, rule_pack):
+        """RuleStats of the pack's rules, in rule order"""
+        if rule_pack is not self._pack:
+            self._bound = [self.rules.setdefault(p, RuleStats()) for p in rule_pack.patterns]
+            self._pack = rule_pack
+        return self._bound
+
+    def record(self, rule_pack, index, misses, match_ns, handler_ns=None, similar=False):
+        """Count one message answered by rule `index` (None: nothing matched)"""
+        self.messages += 1
+        if similar:
+            self.similarity_hits += 1
+        bound = self.for_pack(rule_pack)
+        for missed in misses:
+            bound[missed].misses += 1
+        if index is None:
+            self.unmatched += 1
+            return
+        stats = bound[index]
+        stats.hits += 1
+        stats.match.record(match_ns)
+        if handler_ns is not None:
+            stats.handler.record(handler_ns)
+
+    def snapshot(self, rule_pack=None):
+        """Counters as a dict; with a pack, its rules in order plus the catch-all figures"""
+        rule_pack = rule_pack or self._pack
+        if rule_pack is not None:
+            patterns = list(rule_pack.patterns)
+            # The pack's catch-all rules are where messages nothing else wanted end up
+            catch_all = sorted(rule_pack.catch_all)
+        else:
+            patterns, catch_all = list(self.rules), []
+        rules = []
+        for index, pattern in enumerate(patterns):
+            stats = self.rules.get(pattern) or RuleStats()
+            tried = stats.hits + stats.misses
+            rules.append({
+                'index': index,
+                'pattern': pattern,
+                'hits': stats.hits,
+                'misses': stats.misses,
+                'hit_rate': stats.hits / tried if tried else 0.0,
+                'share': stats.hits / self.messages if self.messages else 0.0,
+                'match_latency': stats.match.to_dict(),
+                'handler_latency': stats.handler.to_dict(),
+            })
+        fallthrough = sum(rules[i]['hits'] for i in catch_all)
+        return {
+            'messages': self.messages,
+            'unmatched': self.unmatched,
+            'similarity_hits': self.similarity_hits,
+            'catch_all_rules': catch_all,
+            'fallthrough': fallthrough,
+            'fallthrough_rate': fallthrough / self.messages if self.messages else 0.0,
+            'rules': rules,
+        }
+
+    def to_json(self, rule_pack=None, indent=2):
+        return json.dumps(self.snapshot(rule_pack), indent=indent)
+
+    def to_prometheus(self, rule_pack=None, prefix='chatbot'):
+        """Counters in the Prometheus text exposition format"""
+        snapshot = self.snapshot(rule_pack)
+        lines = [
+            f"# HELP {prefix}_messages_total Messages answered.",
+            f"# TYPE {prefix}_messages_total counter",
+            f"{prefix}_messages_total {snapshot['messages']}",
+            f"# HELP {prefix}_fallthrough_total Messages answered by a catch-all rule.",
+            f"# TYPE {prefix}_fallthrough_total counter",
+            f"{prefix}_fallthrough_total {snapshot['fallthrough']}",
+            f"# HELP {prefix}_unmatched_total Messages no rule matched.",
+            f"# TYPE {prefix}_unmatched_total counter",
+            f"{prefix}_unmatched_total {snapshot['unmatched']}",
+            f"# HELP {prefix}_similarity_hits_total Messages answered by the similarity fallback.",
+            f"# TYPE {prefix}_similarity_hits_total counter",
+            f"{prefix}_similarity_hits_total {snapshot['similarity_hits']}",
+        ]
+        for name, key, help_text in (('rule_hits_total', 'hits', "Messages answered by the rule."),
+                                     ('rule_misses_total', 'misses', "Messages the rule was tried on without matching.")):
+            lines += [f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} counter"]
+            lines += [f"{prefix}_{name}{{{_labels(rule)}}} {rule[key]}" for rule in snapshot['rules']]
+        for name, key, help_text in (('rule_match_seconds', 'match_latency', "Matching time of answered messages."),
+                                     ('rule_handler_seconds', 'handler_latency', "Time spent in dynamic responses.")):
+            lines += [f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} histogram"]
+            for rule in snapshot['rules']:
+                latency, labels = rule[key], _labels(rule)
+                cumulative = 0
+                for bucket in latency['buckets']:
+                    cumulative += bucket['count']
+                    le = '+Inf' if bucket['le'] == 'inf' else repr(bucket['le'] / 1e6)
+                    lines.append(f'{prefix}_{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"{prefix}_{name}_sum{{{labels}}} {latency['mean_us'] * latency['count'] / 1e6!r}")
+                lines.append(f"{prefix}_{name}_count{{{labels}}} {latency['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(rule):
+    pattern = rule['pattern'].replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'rule="{rule["index"]}",pattern="{pattern}"'
@@ -0,0 +1,303 @@
+import re
+
+_ESCAPED_LITERALS = {'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'v': '\v'}
+# Escapes longer than a backslash and one character: hex and Unicode code
+# points, named characters, octal codes and group references
+_LONG_ESCAPE = re.compile(r'\\(?:x[0-9a-fA-F]{2}|u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8}|N\{[^}]*\}'
+                          r'|0[0-7]{0,2}|[1-7][0-7]{2}|[1-9][0-9]?)')
+
+
+def _group_end(pattern, start):
+    """Index just past the ')' closing the group that opens at `start`."""
+    depth = 0
+    i = start
+    in_class = False
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if in_class:
+            if ch == ']':
+                in_class = False
+        elif ch == '[':
+            in_class = True
+            if pattern[i + 1:i + 2] == ']':
+                i += 1
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise ValueError("unbalanced group")
+
+
+def _split_branches(pattern):
+    """Split a pattern on its top-level '|'."""
+    branches, start, depth, i, in_class = [], 0, 0, 0, False
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if in_class:
+            if ch == ']':
+                in_class = False
+        elif ch == '[':
+            in_class = True
+            if pattern[i + 1:i + 2] == ']':
+                i += 1
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == '|' and depth == 0:
+            branches.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    branches.append(pattern[start:])
+    return branches
+
+
+def _quantifier(pattern, pos):
+    """Read a quantifier at `pos`: (minimum repeat count or None if absent, position after it)."""
+    ch = pattern[pos:pos + 1]
+    if ch in ('?', '*', '+'):
+        minimum, pos = (1 if ch == '+' else 0), pos + 1
+    else:
+        bounds = re.match(r'\{(\d*)(,?)(\d*)\}', pattern[pos:])
+        if ch != '{' or not bounds or not (bounds.group(1) or bounds.group(3)):
+            return None, pos
+        minimum, pos = int(bounds.group(1) or 0), pos + bounds.end()
+    if pattern[pos:pos + 1] in ('?', '+'):  # lazy or possessive
+        pos += 1
+    return minimum, pos
+
+
+def _sequence_literals(pattern):
+    """Best literal set for a branch without top-level '|': one member must appear in any match."""
+    candidates = []
+    run = ''
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        literal = None   # a literal character
+        group = None     # literal set of a consuming group
+        end = i + 1
+        if ch == '\\':
+            nxt = pattern[i + 1:i + 2]
+            end = i + 2
+            long_escape = _LONG_ESCAPE.match(pattern, i)
+            if long_escape:
+                end = long_escape.end()  # skipped whole: it only ends the run
+            elif nxt in _ESCAPED_LITERALS:
+                literal = _ESCAPED_LITERALS[nxt]
+            elif nxt and not nxt.isalnum():
+                literal = nxt
+        elif ch == '(':
+            end = _group_end(pattern, i)
+            inner = pattern[i + 1:end - 1]
+            if inner.startswith('?:'):
+                group = pattern_literals(inner[2:])
+            elif inner.startswith('?P<'):
+                group = pattern_literals(inner[inner.index('>') + 1:])
+            elif inner.startswith('?'):
+                if re.match(r'\?[aiLmsux-]+[:)]?', inner):
+                    return None  # inline flags change how literals match
+                # lookaround or conditional: consumes nothing
+            else:
+                group = pattern_literals(inner)
+        elif ch == '[':
+            j = i + 1
+            if pattern[j:j + 1] == '^':
+                j += 1
+            if pattern[j:j + 1] == ']':
+                j += 1
+            while j < len(pattern) and pattern[j] != ']':
+                j += 2 if pattern[j] == '\\' else 1
+            end = j + 1
+        elif ch not in '.^$*+?{}|)':
+            literal = ch
+
+        minimum, end = _quantifier(pattern, end)
+        if literal is not None and minimum != 0:
+            run += literal
+            if minimum is None:
+                i = end
+                continue  # exactly once: the run goes on
+        # Anything else ends the current run of adjacent literal characters
+        if run:
+            candidates.append({run})
+        run = ''
+        if group and minimum != 0:
+            candidates.append(group)
+        i = end
+    if run:
+        candidates.append({run})
+    if not candidates:
+        return None
+    # Prefer the set whose shortest literal is longest: the fewest false hits
+    return max(candidates, key=lambda literals: min(len(s) for s in literals))
+
+
+def pattern_literals(pattern):
+    """Literal strings of which at least one occurs in every text the pattern matches.
+
+    Returns None when no such set can be worked out, e.g. for '.*'.
+    The analysis is conservative: anything it does not understand simply
+    yields fewer (or no) literals, never wrong ones.
+    """
+    literals = set()
+    for branch in _split_branches(pattern):
+        branch_literals = _sequence_literals(branch)
+        if not branch_literals:
+            return None
+        literals |= branch_literals
+    return literals
+
+
+class AhoCorasick:
+    """Multi-string matcher: reports which keyword ids occur in a text in one pass."""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [frozenset()]
+
+    def add(self, keyword, value):
+        node = 0
+        for ch in keyword:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(frozenset())
+            node = nxt
+        self.output[node] = self.output[node] | {value}
+
+    def build(self):
+        """Compute failure links breadth-first and fold outputs along them."""
+        queue = list(self.goto[0].values())
+        for node in queue:
+            self.fail[node] = 0
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and ch not in self.goto[state]:
+                    state = self.fail[state]
+                fallback = self.goto[state].get(ch, 0)
+                self.fail[child] = fallback if fallback != child else 0
+                self.output[child] = self.output[child] | self.output[self.fail[child]]
+
+    def search(self, text):
+        """Return the set of values whose keywords occur anywhere in `text`."""
+        goto, fail, output = self.goto, self.fail, self.output
+        found = set()
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node]:
+                found |= output[node]
+        return found
+
+
+class RuleMatcher:
+    """Finds the first of an ordered list of patterns that matches a message.
+
+    Patterns are compiled once, up front, and tried in order through the
+    compiled objects; that skips the pattern-cache lookup which
+    `re.search(pattern_string, ...)` pays on every call. A single combined
+    lookahead alternation gives the same result in one regex call but is
+    slower on CPython's engine (see benchmark_chatbot.py): the leading \\b of
+    each rule defeats the literal-prefix scan, so every position is retried
+    against every branch.
+
+    Every pattern's required literals also go into an Aho-Corasick
+    automaton. One pass over the message yields the few rules that can
+    possibly match, and only those regexes run, still in rule order, so
+    the cost barely grows with the number of rules. Rules without
+    extractable literals (like the '.*' catch-all) are always candidates.
+    The index already pays off on the 13 built-in rules; `use_index=False`
+    keeps the plain ordered scan.
+
+    A matcher pickles without its compiled regexes (only the patterns and
+    the index), and one restored from a pickle compiles each pattern the
+    first time that rule is a candidate.
+    """
+
+    def __init__(self, patterns, flags=0, use_index=True):
+        self.patterns = list(patterns)
+        self.flags = flags
+        self._searches = [re.compile(p, flags).search for p in self.patterns]
+
+        self.index = None
+        self.always = []
+        if use_index:
+            self._build_index(flags)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_searches']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._searches = [None] * len(self.patterns)
+
+    @property
+    def compiled(self):
+        return [self._search(index).__self__ for index in range(len(self.patterns))]
+
+    def _search(self, index):
+        search = self._searches[index]
+        if search is None:
+            search = self._searches[index] = re.compile(self.patterns[index], self.flags).search
+        return search
+
+    def _build_index(self, flags):
+        self._fold_case = bool(flags & re.IGNORECASE)
+        self.index = AhoCorasick()
+        for index, pattern in enumerate(self.patterns):
+            try:
+                literals = pattern_literals(pattern)
+            except ValueError:
+                literals = None
+            if not literals:
+                self.always.append(index)
+                continue
+            for literal in literals:
+                self.index.add(literal.lower() if self._fold_case else literal, index)
+        self.index.build()
+
+    def candidates(self, text):
+        """Indexes of the rules that may match `text`, in priority order."""
+        if self.index is None:
+            return range(len(self._searches))
+        found = self.index.search(text.lower() if self._fold_case else text)
+        found.update(self.always)
+        return sorted(found)
+
+    def match(self, text, misses=None):
+        """Return (rule index, match) for the first matching pattern, or None.
+
+        Indexes of the patterns tried without matching are appended to
+        `misses` when a list is given.
+        """
+        searches = self._searches
+        for index in self.candidates(text):
+            match = (searches[index] or self._search(index))(text)
+            if match:
+                return index, match
+            if misses is not None:
+                misses.append(index)
+        return None
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+from datetime import datetime
+
+import intent_matcher
+from rule_matcher import RuleMatcher
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules', 'default.json')
+PACK_VERSION = 1
+# Bump when the pickled layout (or RuleMatcher's state) changes
+CACHE_VERSION = 2
+CACHE_DIR_NAME = '.rulecache'
+
+
+def calculate_math(match):
+    """Calculate simple math operations"""
+    try:
+        num1 = float(match.group(2))
+        operator = match.group(3)
+        num2 = float(match.group(4))
+
+        if operator == '+':
+            result = num1 + num2
+        elif operator == '-':
+            result = num1 - num2
+        elif operator == '*':
+            result = num1 * num2
+        elif operator == '/':
+            if num2 == 0:
+                return "Sorry, I can't divide by zero!"
+            result = num1 / num2
+        else:
+            return "I can only handle basic math operations (+, -, *, /)"
+
+        return f"The result of {num1} {operator} {num2} is {result}"
+    except:
+        return "Sorry, I couldn't calculate that. Please check your input."
+
+
+# Dynamic responses a rule pack can refer to by name, in place of the
+# lambdas the rules used to hold. Each one gets the regex match.
+BUILTIN_HANDLERS = {
+    'current_time': [
+        lambda match: f"The current time is {datetime.now().strftime('%H:%M:%S')}",
+        lambda match: f"It's {datetime.now().strftime('%I:%M %p')} right now",
+        lambda match: f"Current time: {datetime.now().strftime('%H:%M')}"
+    ],
+    'current_date': [
+        lambda match: f"Today is {datetime.now().strftime('%A, %B %d, %Y')}",
+        lambda match: f"The date is {datetime.now().strftime('%m/%d/%Y')}",
+        lambda match: f"It's {datetime.now().strftime('%B %d, %Y')} today"
+    ],
+    'calculate': [
+        calculate_math
+    ],
+}
+
+
+class RulePack:
+    """A compiled, read-only rule set that any number of conversations can share"""
+
+    def __init__(self, name, patterns, responses, matcher, path=None, digest=None, similarity=None, stat=None,
+                 catch_all=()):
+        self.name = name
+        self.patterns = tuple(patterns)
+        self.responses = tuple(tuple(r) for r in responses)
+        self.matcher = matcher
+        self.path = path
+        self.digest = digest
+        # (mtime_ns, size) of the file this pack was read from, for spotting edits
+        self.stat = stat
+        # Rules meant for messages nothing else wanted: before answering
+        # with one, the similarity fallback gets a chance
+        self.catch_all = frozenset(catch_all)
+        self.similarity = similarity
+
+    @property
+    def rules(self):
+        """Pattern -> responses, in priority order"""
+        return dict(zip(self.patterns, self.responses))
+
+    def match(self, text, misses=None):
+        """Return (rule index, match) for the first rule matching `text`, or None"""
+        return self.matcher.match(text, misses)
+
+    def closest_intent(self, text):
+        """Return (rule index, score) of the rule whose examples `text` is most like, or None"""
+        if self.similarity is None:
+            return None
+        return self.similarity.match(text)
+
+
+def _parse_pack(data, path):
+    """Validate a rule pack document; returns (name, patterns, response specs, examples, threshold, catch-alls)"""
+    try:
+        document = json.loads(data)
+    except ValueError as e:
+        raise ValueError(f"Rule pack {path}: invalid JSON ({e})")
+    if not isinstance(document, dict):
+        raise ValueError(f"Rule pack {path}: expected a JSON object")
+    if document.get('version') != PACK_VERSION:
+        raise ValueError(f"Rule pack {path}: unsupported version {document.get('version')!r}")
+    rules = document.get('rules', [])
+    if not isinstance(rules, list):
+        raise ValueError(f"Rule pack {path}: rules must be a list")
+
+    patterns, specs, examples, catch_all = [], [], [], []
+    for number, rule in enumerate(rules, 1):
+        if not isinstance(rule, dict):
+            raise ValueError(f"Rule pack {path}: rule {number} is not an object")
+        pattern = rule.get('pattern')
+        if not isinstance(pattern, str):
+            raise ValueError(f"Rule pack {path}: rule {number} has no pattern")
+        if 'handler' in rule:
+            if not isinstance(rule['handler'], str) or rule['handler'] not in BUILTIN_HANDLERS:
+                raise ValueError(f"Rule pack {path}: rule {number} uses unknown handler {rule['handler']!r}")
+            specs.append(('handler', rule['handler']))
+        else:
+            responses = rule.get('responses')
+            if not isinstance(responses, list) or not responses or not all(isinstance(r, str) for r in responses):
+                raise ValueError(f"Rule pack {path}: rule {number} needs a list of responses or a handler")
+            specs.append(('responses', list(responses)))
+        rule_examples = rule.get('examples', [])
+        if not isinstance(rule_examples, list) or not all(isinstance(e, str) for e in rule_examples):
+            raise ValueError(f"Rule pack {path}: rule {number} examples must be a list of phrases")
+        examples.extend((number - 1, example) for example in rule_examples)
+        # A rule is a catch-all when the pack says so, and by default when it is a bare '.*'
+        marked = rule.get('catch_all', pattern == '.*')
+        if not isinstance(marked, bool):
+            raise ValueError(f"Rule pack {path}: rule {number} catch_all must be true or false")
+        if marked:
+            catch_all.append(number - 1)
+        patterns.append(pattern)
+    if not patterns:
+        raise ValueError(f"Rule pack {path}: no rules")
+    similarity = document.get('similarity') or {}
+    threshold = similarity.get('threshold', intent_matcher.DEFAULT_THRESHOLD) if isinstance(similarity, dict) else None
+    if not isinstance(threshold, (int, float)):
+        raise ValueError(f"Rule pack {path}: similarity threshold must be a number")
+    return document.get('name', os.path.basename(path)), patterns, specs, examples, threshold, catch_all
+
+
+def _cache_path(path, digest, cache_dir):
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    return os.path.join(cache_dir, f"{os.path.basename(path)}.{digest[:16]}.pickle")
+
+
+def _read_cache(cache_path, digest):
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(cached, dict) or cached.get('digest') != digest:
+        return None
+    return cached
+
+
+def _write_cache(cache_path, cached):
+    """Atomically replace the cache file and drop caches of older versions of the pack"""
+    cache_dir = os.path.dirname(cache_path)
+    prefix = os.path.basename(cache_path).rsplit('.', 2)[0] + '.'
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+        for entry in os.listdir(cache_dir):
+            if entry.startswith(prefix) and entry.endswith('.pickle') and entry != os.path.basename(cache_path):
+                os.remove(os.path.join(cache_dir, entry))
+    except OSError:
+        pass  # a read-only location only costs the warm start
+
+
+def _resolve_responses(spec, bot_name):
+    kind, value = spec
+    if kind == 'handler':
+        return list(BUILTIN_HANDLERS[value])
+    return [r.replace('{bot_name}', bot_name) for r in value]
+
+
+def load_rule_pack(path=DEFAULT_RULES_PATH, bot_name="ChatBot", cache_dir=None, use_cache=True):
+    """Load a JSON rule pack, reusing its compiled form from the on-disk cache when the file is unchanged.
+
+    The cache is keyed by a hash of the file's bytes, so any edit is picked
+    up on the next load. A warm load skips parsing, validation and building
+    the keyword index and similarity matrix, and regexes are compiled only
+    when first needed. Rules' example phrases feed the similarity fallback
+    when numpy and scipy are installed; without them they are ignored. The
+    fallback is tried before answering with a catch-all rule (one marked
+    "catch_all": true, or by default a bare '.*'), never over any other.
+    """
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        data = f.read()
+    # Installing numpy/scipy later must not keep serving a cache built without them
+    key = f"|{CACHE_VERSION}|{intent_matcher.available()}"
+    digest = hashlib.sha256(data + key.encode()).hexdigest()
+    cache_path = _cache_path(path, digest, cache_dir)
+
+    cached = _read_cache(cache_path, digest) if use_cache else None
+    if cached is None:
+        name, patterns, specs, examples, threshold, catch_all = _parse_pack(data, path)
+        try:
+            matcher = RuleMatcher(patterns)
+        except re.error as e:
+            raise ValueError(f"Rule pack {path}: invalid pattern ({e})")
+        similarity = None
+        if examples and intent_matcher.available():
+            similarity = intent_matcher.IntentMatcher(examples, threshold)
+        cached = {'digest': digest, 'name': name, 'specs': specs, 'matcher': matcher, 'similarity': similarity,
+                  'catch_all': catch_all}
+        if use_cache:
+            _write_cache(cache_path, cached)
+
+    matcher = cached['matcher']
+    responses = [_resolve_responses(spec, bot_name) for spec in cached['specs']]
+    return RulePack(cached['name'], matcher.patterns, responses, matcher, path=path, digest=digest,
+                    similarity=cached['similarity'], stat=(st.st_mtime_ns, st.st_size), catch_all=cached['catch_all'])
@@ -0,0 +1,113 @@
+"""Replaying utterance logs: deterministic answers, bounded session state."""
+import json
+import sys
+import tracemalloc
+
+import pytest
+
+import batch_replay
+from batch_replay import SessionReplayer, parse_line, replay
+
+
+def conversation_lines(sessions=40, rounds=6):
+    """Interleaved JSON sessions plus plain-text lines, avoiding the clock-driven rules"""
+    phrases = ["hello", "tell me a joke", "how are you", "thanks", "what is 3 + 4", "weather", "blah blah"]
+    lines = []
+    for round_number in range(rounds):
+        for session in range(sessions):
+            if round_number == 0:
+                message = f"my name is user{session}"
+            elif round_number == 3:
+                message = "i am somebody"
+            else:
+                message = phrases[(session + round_number) % len(phrases)]
+            lines.append(json.dumps({'session': f"s{session}", 'message': message}))
+        lines.append(f"plain line {round_number}")
+    lines[7] = '{"session": "broken", "message": 3}'
+    lines.insert(11, '   ')
+    return lines
+
+
+def test_parse_line():
+    assert parse_line(4, '{"session": 12, "message": "hi"}') == (4, '12', 'hi')
+    assert parse_line(5, '{"message": "hi"}') == (5, '5', 'hi')
+    assert parse_line(6, 'just text') == (6, '6', 'just text')
+    with pytest.raises(ValueError):
+        parse_line(7, '{"session": "a", "message": null}')
+
+
+def test_sessions_keep_their_own_name_and_line_order():
+    results = list(replay(conversation_lines(), seed=1))
+    numbers = [r[0] for r in results]
+    assert numbers == sorted(numbers) and len(numbers) == len(conversation_lines()) - 1
+    errors = [r for r in results if r[3] is None]
+    assert [r[0] for r in errors] == [8] and errors[0][4].startswith("unreadable line")
+    # "i am somebody" answers with the name each session gave first; s7's
+    # introduction was the unreadable line
+    renamed = [r for r in results if r[2] == "i am somebody"]
+    assert len(renamed) == 40
+    for _, session_id, _, response, _ in renamed:
+        assert ("Somebody" if session_id == 's7' else f"User{session_id[1:]}") in response
+
+
+@pytest.mark.parametrize('workers, block_size', [(1, 7), (2, 5000), (3, 13)])
+def test_answers_do_not_depend_on_workers_or_blocks(workers, block_size):
+    expected = list(replay(conversation_lines(), seed=3))
+    assert list(replay(conversation_lines(), workers=workers, seed=3, block_size=block_size)) == expected
+
+
+def test_seed_picks_the_responses():
+    first = [r[3] for r in replay(conversation_lines(), seed=1)]
+    assert [r[3] for r in replay(conversation_lines(), seed=1)] == first
+    assert [r[3] for r in replay(conversation_lines(), seed=2)] != first
+
+
+def test_silent_session_starts_over_after_the_window():
+    lines = ['{"session": "a", "message": "my name is ada"}', 'filler', 'filler',
+             '{"session": "a", "message": "i am bob"}', 'filler', 'filler', 'filler',
+             '{"session": "a", "message": "i am cy"}']
+    responses = {r[0]: r[3] for r in replay(lines, session_window=3)}
+    # Three lines of silence are still within the window, four are not
+    assert "Ada" in responses[4]
+    assert "Cy" in responses[8]
+    for workers in (1, 2):
+        assert {r[0]: r[3] for r in replay(lines, workers=workers, session_window=3)} == responses
+
+
+def test_plain_text_sessions_do_not_accumulate():
+    replayer = SessionReplayer(session_window=100)
+    for number in range(1, 5001):
+        replayer.reply(number, str(number), "hello")
+    assert len(replayer.sessions) == 101
+    assert next(iter(replayer.sessions)) == '4900'
+
+
+def peak_memory(lines):
+    tracemalloc.start()
+    try:
+        for _ in replay(iter(lines), block_size=500, session_window=500):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_replay_memory_stays_flat():
+    list(replay(['warm up']))  # rules compiled and cached outside the measurement
+    short = peak_memory([f"line {n}" for n in range(3000)])
+    long = peak_memory([f"line {n}" for n in range(12000)])
+    assert long < short * 1.5
+
+
+def test_command_line(monkeypatch, capsys, tmp_path):
+    source = tmp_path / 'log.txt'
+    source.write_text('\n'.join(conversation_lines(sessions=4, rounds=2)), encoding='utf-8')
+    output = tmp_path / 'out.jsonl'
+    monkeypatch.setattr(sys, 'argv', ['batch_replay.py', str(source), '--output', str(output), '--workers', '1',
+                                      '--session-window', '50'])
+    batch_replay.main()
+    records = [json.loads(line) for line in output.read_text(encoding='utf-8').splitlines()]
+    assert [r['line'] for r in records] == list(range(1, 11))
+    assert set(records[7]) == {'line', 'error'}
+    assert records[0]['session'] == 's0' and records[0]['pattern'].startswith(r"\b(my name is")
+    assert "10 lines in" in capsys.readouterr().err
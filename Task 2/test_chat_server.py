@@ -0,0 +1,122 @@
+"""The chat server over a real socket: answers, errors and session limits."""
+import asyncio
+import json
+import os
+
+from chat_server import ChatServer, SessionStore
+from rule_matcher import RuleMatcher
+from rule_pack import RulePack
+
+
+def failing_handler(match):
+    raise RuntimeError("handler broke")
+
+
+def install_pack(store, rules):
+    """Serve `rules` (pattern -> responses) in place of the loaded pack"""
+    patterns = list(rules)
+    store.template.rule_pack = RulePack('test', patterns, list(rules.values()), RuleMatcher(patterns),
+                                         path=store.template.rules_path)
+
+
+def exchange(server, lines):
+    """Send raw request lines over one connection; returns the decoded replies"""
+    async def run():
+        listener = await asyncio.start_server(server.handle_client, '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        for line in lines:
+            writer.write(line.encode() + b'\n')
+        await writer.drain()
+        writer.write_eof()
+        replies = [json.loads(line) for line in (await reader.read()).splitlines()]
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+        return replies
+
+    return asyncio.run(run())
+
+
+def request(session, message):
+    return json.dumps({'session': session, 'message': message})
+
+
+def test_answers_in_request_order():
+    server = ChatServer(SessionStore())
+    replies = exchange(server, [request('a', 'hello'), request('b', 'my name is bob'), request('a', '  ')])
+    assert [r['session'] for r in replies] == ['a', 'b', 'a']
+    assert all('response' in r for r in replies)
+    assert replies[2]['response'] == "Please say something!"
+    assert len(server.store) == 2
+
+
+def test_malformed_requests_get_an_error_and_the_connection_goes_on():
+    server = ChatServer(SessionStore())
+    replies = exchange(server, ['not json', '{"message": "hi"}', '[1, 2]', request('a', 'hello')])
+    assert [set(r) for r in replies[:3]] == [{'error'}] * 3
+    assert replies[3]['session'] == 'a' and 'response' in replies[3]
+    assert server.errors == 3 and server.requests == 1
+
+
+def test_failing_response_gets_an_error_and_the_connection_goes_on(caplog):
+    store = SessionStore()
+    install_pack(store, {r'\bbreak\b': [failing_handler], r'.*': ["Tell me more."]})
+    server = ChatServer(store)
+    replies = exchange(server, [request('a', 'please break'), request('a', 'hello'), request('b', 'break')])
+    assert replies[0] == {'session': 'a', 'error': 'could not answer this message'}
+    assert replies[1] == {'session': 'a', 'response': "Tell me more."}
+    assert replies[2]['session'] == 'b' and 'error' in replies[2]
+    assert server.errors == 2
+    assert "Session 'a' not answered" in caplog.text and "handler broke" in caplog.text
+    # The failed exchanges were never recorded
+    assert len(store.sessions['a'].bot.conversation_history) == 1
+
+
+def test_stats_request():
+    server = ChatServer(SessionStore(collect_metrics=True))
+    replies = exchange(server, [request('a', 'hello'), json.dumps({'session': 'a', 'stats': True})])
+    stats = replies[1]['stats']
+    assert stats['sessions'] == 1 and stats['requests'] == 1
+    assert stats['metrics']['messages'] == 1
+
+
+def test_new_sessions_share_the_pack_without_touching_its_file(monkeypatch):
+    store = SessionStore()
+    rules_path = store.template.rules_path
+    stats = []
+    real_stat = os.stat
+
+    def counting_stat(path, *args, **kwargs):
+        if path == rules_path:
+            stats.append(path)
+        return real_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(os, 'stat', counting_stat)
+    for number in range(50):
+        store.respond(f"user{number}", 'hello', now=0)
+    assert stats == []
+    assert all(s.bot.rule_pack is store.rule_pack for s in store.sessions.values())
+    # The template still watches the file
+    assert not store.template.check_for_rule_updates()
+    assert len(stats) == 1
+
+
+def test_store_evicts_the_least_recently_used_session():
+    store = SessionStore(max_sessions=2)
+    for session in ['a', 'b', 'a', 'c']:
+        store.respond(session, 'hello', now=0)
+    assert list(store.sessions) == ['a', 'c']
+    assert store.evicted == 1
+
+
+def test_store_expires_idle_sessions():
+    store = SessionStore(ttl=10)
+    store.respond('a', 'hello', now=0)
+    store.respond('b', 'hello', now=5)
+    assert store.expire(now=12) == 1
+    assert list(store.sessions) == ['b']
+    # An expired session starts over
+    store.respond('b', 'hello', now=30)
+    assert store.expired == 2
+    assert len(store.sessions['b'].bot.conversation_history) == 1
@@ -0,0 +1,49 @@
+"""RuleBasedChatbot answers: rule order, names and the similarity fallback."""
+import json
+
+import pytest
+
+from chatbot import RuleBasedChatbot
+
+GREETING = {'pattern': r'\bhello\b', 'responses': ["Greetings!"], 'examples': ["heya", "hiya"]}
+ONE_WORD = {'pattern': r'^\w+$', 'responses': ["Just one word?"]}
+CATCH_ALL = {'pattern': r'.*', 'responses': ["Tell me more."]}
+
+
+def bot_for(tmp_path, *rules):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'version': 1, 'name': 'test', 'rules': list(rules)}), encoding='utf-8')
+    return RuleBasedChatbot(str(path), seed=0)
+
+
+def test_default_pack_answers_and_remembers_the_name():
+    bot = RuleBasedChatbot(seed=0)
+    assert bot.respond("my name is ada")[1] == 3
+    assert "Ada" in bot.get_response("i am bob")
+    assert bot.get_response("what is 6 * 7") == "The result of 6.0 * 7.0 is 42.0"
+    assert len(bot.conversation_history) == 3
+    bot.reset_conversation()
+    assert bot.user_name is None and not bot.conversation_history
+
+
+def test_similarity_answers_what_only_the_catch_all_matched(tmp_path):
+    pytest.importorskip('scipy')
+    bot = bot_for(tmp_path, GREETING, CATCH_ALL)
+    assert bot.respond("heya there") == ("Greetings!", 0)
+    assert bot.respond("quantum chromodynamics") == ("Tell me more.", 1)
+
+
+def test_similarity_never_overrides_a_rule_without_literals(tmp_path):
+    # '^\w+$' has nothing to index on, but it is a real rule, not the catch-all
+    pytest.importorskip('scipy')
+    bot = bot_for(tmp_path, GREETING, ONE_WORD, CATCH_ALL)
+    assert bot.rule_pack.catch_all == {2}
+    assert bot.respond("heya") == ("Just one word?", 1)
+    assert bot.respond("heya there") == ("Greetings!", 0)
+
+
+def test_marked_catch_all_gets_the_fallback(tmp_path):
+    pytest.importorskip('scipy')
+    bot = bot_for(tmp_path, GREETING, {'pattern': r'(?s).+', 'responses': ["Go on."], 'catch_all': True})
+    assert bot.respond("hiya friend") == ("Greetings!", 0)
+    assert bot.respond("quantum chromodynamics") == ("Go on.", 1)
@@ -0,0 +1,154 @@
+"""The on-disk transcript: paging, reopening and recovery after a crash."""
+import os
+
+import pytest
+
+from history import ConversationHistory, HistoryEntry, TranscriptLog
+
+
+def entry(number):
+    return HistoryEntry(f"user {number}", f"bot {number}", 1_700_000_000 + number)
+
+
+def write_log(path, count, flush_every=4):
+    log = TranscriptLog(path, flush_every=flush_every, flush_interval=3600)
+    for number in range(count):
+        log.append(entry(number))
+    log.flush()
+    return log
+
+
+def users(entries):
+    return [e.user for e in entries]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'transcripts' / 'session.jsonl')
+
+
+def test_read_spans_disk_and_buffer(path):
+    log = TranscriptLog(path, flush_every=4, flush_interval=3600)
+    for number in range(10):
+        log.append(entry(number))
+    assert log.flushed == 8 and len(log) == 10
+    assert users(log.read(0, 10)) == [f"user {n}" for n in range(10)]
+    assert users(log.read(6, 3)) == ["user 6", "user 7", "user 8"]
+    assert users(log.read(9, 5)) == ["user 9"]
+    assert log.read(10, 5) == []
+    assert log.read(3, 1)[0].created == 1_700_000_003
+
+
+def test_reopened_log_reads_the_same(path):
+    write_log(path, 7)
+    log = TranscriptLog(path)
+    assert len(log) == 7
+    assert users(log.read(0, 7)) == [f"user {n}" for n in range(7)]
+
+
+def assert_consistent(path, count):
+    """The log holds records 0..count-1 and takes further appends cleanly"""
+    log = TranscriptLog(path, flush_every=1)
+    assert len(log) == count
+    assert users(log.read(0, count)) == [f"user {n}" for n in range(count)]
+    log.append(HistoryEntry(f"user {count}", "appended after recovery", 0))
+    reopened = TranscriptLog(path)
+    assert users(reopened.read(0, count + 1)) == [f"user {n}" for n in range(count + 1)]
+    assert reopened.read(count, 1)[0].bot == "appended after recovery"
+    assert os.path.getsize(path + '.idx') == (count + 1) * 8
+
+
+def test_recover_trims_data_written_without_its_index(path):
+    write_log(path, 5)
+    with open(path, 'ab') as data:
+        data.write(b'{"t": 1, "user": "torn", "bot": "li')
+    assert_consistent(path, 5)
+
+
+def test_recover_drops_index_entries_past_the_data(path):
+    write_log(path, 5)
+    size = os.path.getsize(path)
+    os.truncate(path, size - 3)  # the last record never fully reached the disk
+    assert_consistent(path, 4)
+
+
+def test_recover_when_no_index_entry_fits_the_data(path):
+    write_log(path, 5)
+    os.truncate(path, 10)
+    assert_consistent(path, 0)
+    # Never padded: the data file only ever shrinks
+    with open(path, 'rb') as data:
+        assert b'\0' not in data.read()
+
+
+def test_recover_with_the_data_file_missing(path):
+    write_log(path, 5)
+    os.remove(path)
+    log = TranscriptLog(path)
+    assert len(log) == 0
+    assert os.path.getsize(path + '.idx') == 0
+    assert not os.path.exists(path)
+    assert_consistent(path, 0)
+
+
+def test_recover_with_the_index_missing(path):
+    write_log(path, 5)
+    os.remove(path + '.idx')
+    assert_consistent(path, 0)
+
+
+def test_recover_torn_index_entry(path):
+    write_log(path, 5)
+    with open(path + '.idx', 'ab') as index:
+        index.write(b'\x01\x02\x03')
+    assert_consistent(path, 5)
+
+
+def test_history_pages_back_into_the_transcript(path):
+    history = ConversationHistory(max_entries=3, transcript=TranscriptLog(path, flush_every=2))
+    for number in range(12):
+        history.append(f"user {number}", f"bot {number}")
+    assert len(history) == 3 and history.total == 12
+    assert users(history.page(0, 5)) == [f"user {n}" for n in range(7, 12)]
+    assert users(history.page(1, 5)) == [f"user {n}" for n in range(2, 7)]
+    assert users(history.page(2, 5)) == ["user 0", "user 1"]
+    assert history.page(3, 5) == []
+
+
+def test_history_without_transcript_pages_only_memory():
+    history = ConversationHistory(max_entries=3)
+    for number in range(5):
+        history.append(f"user {number}", f"bot {number}")
+    assert users(history.page(0, 2)) == ["user 3", "user 4"]
+    assert users(history.page(1, 2)) == ["user 2"]
+    assert history.page(2, 2) == []
+
+
+@pytest.mark.parametrize('with_transcript', [True, False])
+def test_clear_starts_paging_over(path, with_transcript):
+    transcript = TranscriptLog(path, flush_every=2) if with_transcript else None
+    history = ConversationHistory(max_entries=3, transcript=transcript)
+    for number in range(6):
+        history.append(f"old {number}", "bot")
+    history.clear()
+    assert not history and history.page(0) == []
+
+    for number in range(4):
+        history.append(f"new {number}", "bot")
+    assert users(history.page(0, 3)) == ["new 1", "new 2", "new 3"]
+    # The entry that left the ring buffer comes from disk, and nothing from before clear()
+    assert users(history.page(1, 3)) == (["new 0"] if with_transcript else [])
+    assert history.page(2, 3) == []
+    if with_transcript:
+        history.flush()
+        assert len(transcript) == 10
+
+
+def test_reopened_transcript_pages_the_earlier_conversation(path):
+    history = ConversationHistory(transcript=TranscriptLog(path))
+    for number in range(3):
+        history.append(f"user {number}", "bot")
+    history.flush()
+    resumed = ConversationHistory(transcript=TranscriptLog(path))
+    assert resumed.total == 3 and len(resumed) == 0
+    assert users(resumed.page(0)) == ["user 0", "user 1", "user 2"]
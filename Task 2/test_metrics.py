@@ -0,0 +1,118 @@
+"""Per-rule hit, miss and latency counters."""
+import json
+import os
+
+import pytest
+
+from chatbot import RuleBasedChatbot
+from metrics import LATENCY_BUCKETS_US, ChatMetrics, LatencyHistogram
+
+GREETING = {'pattern': r'\bhello\b', 'responses': ["Greetings!"], 'examples': ["heya", "hiya"]}
+ONE_WORD = {'pattern': r'^\w+$', 'responses': ["Just one word?"]}
+MATH = {'pattern': r'\b(what is)\s+(\d+)\s*([+\-*/])\s*(\d+)', 'handler': 'calculate'}
+CATCH_ALL = {'pattern': r'.*', 'responses': ["Tell me more."]}
+
+
+def write_pack(path, *rules):
+    path.write_text(json.dumps({'version': 1, 'name': 'test', 'rules': list(rules)}), encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture
+def bot(tmp_path):
+    return RuleBasedChatbot(write_pack(tmp_path / 'rules.json', GREETING, ONE_WORD, MATH, CATCH_ALL),
+                            seed=0, collect_metrics=True)
+
+
+def test_latency_histogram_buckets():
+    histogram = LatencyHistogram()
+    for ns in (500, 1000, 1500, 40_000, 10**9):
+        histogram.record(ns)
+    counts = dict(zip(LATENCY_BUCKETS_US, histogram.counts))
+    assert counts[1] == 2 and counts[2] == 1 and counts[50] == 1 and counts[float('inf')] == 1
+    summary = histogram.to_dict()
+    assert summary['count'] == 5 and summary['max_us'] == 10**6
+    assert summary['buckets'][-1] == {'le': 'inf', 'count': 1}
+
+
+def test_metrics_are_off_by_default():
+    assert RuleBasedChatbot(seed=0).metrics is None
+
+
+def test_only_catch_all_answers_count_as_fallthrough(bot):
+    # '^\w+$' is unindexable too, but a message it answers did not fall through
+    for message in ["hello", "table", "what is 2 + 2", "what now?"]:
+        bot.get_response(message)
+    snapshot = bot.metrics.snapshot(bot.rule_pack)
+    assert snapshot['messages'] == 4 and snapshot['unmatched'] == 0
+    assert snapshot['catch_all_rules'] == [3]
+    assert snapshot['fallthrough'] == 1 and snapshot['fallthrough_rate'] == 0.25
+    assert [rule['hits'] for rule in snapshot['rules']] == [1, 1, 1, 1]
+    assert [rule['share'] for rule in snapshot['rules']] == [0.25] * 4
+
+
+def test_hits_misses_and_latencies(bot):
+    for message in ["hello", "hello", "what is 6 * 7", "two words"]:
+        bot.get_response(message)
+    greeting, one_word, math, catch_all = bot.metrics.snapshot()['rules']
+    assert greeting['hits'] == 2 and greeting['match_latency']['count'] == 2
+    assert greeting['handler_latency']['count'] == 0
+    # Only the handler rule spends time in a dynamic response
+    assert math['hits'] == 1 and math['handler_latency']['count'] == 1
+    # The unindexable rule is tried on every message the rules before it let through
+    assert one_word['misses'] == 2 and one_word['hit_rate'] == 0.0
+    assert catch_all['hits'] == 1 and catch_all['pattern'] == '.*'
+
+
+def test_counters_follow_patterns_across_a_reload(bot, tmp_path):
+    bot.get_response("hello")
+    bot.get_response("table")
+    write_pack(tmp_path / 'rules.json', GREETING, CATCH_ALL)
+    stat = os.stat(bot.rules_path)
+    os.utime(bot.rules_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert bot.check_for_rule_updates()
+    bot.get_response("hello")
+    snapshot = bot.metrics.snapshot()
+    # The greeting kept its count; the dropped rule is no longer reported
+    assert [(rule['pattern'], rule['hits']) for rule in snapshot['rules']] == [(GREETING['pattern'], 2), ('.*', 0)]
+    assert snapshot['catch_all_rules'] == [1]
+
+
+def test_one_instance_serves_many_bots(bot):
+    other = RuleBasedChatbot(rule_pack=bot.rule_pack, seed=1)
+    other.metrics = bot.metrics
+    bot.get_response("hello")
+    other.get_response("what now?")
+    snapshot = bot.metrics.snapshot()
+    assert snapshot['messages'] == 2 and snapshot['fallthrough'] == 1
+
+
+def test_similarity_hits(bot):
+    pytest.importorskip('scipy')
+    assert bot.get_response("heya there") == "Greetings!"
+    snapshot = bot.metrics.snapshot()
+    assert snapshot['similarity_hits'] == 1 and snapshot['fallthrough'] == 0
+
+
+def test_exports(bot):
+    for message in ["hello", "table", "what now?"]:
+        bot.get_response(message)
+    assert json.loads(bot.metrics.to_json(bot.rule_pack)) == bot.metrics.snapshot(bot.rule_pack)
+
+    text = bot.metrics.to_prometheus(bot.rule_pack)
+    assert "chatbot_messages_total 3\n" in text
+    assert "chatbot_fallthrough_total 1\n" in text
+    assert 'chatbot_rule_hits_total{rule="1",pattern="^\\\\w+$"} 1\n' in text
+    # Histogram buckets are cumulative and end with the total count
+    assert 'chatbot_rule_match_seconds_bucket{rule="0",pattern="\\\\bhello\\\\b",le="+Inf"} 1\n' in text
+    assert 'chatbot_rule_match_seconds_count{rule="3",pattern=".*"} 1\n' in text
+
+
+def test_reset():
+    metrics = ChatMetrics()
+    bot = RuleBasedChatbot(seed=0)
+    bot.metrics = metrics
+    bot.get_response("hello")
+    metrics.reset()
+    snapshot = metrics.snapshot(bot.rule_pack)
+    assert snapshot['messages'] == 0 and all(rule['hits'] == 0 for rule in snapshot['rules'])
@@ -0,0 +1,113 @@
+"""The keyword index must never change which rule matches."""
+import pickle
+import random
+import re
+
+import pytest
+
+from benchmark_chatbot import make_corpus, synthetic_rules
+from rule_matcher import AhoCorasick, RuleMatcher, pattern_literals
+from rule_pack import load_rule_pack
+
+
+def selections(matcher, texts):
+    result = []
+    for text in texts:
+        found = matcher.match(text)
+        result.append(None if found is None else (found[0], found[1].span()))
+    return result
+
+
+def assert_same_selection(patterns, texts, flags=0):
+    indexed = RuleMatcher(patterns, flags)
+    linear = RuleMatcher(patterns, flags, use_index=False)
+    assert indexed.index is not None and linear.index is None
+    assert selections(indexed, texts) == selections(linear, texts)
+
+
+@pytest.mark.parametrize('pattern, literals', [
+    (r'hello', {'hello'}),
+    (r'\bhi\b|\bhey\b', {'hi', 'hey'}),
+    (r'what(?:\'s| is) the time', {' the time'}),
+    (r'colou?r', {'colo'}),
+    (r'ab\.c', {'ab.c'}),
+    (r'a\tb', {'a\tb'}),
+    (r'.*', None),
+    (r'(?i)hello', None),
+    (r'\x41bc', {'bc'}),
+    (r'\x68ello', {'ello'}),
+    (r'\u0068ello', {'ello'}),
+    (r'\U00000068ello', {'ello'}),
+    (r'\N{LATIN SMALL LETTER H}ello', {'ello'}),
+    (r'\101bc', {'bc'}),
+    (r'\0bc', {'bc'}),
+    (r'(ab)x\1yz', {'ab'}),
+    (r'\x41{2}bcd', {'bcd'}),
+])
+def test_pattern_literals(pattern, literals):
+    assert pattern_literals(pattern) == literals
+
+
+ESCAPE_RULES = [
+    r'\x68ello',
+    r'howdy',
+    r'\U00000068iya',
+    r'\N{LATIN SMALL LETTER H}ey there',
+    r'\150ola',
+    r'\0x',
+    r'(o)\1ps',
+    r'\x41{2}h',
+    r'g\x6f\x6fd \x6dorning',
+    r'.*',
+]
+ESCAPE_TEXTS = [
+    'hello', 'ello', 'howdy', 'owdy', 'hiya', 'iya', 'hey there', 'ey there', 'hola', 'ola',
+    '\0x', 'x', 'oops', 'ps', 'AAh', 'Ah', 'good morning', 'good orning', '', 'nothing at all',
+]
+
+
+def test_escapes_select_the_same_rule_with_and_without_index():
+    assert RuleMatcher([r'\x68ello', '.*']).match('hello')[0] == 0
+    assert_same_selection(ESCAPE_RULES, ESCAPE_TEXTS)
+    # Each rule ahead of the catch-all on its own, so none can hide another
+    for pattern in ESCAPE_RULES[:-1]:
+        assert_same_selection([pattern, '.*'], ESCAPE_TEXTS)
+
+
+def test_escapes_with_ignorecase():
+    patterns = [r'\x48ELLO', r'\x41bc\x44', '.*']
+    assert_same_selection(patterns, ['hello', 'HELLO', 'aBCd', 'ABCD', 'bc', 'xyz'], re.IGNORECASE)
+
+
+def test_built_in_rules_on_the_benchmark_corpus():
+    pack = load_rule_pack(use_cache=False)
+    corpus = [text.lower() for text in make_corpus(3000, seed=1)]
+    assert_same_selection(pack.patterns, corpus)
+
+
+def test_synthetic_rules():
+    patterns = synthetic_rules(300, seed=2)
+    rng = random.Random(3)
+    words = [w for p in patterns for w in re.findall(r'[a-z]+', p[3:])]
+    texts = [' '.join(rng.choice(words) for _ in range(rng.randint(1, 4))) for _ in range(2000)]
+    texts += [text[1:] for text in texts[:500]]  # words cut short must not match
+    assert_same_selection(patterns + ['.*'], texts)
+
+
+def test_aho_corasick_finds_every_keyword():
+    keywords = ['he', 'she', 'his', 'hers', 'her', 'a', 'ab', 'bab', 'abc']
+    automaton = AhoCorasick()
+    for value, keyword in enumerate(keywords):
+        automaton.add(keyword, value)
+    automaton.build()
+    rng = random.Random(4)
+    for _ in range(500):
+        text = ''.join(rng.choice('abcehirs') for _ in range(rng.randint(0, 12)))
+        assert automaton.search(text) == {v for v, k in enumerate(keywords) if k in text}
+
+
+def test_pickled_matcher_matches_like_the_original():
+    pack = load_rule_pack(use_cache=False)
+    restored = pickle.loads(pickle.dumps(pack.matcher))
+    corpus = [text.lower() for text in make_corpus(500, seed=5)]
+    assert selections(restored, corpus) == selections(pack.matcher, corpus)
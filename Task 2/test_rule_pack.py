@@ -0,0 +1,165 @@
+"""Rule pack validation, the compiled cache and hot reload."""
+import asyncio
+import json
+import logging
+import os
+
+import pytest
+
+from chat_server import ChatServer, SessionStore
+from chatbot import RuleBasedChatbot
+from rule_pack import DEFAULT_RULES_PATH, load_rule_pack
+
+GREETING = {'pattern': r'\bhello\b', 'responses': ["Hi from {bot_name}!"]}
+CATCH_ALL = {'pattern': r'.*', 'responses': ["Tell me more."]}
+
+
+def write_pack(path, document):
+    text = document if isinstance(document, str) else json.dumps(document)
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def pack(*rules, **fields):
+    return dict({'version': 1, 'name': 'test', 'rules': list(rules)}, **fields)
+
+
+@pytest.mark.parametrize('document, message', [
+    ('{"version": 1, "rules": [', "invalid JSON"),
+    ([], "expected a JSON object"),
+    ('"rules"', "expected a JSON object"),
+    (pack(GREETING, version=2), "unsupported version"),
+    (pack(rules={'pattern': 'x'}), "rules must be a list"),
+    (pack(), "no rules"),
+    (pack(GREETING, 'hello'), "rule 2 is not an object"),
+    (pack(GREETING, ['hello', 'hi']), "rule 2 is not an object"),
+    (pack({'responses': ['hi']}), "rule 1 has no pattern"),
+    (pack({'pattern': 'hi', 'responses': 'abc'}), "rule 1 needs a list of responses"),
+    (pack({'pattern': 'hi', 'responses': []}), "rule 1 needs a list of responses"),
+    (pack({'pattern': 'hi', 'responses': ['ok', 3]}), "rule 1 needs a list of responses"),
+    (pack({'pattern': 'hi', 'handler': 'no_such_handler'}), "unknown handler"),
+    (pack({'pattern': 'hi', 'handler': ['current_time']}), "unknown handler"),
+    (pack({'pattern': 'hi', 'responses': ['ok'], 'examples': 'hello'}), "examples must be a list"),
+    (pack({'pattern': '(unclosed', 'responses': ['ok']}), "invalid pattern"),
+    (pack(GREETING, similarity={'threshold': 'high'}), "threshold must be a number"),
+    (pack(GREETING, dict(CATCH_ALL, catch_all='yes')), "rule 2 catch_all must be true or false"),
+])
+def test_invalid_packs_raise_value_error(tmp_path, document, message):
+    path = write_pack(tmp_path / 'rules.json', document)
+    with pytest.raises(ValueError, match=message):
+        load_rule_pack(path, use_cache=False)
+
+
+def test_valid_pack(tmp_path):
+    path = write_pack(tmp_path / 'rules.json', pack(GREETING, {'pattern': 'time', 'handler': 'current_time'},
+                                                    CATCH_ALL))
+    rule_pack = load_rule_pack(path, bot_name="Testy", use_cache=False)
+    assert rule_pack.name == 'test'
+    assert rule_pack.patterns == (GREETING['pattern'], 'time', '.*')
+    assert rule_pack.responses[0] == ("Hi from Testy!",)
+    assert len(rule_pack.responses[1]) == 3 and all(callable(r) for r in rule_pack.responses[1])
+    assert rule_pack.match('well hello there')[0] == 0
+    assert rule_pack.match('anything')[0] == 2
+    assert rule_pack.catch_all == {2}
+
+
+def test_catch_all_rules_are_marked_not_guessed(tmp_path):
+    # No rule has a literal to index on; only the marked one is a catch-all
+    rules = [{'pattern': r'^\w+$', 'responses': ['One word.']},
+             {'pattern': r'(?s).+', 'responses': ['Tell me more.'], 'catch_all': True},
+             dict(CATCH_ALL, catch_all=False)]
+    rule_pack = load_rule_pack(write_pack(tmp_path / 'rules.json', pack(*rules)), use_cache=False)
+    assert sorted(rule_pack.matcher.always) == [0, 1, 2]
+    # A bare '.*' is one by default, but the mark decides
+    assert rule_pack.catch_all == {1}
+
+
+def test_cached_pack_loads_like_a_fresh_one(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    cold = load_rule_pack(DEFAULT_RULES_PATH, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+    warm = load_rule_pack(DEFAULT_RULES_PATH, cache_dir=cache_dir)
+    fresh = load_rule_pack(DEFAULT_RULES_PATH, use_cache=False)
+    assert warm.digest == cold.digest == fresh.digest
+    assert warm.patterns == fresh.patterns
+    assert [len(r) for r in warm.responses] == [len(r) for r in fresh.responses]
+    for text in ["hello", "what is 2 + 3", "thank you", "my name is bob", "zzz"]:
+        assert warm.match(text)[0] == fresh.match(text)[0]
+    assert warm.catch_all == fresh.catch_all == {len(fresh.patterns) - 1}
+
+
+def test_edited_pack_is_not_served_from_the_cache(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    path = tmp_path / 'rules.json'
+    write_pack(path, pack(GREETING, CATCH_ALL))
+    assert len(load_rule_pack(str(path), cache_dir=cache_dir).patterns) == 2
+    write_pack(path, pack(GREETING, {'pattern': 'bye', 'responses': ['Bye!']}, CATCH_ALL))
+    assert len(load_rule_pack(str(path), cache_dir=cache_dir).patterns) == 3
+    # Only the cache of the current version is kept
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_hot_reload_swaps_in_an_edited_pack(tmp_path):
+    path = tmp_path / 'rules.json'
+    bot = RuleBasedChatbot(write_pack(path, pack(GREETING, CATCH_ALL)))
+    bot.get_response("my name is ada")
+    assert not bot.check_for_rule_updates()
+
+    write_pack(path, pack({'pattern': 'hello', 'responses': ["Hello again, {name}!"]}, CATCH_ALL))
+    bump_mtime(path)
+    assert bot.check_for_rule_updates()
+    assert bot.get_response("hello") == "Hello again, Ada!"
+    assert len(bot.conversation_history) == 2
+
+
+@pytest.mark.parametrize('broken', ['[]', '{"version": 1, "rules": ["hello"]}', '{"version": 1, "rules": [{'])
+def test_broken_pack_keeps_the_current_rules(tmp_path, broken):
+    path = tmp_path / 'rules.json'
+    bot = RuleBasedChatbot(write_pack(path, pack(GREETING, CATCH_ALL)))
+    rule_pack = bot.rule_pack
+
+    write_pack(path, broken)
+    bump_mtime(path)
+    with pytest.raises(ValueError):
+        bot.check_for_rule_updates()
+    assert bot.rule_pack is rule_pack
+    # Reported once: the broken file is not retried on every message
+    assert not bot.check_for_rule_updates()
+    with pytest.raises(ValueError):
+        bot.reload_rules()
+    assert bot.rule_pack is rule_pack
+
+
+def test_server_housekeeping_survives_a_broken_pack(tmp_path, caplog):
+    caplog.set_level(logging.INFO, logger='chat_server')
+    path = tmp_path / 'rules.json'
+    store = SessionStore(write_pack(path, pack(GREETING, CATCH_ALL)), ttl=0.05)
+    server = ChatServer(store, housekeeping_interval=0.01)
+
+    async def run():
+        task = asyncio.ensure_future(server.housekeeping())
+        store.respond('alice', 'hello')
+        write_pack(path, '[]')
+        bump_mtime(path)
+        await asyncio.sleep(0.1)
+        # Still running: idle sessions keep expiring after the bad reload
+        assert not task.done()
+        assert len(store) == 0
+        store.respond('bob', 'hello')
+        write_pack(path, pack(GREETING, {'pattern': 'bye', 'responses': ['Bye!']}, CATCH_ALL))
+        bump_mtime(path)
+        await asyncio.sleep(0.1)
+        assert not task.done()
+        task.cancel()
+
+    asyncio.run(run())
+    assert len(store) == 0
+    assert len(store.rule_pack.patterns) == 3
+    messages = [record.getMessage() for record in caplog.records]
+    assert sum(m.startswith("Rule pack not reloaded") for m in messages) == 1
+    assert messages[-1] == "Reloaded 3 rules"
@@ -0,0 +1,288 @@
+import argparse
+import json
+import multiprocessing
+import queue
+import sys
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("The numpy library is required to run this script. Please install it with 'pip install numpy'.")
+
+from catalog_loader import TitleTable, as_title_table
+from genre_engine import GenreCatalog
+
+DEFAULT_BLOCK_SIZE = 512
+DEFAULT_TOP_N = 5
+# Entries of one query block x movie block score matrix (float32); movie
+# blocks are sized to fit, so memory per worker stays flat
+MATRIX_ENTRIES = 1 << 22
+
+
+def rank_block(catalog, queries, top_n, matrix_entries=MATRIX_ENTRIES):
+    """Best `top_n` (movie ids, scores) of each query (a set of genre ids), as recommend ranks them.
+
+    The distinct queries form a 0/1 query x genre matrix, and the catalog
+    is walked in blocks of movies: each block becomes a genre x movie 0/1
+    matrix over just the genres the queries use, and one matrix product
+    scores every query against it. A query's running top N only changes
+    where a block beats its N-th best score (a tie never does, as earlier
+    movies win ties), and a query whose N-th best already has all of its
+    genres is finished and leaves the product.
+    """
+    distinct = list(dict.fromkeys(q for q in queries if q))
+    empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
+    if not distinct or top_n <= 0:
+        return [empty] * len(queries)
+    used = sorted(set().union(*distinct))
+    column = np.full(len(catalog.genres), -1, dtype=np.int64)
+    column[used] = np.arange(len(used))
+    query_matrix = np.zeros((len(distinct), len(used)), dtype=np.float32)
+    for row, genre_ids in enumerate(distinct):
+        query_matrix[row, column[list(genre_ids)]] = 1
+    most = np.array([len(q) for q in distinct], dtype=np.float32)
+
+    best = [empty] * len(distinct)
+    floor = np.zeros(len(distinct), dtype=np.float32)  # the N-th best score, 0 until there are N
+    active = np.arange(len(distinct))
+    movie_genres, offsets = catalog.movie_genres, catalog.offsets
+    block = max(1024, matrix_entries // len(distinct))
+    for start in range(0, len(catalog), block):
+        stop = min(start + block, len(catalog))
+        genres = column[movie_genres[offsets[start]:offsets[stop]]]
+        movies = np.repeat(np.arange(stop - start), np.diff(offsets[start:stop + 1]))
+        known = genres >= 0
+        movie_matrix = np.zeros((len(used), stop - start), dtype=np.float32)
+        movie_matrix[genres[known], movies[known]] = 1  # a repeated genre counts once
+        scores = query_matrix[active] @ movie_matrix
+
+        for row in np.flatnonzero(scores.max(axis=1) > floor[active]):
+            query = active[row]
+            top = catalog.top(scores[row], top_n)
+            ids = np.concatenate([best[query][0], top + start])
+            values = np.concatenate([best[query][1], scores[row][top]])
+            # Earlier movies come first in the concatenation, so the stable
+            # sort keeps catalog order among ties
+            keep = np.argsort(-values, kind='stable')[:top_n]
+            best[query] = (ids[keep], values[keep])
+            if len(keep) == top_n:
+                floor[query] = values[keep[-1]]
+        finished = floor[active] >= most[active]
+        if finished.any():
+            active = active[~finished]
+            if not len(active):
+                break
+
+    results = dict(zip(distinct, best))
+    return [results.get(q, empty) for q in queries]
+
+
+class SharedCatalog:
+    """A catalog's arrays copied once into shared memory, for worker processes to map read-only"""
+
+    def __init__(self, catalog):
+        titles = as_title_table(catalog.titles)
+        arrays = {
+            'title_bytes': titles.blob,
+            'title_offsets': titles.offsets,
+            'movie_genres': catalog.movie_genres,
+            'offsets': catalog.offsets,
+            'masks': catalog.masks,
+        }
+        self.layout = {'genres': list(catalog.genres), 'arrays': {}}
+        self._blocks = []
+        try:
+            for name, values in arrays.items():
+                values = np.ascontiguousarray(values)
+                block = SharedMemory(create=True, size=max(1, values.nbytes))
+                self._blocks.append(block)
+                np.ndarray(values.shape, values.dtype, buffer=block.buf)[...] = values
+                self.layout['arrays'][name] = (block.name, values.shape, values.dtype.str)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def attach_catalog(layout):
+    """(GenreCatalog over a SharedCatalog's memory, shared blocks to close when done)"""
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in layout['arrays'].items():
+        block = SharedMemory(name=block_name)
+        blocks.append(block)
+        array = np.ndarray(shape, dtype, buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+    catalog = GenreCatalog.from_arrays(TitleTable(arrays['title_bytes'], arrays['title_offsets']), layout['genres'],
+                                       arrays['movie_genres'], arrays['offsets'], arrays['masks'], cache_size=0)
+    return catalog, blocks
+
+
+def parse_line(number, line):
+    """Return (number, profile id, genres) for a plain-text or JSON line.
+
+    A JSON line is {"id": ..., "genres": [...]}; a plain-text line is a
+    comma-separated genre list, named after its line number.
+    """
+    if line.startswith('{'):
+        record = json.loads(line)
+        genres = record['genres']
+        if not isinstance(genres, list) or not all(isinstance(g, str) for g in genres):
+            raise ValueError("genres is not a list of strings")
+        return number, record.get('id', number), genres
+    return number, number, [g for g in line.split(',') if g.strip()]
+
+
+def _blocks(lines, size):
+    block = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line:
+            block.append((number, line))
+            if len(block) >= size:
+                yield block
+                block = []
+    if block:
+        yield block
+
+
+def recommend_block(catalog, block, top_n):
+    """JSON output lines for a block of (line number, raw line)"""
+    parsed, queries = [], []
+    for number, line in block:
+        try:
+            number, profile, genres = parse_line(number, line)
+        except (ValueError, KeyError, TypeError) as e:
+            parsed.append((number, None, f"unreadable line: {e}"))
+            queries.append(frozenset())
+            continue
+        parsed.append((number, profile, None))
+        queries.append(catalog.query_ids(genres))
+    output = []
+    for (number, profile, error), (ids, scores) in zip(parsed, rank_block(catalog, queries, top_n)):
+        if error is not None:
+            output.append(json.dumps({'line': number, 'error': error}))
+            continue
+        recommendations = [[catalog.titles[i], catalog.genres_of(i), int(score)] for i, score in zip(ids, scores)]
+        output.append(json.dumps({'line': number, 'id': profile, 'recommendations': recommendations}))
+    return output
+
+
+def _recommend_worker(layout, top_n, inbox, outbox):
+    catalog, blocks = attach_catalog(layout)
+    try:
+        while True:
+            job = inbox.get()
+            if job is None:
+                break
+            number, block = job
+            outbox.put((number, recommend_block(catalog, block, top_n)))
+    finally:
+        del catalog
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                pass  # a view is still alive; the memory goes with the process
+
+
+def recommend_stream(lines, catalog, top_n=DEFAULT_TOP_N, workers=1, block_size=DEFAULT_BLOCK_SIZE):
+    """Stream one JSON output line per non-blank input line, in input order.
+
+    Lines are read in blocks of `block_size` profiles and handed to a pool
+    of processes that map the catalog from shared memory instead of each
+    loading a copy. At most two blocks per worker are in flight, and
+    results are put back in input order as they arrive, so memory stays
+    flat whatever the length of the input.
+    """
+    if workers <= 1:
+        for block in _blocks(lines, block_size):
+            yield from recommend_block(catalog, block, top_n)
+        return
+
+    shared = SharedCatalog(catalog)
+    inbox = multiprocessing.Queue()
+    outbox = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_recommend_worker, args=(shared.layout, top_n, inbox, outbox),
+                                         daemon=True) for _ in range(workers)]
+    done = {}  # block number -> output lines, until their turn comes
+    next_block = 0
+
+    def collect():
+        while next_block not in done:
+            try:
+                number, output = outbox.get(timeout=1.0)
+            except queue.Empty:
+                if not all(process.is_alive() for process in processes):
+                    raise RuntimeError("a recommendation worker died")
+                continue
+            done[number] = output
+
+    try:
+        for process in processes:
+            process.start()
+        sent = 0
+        for block in _blocks(lines, block_size):
+            inbox.put((sent, block))
+            sent += 1
+            while sent - next_block > 2 * workers:
+                collect()
+                yield from done.pop(next_block)
+                next_block += 1
+        while next_block < sent:
+            collect()
+            yield from done.pop(next_block)
+            next_block += 1
+    finally:
+        for _ in processes:
+            inbox.put(None)
+        for process in processes:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+        shared.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend movies for a stream of genre preference sets.")
+    parser.add_argument('input', help="JSON lines ({\"id\", \"genres\"}) or comma-separated genres; '-' for stdin")
+    parser.add_argument('--output', help="write JSON lines here instead of stdout")
+    parser.add_argument('--catalog', help="movie catalog CSV (default: the sample data)")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_N)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    args = parser.parse_args()
+
+    if args.catalog:
+        import catalog_loader
+        catalog = catalog_loader.load_catalog(args.catalog)
+    else:
+        from movierecommender import catalog
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    sink = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    count = 0
+    start = time.perf_counter()
+    try:
+        for line in recommend_stream(source, catalog, args.top, args.workers, args.block_size):
+            sink.write(line + '\n')
+            count += 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"{count} profiles in {elapsed:.2f} s ({count / elapsed if elapsed else 0:.0f}/s), "
+          f"{len(catalog)} movies, {args.workers} workers", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
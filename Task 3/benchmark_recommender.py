@@ -0,0 +1,334 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("The numpy library is required to run this script. Please install it with 'pip install numpy'.")
+
+from catalog_loader import TitleTable, load_catalog_cache, save_catalog_cache
+from genre_engine import GenreCatalog, ResultCache
+
+# Bump when the meaning or layout of the results file changes
+RESULTS_VERSION = 1
+DEFAULT_SIZES = '1e3,1e4,1e5,1e6'
+DISTRIBUTIONS = ('poisson', 'uniform', 'fixed')
+# Metrics compared by --compare, all lower-is-better, with the change
+# below which a difference counts as noise
+COMPARED = {
+    'build_s': 0.005,
+    'index_s': 0.005,
+    'cache_open_s': 0.005,
+    'p50_ms': 0.05,
+    'p99_ms': 0.5,
+    'peak_traced_mb': 1.0,
+}
+
+
+def synthetic_titles(count):
+    """'Movie 0000042'-style titles for `count` movies, built as one blob without a Python string per title"""
+    width = max(1, len(str(max(0, count - 1))))
+    prefix = np.frombuffer(b'Movie ', dtype=np.uint8)
+    numbers = np.arange(count, dtype=np.int64)
+    rows = np.empty((count, len(prefix) + width), dtype=np.uint8)
+    rows[:, :len(prefix)] = prefix
+    for digit in range(width):
+        rows[:, len(prefix) + digit] = numbers // 10 ** (width - 1 - digit) % 10 + ord('0')
+    offsets = np.arange(count + 1, dtype=np.int64) * rows.shape[1]
+    return TitleTable(rows.ravel(), offsets)
+
+
+def make_catalog(titles, vocabulary=20, genres_per_title=2.5, max_genres=8, distribution='poisson', skew=1.0,
+                 seed=0):
+    """Seeded synthetic catalog as (TitleTable, genre names, flat genre ids, offsets).
+
+    Each title's genre count is drawn from `distribution`: 'poisson' with
+    mean `genres_per_title`, 'uniform' over 1 to twice the mean, or 'fixed'
+    at the mean; then capped at `max_genres`. Genres are drawn with
+    Zipf-like popularity, weight 1 / rank ** skew (0 for uniform), and a
+    title can draw the same genre twice, as real data sometimes lists it.
+    """
+    rng = np.random.default_rng(seed)
+    if distribution == 'poisson':
+        counts = rng.poisson(genres_per_title, titles)
+    elif distribution == 'uniform':
+        counts = rng.integers(1, max(2, int(round(2 * genres_per_title))), titles, endpoint=True)
+    elif distribution == 'fixed':
+        counts = np.full(titles, int(round(genres_per_title)))
+    else:
+        raise ValueError(f"unknown distribution {distribution!r}")
+    counts = np.minimum(counts, max_genres)
+    offsets = np.zeros(titles + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)
+
+    weights = 1 / np.arange(1, vocabulary + 1, dtype=np.float64) ** skew
+    movie_genres = rng.choice(vocabulary, size=int(offsets[-1]), p=weights / weights.sum()).astype(np.int32)
+    width = len(str(vocabulary - 1))
+    genres = [f"genre{i:0{width}d}" for i in range(vocabulary)]
+    return synthetic_titles(titles), genres, movie_genres, offsets
+
+
+def make_queries(genres, count, seed=0, skew=1.0, max_genres=4):
+    """Seeded genre lists of 1 to `max_genres` genres, popular genres picked more often"""
+    rng = np.random.default_rng(seed + 1)
+    weights = 1 / np.arange(1, len(genres) + 1, dtype=np.float64) ** skew
+    weights /= weights.sum()
+    queries = []
+    for _ in range(count):
+        size = int(rng.integers(1, min(max_genres, len(genres)), endpoint=True))
+        queries.append([genres[i] for i in rng.choice(len(genres), size=size, replace=False, p=weights)])
+    return queries
+
+
+def legacy_recommend(movies, preferred_genres, top_n=5):
+    """The original recommend_movies, on a DataFrame of titles and genre lists."""
+    preferred_genres_set = set(g.strip().lower() for g in preferred_genres)
+
+    def score(genres):
+        return len(set(genres) & preferred_genres_set)
+    movies_copy = movies.copy()
+    movies_copy['score'] = movies_copy['genres'].apply(score)
+    recommended = movies_copy[movies_copy['score'] > 0].sort_values(by='score', ascending=False)
+    if recommended.empty:
+        return []
+    return recommended.head(top_n)[['title', 'genres', 'score']].values.tolist()
+
+
+def check_ranking(catalog, queries, top_n):
+    """Compare against legacy_recommend, allowing for its unstable order within a score.
+
+    The score sequences must be equal, every movie must carry its legacy
+    score, everything above the lowest score must be the same movies, and
+    ties must be in catalog order. Returns the number of queries checked.
+    """
+    try:
+        import pandas as pd
+    except ImportError:
+        raise ImportError("The pandas library is required for the ranking check. Please install it with 'pip install pandas'.")
+
+    titles = list(catalog.titles)
+    genre_lists = [catalog.genres_of(i) for i in range(len(catalog))]
+    movies = pd.DataFrame({'title': titles, 'genres': genre_lists})
+    index_of = {title: i for i, title in enumerate(titles)}
+    for preferred in queries:
+        old = legacy_recommend(movies, preferred, top_n)
+        new = catalog.recommend(preferred, top_n)
+        wanted = {g.strip().lower() for g in preferred}
+
+        def fail(reason):
+            raise AssertionError(f"ranking differs for {preferred!r}: {reason}\n  old: {old}\n  new: {new}")
+        if [row[2] for row in old] != [row[2] for row in new]:
+            fail("scores differ")
+        for title, genres, score in new:
+            if genres != genre_lists[index_of[title]] or score != len(set(genres) & wanted):
+                fail(f"wrong row for {title!r}")
+        if new:
+            lowest = new[-1][2]
+            if {r[0] for r in old if r[2] > lowest} != {r[0] for r in new if r[2] > lowest}:
+                fail("different movies above the lowest score")
+            ranks = [(-score, index_of[title]) for title, _, score in new]
+            if ranks != sorted(ranks):
+                fail("ties not in catalog order")
+    return len(queries)
+
+
+def percentiles(samples_ms):
+    samples = np.sort(np.asarray(samples_ms))
+    return {
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p90_ms': float(np.percentile(samples, 90)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'max_ms': float(samples[-1]),
+    }
+
+
+def run_size(size, config):
+    """Every measurement for one catalog size, as a dict"""
+    result = {'titles': size}
+    start = time.perf_counter()
+    titles, genres, movie_genres, offsets = make_catalog(size, config['vocabulary'], config['genres_per_title'],
+                                                         config['max_genres'], config['distribution'],
+                                                         config['skew'], config['seed'])
+    result['generate_s'] = time.perf_counter() - start
+    result['genre_entries'] = int(offsets[-1])
+
+    # Load time of turning the arrays into a queryable catalog, then its
+    # memory in a second, traced pass so tracing does not skew the times
+    start = time.perf_counter()
+    catalog = GenreCatalog.from_arrays(titles, genres, movie_genres, offsets, cache_size=0)
+    result['build_s'] = time.perf_counter() - start
+    start = time.perf_counter()
+    catalog.index()
+    result['index_s'] = time.perf_counter() - start
+    del catalog
+    tracemalloc.start()
+    catalog = GenreCatalog.from_arrays(titles, genres, movie_genres, offsets, cache_size=0)
+    catalog.index()
+    result['peak_traced_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+
+    cache_dir = tempfile.mkdtemp(prefix='recommender-bench-')
+    try:
+        start = time.perf_counter()
+        save_catalog_cache(catalog, cache_dir)
+        result['cache_save_s'] = time.perf_counter() - start
+        result['cache_bytes'] = sum(os.path.getsize(os.path.join(cache_dir, f)) for f in os.listdir(cache_dir))
+        start = time.perf_counter()
+        cached = load_catalog_cache(cache_dir)
+        result['cache_open_s'] = time.perf_counter() - start
+        queries = make_queries(genres, config['queries'], config['seed'], config['skew'])
+        start = time.perf_counter()
+        cached.recommend(queries[0], config['top'])
+        result['first_query_ms'] = (time.perf_counter() - start) * 1000
+        del cached
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    # Latency without the result cache, then with it on a repeating mix
+    samples = []
+    indexed = 0
+    for preferred in queries:
+        indexed += catalog._use_index(catalog.query_ids(preferred))
+        start = time.perf_counter()
+        catalog.recommend(preferred, config['top'])
+        samples.append((time.perf_counter() - start) * 1000)
+    result.update(percentiles(samples))
+    result['indexed_share'] = indexed / len(queries)
+    catalog.results = ResultCache()
+    repeated = queries[:max(1, len(queries) // 10)] * 10
+    samples = []
+    for preferred in repeated:
+        start = time.perf_counter()
+        catalog.recommend(preferred, config['top'])
+        samples.append((time.perf_counter() - start) * 1000)
+    result['cached_p50_ms'] = float(np.percentile(samples, 50))
+    result['cache_hit_rate'] = catalog.results.stats()['hit_rate']
+
+    if size <= config['check_up_to']:
+        checks = queries[:config['check_queries']] + [['no such genre'], genres[:1], list(genres)]
+        result['checked_queries'] = check_ranking(catalog, checks, config['top'])
+    result['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=5,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(old, new, tolerance):
+    """Lines describing metrics of `new` worse than `old` by more than `tolerance` (a fraction)"""
+    previous = {r['titles']: r for r in old['results']}
+    regressions = []
+    for result in new['results']:
+        before = previous.get(result['titles'])
+        if before is None:
+            continue
+        for metric, noise in COMPARED.items():
+            a, b = before.get(metric), result.get(metric)
+            if a and b is not None and b > a * (1 + tolerance) and b - a > noise:
+                regressions.append(f"{result['titles']:>10d} titles  {metric:>15s}  {a:.4g} -> {b:.4g} (+{b / a - 1:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recommender on synthetic catalogs of growing size.")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="comma-separated title counts, e.g. 1e3,1e5,1e7")
+    parser.add_argument('--vocabulary', type=int, default=20, help="number of distinct genres")
+    parser.add_argument('--genres-per-title', type=float, default=2.5, help="mean genres per title")
+    parser.add_argument('--max-genres', type=int, default=8)
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default='poisson',
+                        help="distribution of the number of genres per title")
+    parser.add_argument('--skew', type=float, default=1.0, help="Zipf exponent of genre popularity (0: uniform)")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--check-up-to', type=float, default=1e5,
+                        help="check rankings against the original implementation up to this many titles")
+    parser.add_argument('--check-queries', type=int, default=20)
+    parser.add_argument('--no-isolate', action='store_true',
+                        help="measure every size in this process (peak RSS then only grows)")
+    parser.add_argument('--output', help="write the results as JSON here")
+    parser.add_argument('--compare', help="earlier results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="slowdown flagged by --compare, as a fraction")
+    args = parser.parse_args()
+
+    sizes = [int(float(s)) for s in args.sizes.split(',') if s.strip()]
+    config = {
+        'vocabulary': args.vocabulary,
+        'genres_per_title': args.genres_per_title,
+        'max_genres': args.max_genres,
+        'distribution': args.distribution,
+        'skew': args.skew,
+        'queries': args.queries,
+        'top': args.top,
+        'seed': args.seed,
+        'check_up_to': int(args.check_up_to),
+        'check_queries': args.check_queries,
+    }
+    report = {
+        'version': RESULTS_VERSION,
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'commit': _git_commit(),
+        },
+        'config': config,
+        'results': [],
+    }
+
+    print(f"{'titles':>10s} {'build':>8s} {'index':>8s} {'open':>8s} {'p50':>8s} {'p90':>8s} {'p99':>8s} "
+          f"{'hit p50':>8s} {'traced':>8s} {'rss':>8s}  check", file=sys.stderr)
+    for size in sizes:
+        if args.no_isolate:
+            result = run_size(size, config)
+        else:
+            # A fresh process per size, so peak RSS belongs to that size alone
+            with multiprocessing.get_context('spawn').Pool(1) as pool:
+                result = pool.apply(run_size, (size, config))
+        report['results'].append(result)
+        checked = f"{result['checked_queries']} ok" if 'checked_queries' in result else '-'
+        print(f"{size:10d} {result['build_s'] * 1000:6.0f}ms {result['index_s'] * 1000:6.0f}ms "
+              f"{result['cache_open_s'] * 1000:6.1f}ms {result['p50_ms']:6.2f}ms {result['p90_ms']:6.2f}ms "
+              f"{result['p99_ms']:6.2f}ms {result['cached_p50_ms']:6.3f}ms {result['peak_traced_mb']:6.0f}MB "
+              f"{result['max_rss_mb']:6.0f}MB  {checked}", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        if previous.get('config') != report['config']:
+            print("warning: the earlier run used a different configuration", file=sys.stderr)
+        regressions = compare(previous, report, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metrics regressed by more than {args.tolerance:.0%}:", file=sys.stderr)
+            for line in regressions:
+                print('  ' + line, file=sys.stderr)
+            sys.exit(1)
+        print(f"no metric regressed by more than {args.tolerance:.0%}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
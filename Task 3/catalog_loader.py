@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("The numpy library is required to run this script. Please install it with 'pip install numpy'.")
+
+from genre_engine import GenreCatalog, normalize_genre
+
+DEFAULT_CHUNK_SIZE = 100000
+# Bump when the layout of the cache files changes
+CACHE_VERSION = 3
+# MovieLens marks titles without genres like this; they get no genres at all
+NO_GENRES = '(no genres listed)'
+
+_ARRAYS = ('title_bytes', 'title_offsets', 'movie_genres', 'offsets', 'masks', 'postings', 'posting_offsets')
+
+
+class TitleTable:
+    """Titles stored as one UTF-8 blob plus offsets; a title is decoded only when asked for"""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return bytes(self.blob[self.offsets[index]:self.offsets[index + 1]]).decode('utf-8')
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+def as_title_table(titles):
+    """`titles` as a TitleTable, encoding them if they are a plain sequence"""
+    if isinstance(titles, TitleTable):
+        return titles
+    encoded = [title.encode('utf-8') for title in titles]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded])
+    return TitleTable(np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets)
+
+
+def read_catalog_csv(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream a MovieLens-style CSV (`title` and pipe-separated `genres` columns) into a GenreCatalog.
+
+    The file is read `chunk_size` rows at a time and never held as a
+    DataFrame of Python lists: titles go into one byte buffer, and genre
+    names are interned into small integer ids as they are met.
+    """
+    try:
+        import pandas as pd
+    except ImportError:
+        raise ImportError("The pandas library is required to read catalogs. Please install it with 'pip install pandas'.")
+
+    title_bytes = bytearray()
+    title_offsets = array('q', [0])
+    movie_genres = array('i')
+    offsets = array('q', [0])
+    genre_ids = {}
+
+    reader = pd.read_csv(path, usecols=['title', 'genres'], dtype=str, keep_default_na=False,
+                         chunksize=chunk_size)
+    for chunk in reader:
+        for title, genres in zip(chunk['title'], chunk['genres']):
+            title_bytes += title.encode('utf-8')
+            title_offsets.append(len(title_bytes))
+            for genre in genres.split('|'):
+                genre = normalize_genre(genre)
+                if genre and genre != NO_GENRES:
+                    genre_id = genre_ids.get(genre)
+                    if genre_id is None:
+                        genre_id = genre_ids[genre] = len(genre_ids)
+                    movie_genres.append(genre_id)
+            offsets.append(len(movie_genres))
+
+    # Renumber the genres in sorted order, as GenreCatalog does for lists
+    genres = sorted(genre_ids)
+    renumber = np.empty(len(genres), dtype=np.int32)
+    for new_id, genre in enumerate(genres):
+        renumber[genre_ids[genre]] = new_id
+    titles = TitleTable(np.frombuffer(bytes(title_bytes), dtype=np.uint8), np.frombuffer(title_offsets, dtype=np.int64))
+    return GenreCatalog.from_arrays(titles, genres, renumber[np.frombuffer(movie_genres, dtype=np.int32)],
+                                    np.frombuffer(offsets, dtype=np.int64))
+
+
+def default_cache_dir(path):
+    return path + '.cache'
+
+
+def _source_key(path):
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _array_path(cache_dir, name, generation):
+    return os.path.join(cache_dir, f"{name}.{generation}.npy")
+
+
+def save_catalog_cache(catalog, cache_dir, source_key=None):
+    """Write the catalog's arrays as .npy files plus a meta.json, which is written last.
+
+    Every save writes its arrays under file names of their own (a new
+    generation), then atomically replaces meta.json, which names the
+    generation to read, and only then deletes the files of older ones. A
+    reader therefore gets the arrays of the meta.json it read or, if they
+    were deleted under it, no cache at all, never a mix of two saves.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    generation = f"{time.time_ns():x}-{os.getpid()}"
+    titles = as_title_table(catalog.titles)
+    postings, posting_offsets = catalog.index()
+    arrays = {
+        'title_bytes': titles.blob,
+        'title_offsets': titles.offsets,
+        'movie_genres': catalog.movie_genres,
+        'offsets': catalog.offsets,
+        'masks': catalog.masks,
+        'postings': postings,
+        'posting_offsets': posting_offsets,
+    }
+    for name, values in arrays.items():
+        # Nothing refers to this generation until meta.json does
+        np.save(_array_path(cache_dir, name, generation), np.ascontiguousarray(values))
+    meta = {'version': CACHE_VERSION, 'generation': generation, 'genres': catalog.genres, 'movies': len(catalog),
+            'source': source_key}
+    tmp_path = os.path.join(cache_dir, f"meta.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(cache_dir, 'meta.json'))
+
+    current = f".{generation}.npy"
+    for entry in os.listdir(cache_dir):
+        if entry.endswith('.npy') and not entry.endswith(current):
+            try:
+                os.remove(os.path.join(cache_dir, entry))
+            except OSError:
+                pass  # still mapped by a reader on a platform that forbids deleting it
+
+
+def load_catalog_cache(cache_dir, source_key=None, mmap=True):
+    """Open a cache written by save_catalog_cache, or return None if it is missing or stale.
+
+    With `mmap` the arrays stay on disk and pages are read as queries
+    touch them, so opening costs next to nothing whatever the catalog size.
+    """
+    try:
+        with open(os.path.join(cache_dir, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != CACHE_VERSION or (source_key is not None and meta.get('source') != source_key):
+        return None
+    try:
+        arrays = {name: np.load(_array_path(cache_dir, name, meta['generation']), mmap_mode='r' if mmap else None)
+                  for name in _ARRAYS}
+    except (KeyError, OSError, ValueError):
+        return None
+    titles = TitleTable(arrays['title_bytes'], arrays['title_offsets'])
+    if (len(titles) != meta['movies'] or arrays['masks'].shape[1] != meta['movies']
+            or len(arrays['posting_offsets']) != len(meta['genres']) + 1):
+        return None
+    return GenreCatalog.from_arrays(titles, meta['genres'], arrays['movie_genres'], arrays['offsets'], arrays['masks'],
+                                    (arrays['postings'], arrays['posting_offsets']))
+
+
+def load_catalog(path, cache_dir=None, use_cache=True, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Load a catalog CSV, through its binary cache when the CSV has not changed since"""
+    cache_dir = cache_dir or default_cache_dir(path)
+    source_key = _source_key(path)
+    if use_cache:
+        catalog = load_catalog_cache(cache_dir, source_key)
+        if catalog is not None:
+            return catalog
+    catalog = read_catalog_csv(path, chunk_size)
+    if use_cache:
+        try:
+            save_catalog_cache(catalog, cache_dir, source_key)
+        except OSError:
+            pass  # a read-only location only costs the fast start
+    return catalog
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build (or check) the binary cache of a movie catalog CSV.")
+    parser.add_argument('path', help="CSV with 'title' and pipe-separated 'genres' columns")
+    parser.add_argument('--cache-dir', help="defaults to <path>.cache")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--rebuild', action='store_true', help="ignore an existing cache")
+    args = parser.parse_args()
+
+    cache_dir = args.cache_dir or default_cache_dir(args.path)
+    start = time.perf_counter()
+    catalog = read_catalog_csv(args.path, args.chunk_size) if args.rebuild else None
+    if catalog is not None:
+        save_catalog_cache(catalog, cache_dir, _source_key(args.path))
+    else:
+        catalog = load_catalog(args.path, cache_dir, chunk_size=args.chunk_size)
+    first = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cached = load_catalog_cache(cache_dir, _source_key(args.path))
+    reopen = time.perf_counter() - start
+    print(f"{len(catalog)} movies, {len(catalog.genres)} genres")
+    print(f"  load: {first * 1000:.1f} ms, cached open: {reopen * 1000:.1f} ms ({cache_dir})")
+    if cached is not None and len(cached):
+        print(f"  e.g. {cached.titles[0]!r}: {', '.join(cached.genres_of(0))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+import argparse
+import multiprocessing
+import time
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    raise ImportError("The numpy and scipy libraries are required for collaborative filtering. "
+                      "Please install them with 'pip install numpy scipy'.")
+
+DEFAULT_NEIGHBOURS = 50
+DEFAULT_CHUNK_SIZE = 100000
+# Upper bound on the entries of one chunk's similarity product; a chunk
+# takes as many items as fit, so memory stays flat whatever the catalog size
+DEFAULT_CHUNK_ENTRIES = 1 << 24
+DEFAULT_CF_WEIGHT = 0.5
+# Mean ratings are pulled toward the global mean as if every movie had
+# this many more ratings at it, so a single 5-star rating does not top the prior
+PRIOR_RATINGS = 10
+# An update touching more items than this share of the catalog rebuilds
+# every neighbour list instead of patching them
+REBUILD_FRACTION = 0.1
+
+
+def _pick_column(columns, names):
+    for name in names:
+        if name in columns:
+            return name
+    raise ValueError(f"ratings file needs one of the columns {', '.join(names)}")
+
+
+def read_ratings(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield (users, movies, ratings) arrays for each chunk of a ratings CSV.
+
+    The CSV needs a user column ('user' or 'userId'), a movie column
+    ('movie' or 'title', holding catalog titles) and a 'rating' column.
+    """
+    try:
+        import pandas as pd
+    except ImportError:
+        raise ImportError("The pandas library is required to read ratings. Please install it with 'pip install pandas'.")
+
+    columns = pd.read_csv(path, nrows=0).columns
+    user_column = _pick_column(columns, ('user', 'userId'))
+    movie_column = _pick_column(columns, ('movie', 'title'))
+    _pick_column(columns, ('rating',))
+    reader = pd.read_csv(path, usecols=[user_column, movie_column, 'rating'], keep_default_na=False,
+                         dtype={user_column: str, movie_column: str, 'rating': np.float32}, chunksize=chunk_size)
+    for chunk in reader:
+        yield chunk[user_column].to_numpy(), chunk[movie_column].to_numpy(), chunk['rating'].to_numpy()
+
+
+def top_k_rows(matrix, k, exclude=None):
+    """(rows, columns, values) of the `k` largest positive entries of every row of a CSR matrix.
+
+    Ties go to the lower column. `exclude[r]` names a column to leave out
+    of row r, e.g. the item itself.
+    """
+    matrix.sort_indices()
+    size = matrix.shape[0]
+    rows = np.repeat(np.arange(size), np.diff(matrix.indptr))
+    columns, values = matrix.indices, matrix.data.astype(np.float32, copy=False)
+    keep = values > 0
+    if exclude is not None:
+        keep &= columns != exclude[rows]
+    rows, columns, values = rows[keep], columns[keep], values[keep]
+    # One sort key: the row, then the value descending (the bits of a
+    # positive float32 grow with it); the stable sort keeps each row's
+    # ascending columns for ties. Several times faster than a lexsort.
+    key = (rows.astype(np.uint64) << np.uint64(32)) | (np.uint32(0xFFFFFFFF) - values.view(np.uint32)).astype(np.uint64)
+    order = np.argsort(key, kind='stable')
+    rows, columns, values = rows[order], columns[order], values[order]
+    starts = np.zeros(size + 1, dtype=np.int64)
+    starts[1:] = np.cumsum(np.bincount(rows, minlength=size))
+    keep = np.arange(len(rows)) - starts[rows] < k
+    return rows[keep], columns[keep], values[keep]
+
+
+def _chunk_neighbours(item_rows, user_columns, chunk, k):
+    """Top-k neighbours of the items in `chunk`, as global (rows, columns, values)"""
+    rows, columns, values = top_k_rows(item_rows[chunk] @ user_columns, k, exclude=chunk)
+    return chunk[rows], columns, values
+
+
+_worker_factors = None
+
+
+def _init_worker(item_rows, user_columns):
+    global _worker_factors
+    _worker_factors = (item_rows, user_columns)
+
+
+def _pool_chunk(job):
+    chunk, k = job
+    return _chunk_neighbours(*_worker_factors, chunk, k)
+
+
+def _chunks(items, size):
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def _to_csr(parts, shape):
+    rows, columns, values = (np.concatenate(p) for p in zip(*parts)) if parts else ([], [], [])
+    return sparse.csr_matrix((np.asarray(values, dtype=np.float32), (rows, columns)), shape=shape)
+
+
+def _best(ids, scores, top_n):
+    """The `top_n` highest positive scores, best first, ties in catalog order"""
+    positive = scores > 0
+    ids, scores = ids[positive], scores[positive]
+    if len(scores) > top_n:
+        # Only what reaches the N-th best score needs ordering
+        cut = np.partition(scores, len(scores) - top_n)[len(scores) - top_n]
+        keep = scores >= cut
+        ids, scores = ids[keep], scores[keep]
+    order = np.lexsort((ids, -scores))[:top_n]
+    return ids[order], scores[order]
+
+
+class CollaborativeModel:
+    """Item-item collaborative filtering over a GenreCatalog, blended with its genre scores.
+
+    Ratings go into a sparse user x movie matrix (columns are catalog
+    indexes). Each user's ratings are centred on their mean, and two movies
+    are as similar as the adjusted cosine of their rating columns. Only
+    each movie's `neighbours` most similar ones are kept, in an item x item
+    CSR matrix. They are computed in chunks of movies, each chunk a sparse
+    matrix product, spread over a process pool.
+
+    New ratings are merged in place. Only the movies whose columns changed
+    have their neighbour lists recomputed, along with the full lists in
+    which one of them got less similar (a movie left out before may now
+    beat it); everyone else's lists are patched with their new
+    similarities to those movies, which gives the lists a rebuild() would.
+    """
+
+    def __init__(self, catalog, neighbours=DEFAULT_NEIGHBOURS, workers=1, chunk_entries=DEFAULT_CHUNK_ENTRIES):
+        self.catalog = catalog
+        self.neighbours = neighbours
+        self.workers = workers
+        self.chunk_entries = chunk_entries
+        self.user_ids = {}
+        self.ratings = sparse.csr_matrix((0, len(catalog)), dtype=np.float32)
+        self.similar = None     # item x item, the top neighbours of each movie
+        self.prior = None       # damped mean rating of each movie, scaled to 0..1
+        self.skipped = 0        # ratings of movies the catalog does not have
+        self.version = 0
+        self._title_ids = None
+
+    @classmethod
+    def from_csv(cls, catalog, path, chunk_size=DEFAULT_CHUNK_SIZE, **kwargs):
+        model = cls(catalog, **kwargs)
+        for users, movies, ratings in read_ratings(path, chunk_size):
+            model._merge(users, movies, ratings)
+        model.rebuild()
+        return model
+
+    def movie_index(self, movie):
+        """Catalog index of a title (the first one, if repeated) or of an index; None if unknown"""
+        if isinstance(movie, (int, np.integer)):
+            return int(movie) if 0 <= movie < len(self.catalog) else None
+        if self._title_ids is None:
+            self._title_ids = {}
+            for index, title in enumerate(self.catalog.titles):
+                self._title_ids.setdefault(title, index)
+        return self._title_ids.get(movie)
+
+    def _fit_catalog(self):
+        """Grow the item axis when movies were added to the catalog"""
+        items = len(self.catalog)
+        if items == self.ratings.shape[1]:
+            return
+        self.ratings.resize((self.ratings.shape[0], items))
+        self._title_ids = None
+        if self.similar is not None:
+            self.similar.resize((items, items))
+            self.prior = np.concatenate([self.prior, np.full(items - len(self.prior), np.median(self.prior),
+                                                             dtype=np.float32)])
+
+    def _merge(self, users, movies, ratings):
+        """Merge ratings into the matrix, a later rating of a movie replacing an earlier one; returns the users' rows"""
+        self._fit_catalog()
+        columns = np.fromiter((-1 if i is None else i for i in map(self.movie_index, movies)), dtype=np.int64)
+        known = columns >= 0
+        self.skipped += int(len(columns) - known.sum())
+        user_ids = self.user_ids
+        rows = np.fromiter((user_ids.setdefault(user, len(user_ids)) for user in users), dtype=np.int64)
+        rows, columns = rows[known], columns[known]
+        values = np.asarray(ratings, dtype=np.float32)[known]
+
+        items = self.ratings.shape[1]
+        # The last rating of a (user, movie) pair in the batch wins
+        keys = rows * items + columns
+        _, last = np.unique(keys[::-1], return_index=True)
+        last = len(keys) - 1 - last
+        rows, columns, values = rows[last], columns[last], values[last]
+
+        shape = (len(user_ids), items)
+        ratings_matrix = self.ratings
+        ratings_matrix.resize(shape)
+        rated = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=shape)
+        new = sparse.csr_matrix((values, (rows, columns)), shape=shape)
+        self.ratings = sparse.csr_matrix(ratings_matrix - ratings_matrix.multiply(rated) + new)
+        self.ratings.eliminate_zeros()
+        return np.unique(rows)
+
+    def _factors(self):
+        """(item x user, user x item) mean-centred ratings with unit-length item vectors"""
+        ratings = self.ratings
+        counts = np.diff(ratings.indptr)
+        means = np.asarray(ratings.sum(axis=1)).ravel() / np.maximum(counts, 1)
+        centred = ratings.copy()
+        centred.data -= np.repeat(means, counts).astype(np.float32)
+        centred.eliminate_zeros()
+        norms = np.sqrt(np.asarray(centred.multiply(centred).sum(axis=0)).ravel())
+        scale = np.divide(1, norms, out=np.zeros_like(norms), where=norms > 0).astype(np.float32)
+        user_columns = sparse.csr_matrix(centred @ sparse.diags(scale))
+        return user_columns.T.tocsr(), user_columns
+
+    def _update_prior(self):
+        ratings = self.ratings
+        items = ratings.shape[1]
+        if not ratings.nnz:
+            self.prior = np.zeros(items, dtype=np.float32)
+            return
+        counts = np.bincount(ratings.indices, minlength=items)
+        sums = np.bincount(ratings.indices, weights=ratings.data, minlength=items)
+        mean = ratings.data.mean()
+        self.prior = ((sums + PRIOR_RATINGS * mean) / (counts + PRIOR_RATINGS) / ratings.data.max()).astype(np.float32)
+
+    def _chunk_size(self):
+        return max(1, self.chunk_entries // max(1, self.ratings.shape[1]))
+
+    def rebuild(self):
+        """Recompute every movie's neighbours, in parallel chunks when `workers` > 1"""
+        self._fit_catalog()
+        item_rows, user_columns = self._factors()
+        items = self.ratings.shape[1]
+        chunks = _chunks(np.arange(items), self._chunk_size())
+        if self.workers > 1 and len(chunks) > 1:
+            with multiprocessing.Pool(self.workers, _init_worker, (item_rows, user_columns)) as pool:
+                parts = list(pool.imap_unordered(_pool_chunk, [(chunk, self.neighbours) for chunk in chunks]))
+        else:
+            parts = [_chunk_neighbours(item_rows, user_columns, chunk, self.neighbours) for chunk in chunks]
+        self.similar = _to_csr(parts, (items, items))
+        self._update_prior()
+        self.version += 1
+
+    def add_ratings(self, users, movies, ratings):
+        """Merge new ratings (parallel sequences) and bring the neighbour lists up to date"""
+        touched = self._merge(users, movies, ratings)
+        if self.similar is None:
+            self.rebuild()
+            return
+        # A user's mean moved, so every movie they rated has a new column
+        items = np.unique(self.ratings[touched].indices)
+        if len(items) > REBUILD_FRACTION * self.ratings.shape[1]:
+            self.rebuild()
+            return
+        self._patch(items)
+        self._update_prior()
+        self.version += 1
+
+    def _patch(self, items):
+        """Recompute the neighbours of `items` and fold their new similarities into everyone else's lists"""
+        item_rows, user_columns = self._factors()
+        k, old = self.neighbours, self.similar
+        size = old.shape[0]
+        changed = np.zeros(size, dtype=bool)
+        changed[items] = True
+
+        old_rows = np.repeat(np.arange(size), np.diff(old.indptr))
+        # Lists that held a changed movie get rebuilt from what is left
+        # plus the new similarities
+        held = np.flatnonzero(changed[old.indices])
+        lost = np.zeros(size, dtype=bool)
+        lost[old_rows[held]] = True
+        # A full list only takes a new neighbour at least as good as its worst one
+        counts = np.diff(old.indptr)
+        floor = np.zeros(size, dtype=np.float32)
+        filled = counts > 0
+        if filled.any():
+            floor[filled] = np.minimum.reduceat(old.data, old.indptr[:-1][filled])
+        floor[counts < k] = 0
+        # A full list whose changed neighbour got less similar may now be
+        # beaten by a movie that never made it in: those are recomputed whole
+        shrunk = np.zeros(size, dtype=bool)
+        local = np.full(size, -1, dtype=np.int64)
+
+        fresh, offers = [], []
+        for chunk in _chunks(items, self._chunk_size()):
+            product = sparse.csr_matrix(item_rows[chunk] @ user_columns)
+            rows, columns, values = top_k_rows(product, k, exclude=chunk)
+            fresh.append((chunk[rows], columns, values))
+            local[chunk] = np.arange(len(chunk))
+            entries = held[local[old.indices[held]] >= 0]
+            if len(entries):
+                now = np.asarray(product[local[old.indices[entries]], old_rows[entries]]).ravel()
+                weaker = old_rows[entries[now < old.data[entries]]]
+                shrunk[weaker[counts[weaker] >= k]] = True
+            local[chunk] = -1
+            rows = chunk[np.repeat(np.arange(len(chunk)), np.diff(product.indptr))]
+            columns, values = product.indices, product.data
+            # Similarity is symmetric: sim(changed, j) is also an offer for j's list
+            wanted = ~changed[columns] & (values > 0) & ((values >= floor[columns]) | lost[columns])
+            offers.append((columns[wanted], rows[wanted], values[wanted]))
+
+        shrunk &= ~changed
+        for chunk in _chunks(np.flatnonzero(shrunk), self._chunk_size()):
+            fresh.append(_chunk_neighbours(item_rows, user_columns, chunk, k))
+        offers = [(rows[~shrunk[rows]], columns[~shrunk[rows]], values[~shrunk[rows]])
+                  for rows, columns, values in offers]
+        offered = np.zeros(size, dtype=bool)
+        for rows, _, _ in offers:
+            offered[rows] = True
+        redo = (offered | lost) & ~(changed | shrunk)
+        keep = ~(changed | shrunk | redo)[old_rows]
+        kept = (old_rows[keep], old.indices[keep], old.data[keep])
+        carried = redo[old_rows] & ~changed[old.indices]
+        merged = _to_csr([(old_rows[carried], old.indices[carried], old.data[carried])] + offers, (size, size))
+        self.similar = _to_csr([kept, top_k_rows(merged, k)] + fresh, (size, size))
+
+    def _seeds(self, liked, user):
+        """Movies to find neighbours of, with weights: the user's centred ratings, 1 for each liked one"""
+        seeds, weights = [], []
+        if user is not None and user in self.user_ids:
+            row = self.ratings[self.user_ids[user]]
+            seeds.append(row.indices)
+            weights.append(row.data - row.data.mean())
+        liked = [i for i in map(self.movie_index, liked) if i is not None]
+        if liked:
+            seeds.append(np.array(liked, dtype=np.int64))
+            weights.append(np.ones(len(liked), dtype=np.float32))
+        if not seeds:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return np.concatenate(seeds), np.concatenate(weights).astype(np.float32)
+
+    def recommend(self, preferred_genres, top_n=5, liked=(), user=None, cf_weight=DEFAULT_CF_WEIGHT):
+        """[[title, genres, score], ...] ranked by genre overlap blended with the ratings.
+
+        score = (1 - cf_weight) * (share of the preferred genres a movie has)
+        + cf_weight * cf. With `liked` movies or a known `user`, cf is the
+        movie's similarity to those (the best candidate scoring 1) and
+        movies similar to them qualify without any preferred genre; the
+        seeds themselves are left out. Without either, cf is the movie's
+        damped mean rating, which orders the titles a genre-only ranking
+        would tie.
+        """
+        if top_n <= 0:
+            return []
+        catalog = self.catalog
+        self._fit_catalog()
+        genre_count = max(1, len(catalog.query_ids(preferred_genres)))
+        ids, genre_scores = catalog.matches(preferred_genres)
+        genre_share = genre_scores / np.float32(genre_count)
+        seeds, weights = self._seeds(liked, user)
+
+        if self.similar is not None and len(seeds):
+            query = sparse.csr_matrix((weights, (np.zeros(len(seeds), dtype=np.int64), seeds)),
+                                      shape=(1, self.similar.shape[0]))
+            row = sparse.csr_matrix(query @ self.similar)
+            row.sort_indices()
+            cf_ids, cf = row.indices, np.maximum(row.data, 0)
+            if len(cf) and cf.max() > 0:
+                cf = cf / cf.max()
+            all_ids = np.union1d(ids, cf_ids)
+            share = np.zeros(len(all_ids), dtype=np.float32)
+            share[np.searchsorted(all_ids, ids)] = genre_share
+            similarity = np.zeros(len(all_ids), dtype=np.float32)
+            similarity[np.searchsorted(all_ids, cf_ids)] = cf
+            unseen = ~np.isin(all_ids, seeds)
+            ids, genre_share, cf = all_ids[unseen], share[unseen], similarity[unseen]
+        else:
+            cf = self.prior[ids] if self.prior is not None else np.zeros(len(ids), dtype=np.float32)
+
+        ids, scores = _best(ids, (1 - cf_weight) * genre_share + cf_weight * cf, top_n)
+        return [[catalog.titles[i], catalog.genres_of(i), round(float(score), 4)] for i, score in zip(ids, scores)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build item-item neighbours from a ratings CSV and recommend from them.")
+    parser.add_argument('ratings', help="CSV with user, movie (title) and rating columns")
+    parser.add_argument('--catalog', help="movie catalog CSV (default: the sample data)")
+    parser.add_argument('--neighbours', type=int, default=DEFAULT_NEIGHBOURS)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--genres', default='', help="comma-separated preferred genres")
+    parser.add_argument('--liked', default='', help="'|'-separated titles to find similar movies to")
+    parser.add_argument('--user', help="recommend for this user's ratings")
+    parser.add_argument('--top', type=int, default=5)
+    parser.add_argument('--cf-weight', type=float, default=DEFAULT_CF_WEIGHT)
+    args = parser.parse_args()
+
+    if args.catalog:
+        import catalog_loader
+        catalog = catalog_loader.load_catalog(args.catalog)
+    else:
+        from movierecommender import catalog
+    start = time.perf_counter()
+    model = CollaborativeModel.from_csv(catalog, args.ratings, neighbours=args.neighbours, workers=args.workers)
+    built = time.perf_counter() - start
+    print(f"{model.ratings.nnz} ratings by {len(model.user_ids)} users, {model.skipped} skipped; "
+          f"{model.similar.nnz} neighbour pairs in {built:.2f} s")
+
+    genres = [g for g in args.genres.split(',') if g.strip()]
+    liked = [t for t in args.liked.split('|') if t.strip()]
+    start = time.perf_counter()
+    results = model.recommend(genres, args.top, liked, args.user, args.cf_weight)
+    elapsed = time.perf_counter() - start
+    for title, movie_genres, score in results:
+        print(f"  {score:.3f}  {title} ({', '.join(movie_genres)})")
+    print(f"  ({elapsed * 1000:.2f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("The numpy library is required to run this script. Please install it with 'pip install numpy'.")
+
+DEFAULT_CACHE_SIZE = 1024
+# A query goes through the inverted index when its genres' postings hold
+# fewer than one entry per this many movies; broader ones are cheaper as a
+# bitmask scan over every movie
+INDEX_FRACTION = 6
+
+# Set bits in every byte value, for numpy versions without np.bitwise_count
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(words):
+    """Number of set bits in each element of a uint64 array, as uint8"""
+    if hasattr(np, 'bitwise_count'):  # numpy >= 2.0
+        return np.bitwise_count(words)
+    return _BYTE_POPCOUNT[words.view(np.uint8)].reshape(len(words), 8).sum(axis=1, dtype=np.uint8)
+
+
+def _first_equal(values, value, count):
+    """Indexes of the first `count` elements equal to `value`, scanning only as far as needed"""
+    found = []
+    start, step = 0, 1 << 16
+    while count > 0 and start < len(values):
+        hits = np.flatnonzero(values[start:start + step] == value)[:count] + start
+        found.append(hits)
+        count -= len(hits)
+        start += step
+        step *= 4
+    return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+
+def normalize_genre(genre):
+    return genre.strip().lower()
+
+
+class ResultCache:
+    """Bounded LRU map of query results, emptied whenever the catalog version moves on"""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.version = None
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, version):
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+                self._entries.clear()
+            self.version = version
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+
+class GenreCatalog:
+    """Movie genres encoded once as bitmasks, for scoring a query in one vectorized pass.
+
+    Each genre in the vocabulary is a bit; a movie is a column of 64-bit
+    words with its genres' bits set (a single word for up to 64 genres).
+    A query is the same kind of column, and a movie's score, the number of
+    preferred genres it has, is the popcount of the AND of the two. Words
+    are stored one contiguous array each, and only the words the query has
+    bits in are read. Top-N counts down from the best score to the cut-off
+    one, so only the few movies above the cut-off are ever sorted.
+
+    Queries on rarer genres skip the scan: an inverted index maps each
+    genre to the sorted ids of its movies, and only the postings of the
+    query's genres are merged and counted. Results are kept in a bounded
+    LRU cache keyed by the set of known query genres and `top_n`; it is
+    emptied whenever `version` changes, i.e. when movies are added.
+
+    Ties keep catalog order. The DataFrame sort this replaces was not a
+    stable one, so its order within a score was whatever the sort left;
+    now it is deterministic. Each movie's genre list is kept as given (as
+    a flat array of genre ids plus offsets), so results read exactly like
+    recommend_movies always returned them.
+    """
+
+    def __init__(self, titles, genre_lists, cache_size=DEFAULT_CACHE_SIZE):
+        titles = list(titles)
+        genre_lists = [[normalize_genre(g) for g in genres] for genres in genre_lists]
+        if len(genre_lists) != len(titles):
+            raise ValueError("titles and genre lists differ in length")
+
+        genres = sorted({g for genres in genre_lists for g in genres})
+        genre_ids = {genre: i for i, genre in enumerate(genres)}
+        movie_genres, offsets = self._flatten(genre_lists, genre_ids)
+        self._setup(titles, genres, movie_genres, offsets, cache_size=cache_size)
+
+    @classmethod
+    def from_arrays(cls, titles, genres, movie_genres, offsets, masks=None, index=None,
+                    cache_size=DEFAULT_CACHE_SIZE):
+        """Catalog from already encoded data, e.g. memory-mapped from a cache (see catalog_loader.py).
+
+        `titles` only needs len() and indexing; movie i has the genres
+        `genres[g]` for g in movie_genres[offsets[i]:offsets[i + 1]].
+        `index` is a (postings, posting_offsets) pair as index() returns it.
+        """
+        catalog = cls.__new__(cls)
+        catalog._setup(titles, list(genres), movie_genres, offsets, masks, index, cache_size)
+        return catalog
+
+    def _setup(self, titles, genres, movie_genres, offsets, masks=None, index=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.titles = titles
+        self.genres = genres
+        self.genre_ids = {genre: i for i, genre in enumerate(genres)}
+        self.words = max(1, (len(genres) + 63) // 64)
+        self.movie_genres = movie_genres
+        self.offsets = offsets
+        self.masks = masks if masks is not None else self._encode(movie_genres, offsets)
+        self._index = index     # built on first use
+        self.version = 0
+        self.results = ResultCache(cache_size)
+
+    @staticmethod
+    def _flatten(genre_lists, genre_ids):
+        """Flat genre ids plus offsets for lists of normalized genre names"""
+        offsets = np.zeros(len(genre_lists) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(genres) for genres in genre_lists])
+        movie_genres = np.fromiter((genre_ids[g] for genres in genre_lists for g in genres),
+                                   dtype=np.int32, count=int(offsets[-1]))
+        return movie_genres, offsets
+
+    def _encode(self, movie_genres, offsets):
+        """(words, movies) bitmasks from the flat genre ids"""
+        masks = np.zeros((self.words, len(offsets) - 1), dtype=np.uint64)
+        if not len(movie_genres):
+            return masks
+        bits = np.left_shift(np.uint64(1), (movie_genres % 64).astype(np.uint64))
+        word_of = movie_genres // 64
+        empty = offsets[:-1] == offsets[1:]
+        for word in range(self.words):
+            # A movie's genres are contiguous, so OR-ing each run gives its
+            # mask; a duplicate genre sets the same bit again, like set() did.
+            # The trailing zero keeps runs of movies without genres in range.
+            word_bits = np.append(np.where(word_of == word, bits, np.uint64(0)), np.uint64(0))
+            masks[word] = np.bitwise_or.reduceat(word_bits, offsets[:-1])
+            masks[word][empty] = 0
+        return masks
+
+    def _build_index(self):
+        """Postings of every genre (ids of its movies, ascending, each once) plus their offsets"""
+        movies = len(self.offsets) - 1
+        id_type = np.int32 if movies < 2 ** 31 else np.int64
+        movie_of = np.repeat(np.arange(movies, dtype=id_type), np.diff(self.offsets))
+        order = np.argsort(self.movie_genres, kind='stable')
+        genre_of = self.movie_genres[order]
+        postings = movie_of[order]
+        # The stable sort keeps each genre's movies ascending, so a genre
+        # listed twice for one movie shows up as neighbours
+        keep = np.ones(len(postings), dtype=bool)
+        keep[1:] = (genre_of[1:] != genre_of[:-1]) | (postings[1:] != postings[:-1])
+        posting_offsets = np.zeros(len(self.genres) + 1, dtype=np.int64)
+        posting_offsets[1:] = np.cumsum(np.bincount(genre_of[keep], minlength=len(self.genres)))
+        return postings[keep], posting_offsets
+
+    def index(self):
+        """(postings, posting_offsets): genre g's movies are postings[posting_offsets[g]:posting_offsets[g + 1]]"""
+        if self._index is None:
+            self._index = self._build_index()
+        return self._index
+
+    def __len__(self):
+        return len(self.titles)
+
+    def query_ids(self, preferred_genres):
+        """Normalized query: the set of known genre ids; unknown genres match nothing"""
+        ids = frozenset(self.genre_ids.get(normalize_genre(genre)) for genre in preferred_genres)
+        return ids - {None}
+
+    def query_mask(self, preferred_genres):
+        """Bitmask row for a list of genre names; unknown genres match nothing"""
+        return self._mask(self.query_ids(preferred_genres))
+
+    def _mask(self, genre_ids):
+        query = np.zeros(self.words, dtype=np.uint64)
+        for genre_id in genre_ids:
+            query[genre_id // 64] |= np.uint64(1) << np.uint64(genre_id % 64)
+        return query
+
+    def scores(self, preferred_genres):
+        """Number of preferred genres of every movie"""
+        return self._scores(self.query_ids(preferred_genres))
+
+    def _scores(self, genre_ids):
+        query = self._mask(genre_ids)
+        used = np.flatnonzero(query)
+        if not len(used):
+            return np.zeros(len(self.titles), dtype=np.uint8)
+        scores = popcount(self.masks[used[0]] & query[used[0]])
+        for word in used[1:]:
+            scores += popcount(self.masks[word] & query[word])
+        return scores
+
+    def top(self, scores, top_n):
+        """Indexes of the `top_n` best scores above zero, best first, ties in catalog order"""
+        if top_n <= 0 or not len(scores):
+            return np.zeros(0, dtype=np.int64)
+        # Scores are small integers: counting down from the best one finds
+        # the lowest score that still makes the top N, and only the few
+        # movies above it need ordering
+        level, taken = int(scores.max()), 0
+        while level > 0:
+            taken += np.count_nonzero(scores == level)
+            if taken >= top_n or level == 1:
+                break
+            level -= 1
+        if level == 0:
+            return np.zeros(0, dtype=np.int64)
+        above = np.flatnonzero(scores > level)
+        above = above[np.argsort(-scores[above].astype(np.int16), kind='stable')]
+        return np.concatenate([above, _first_equal(scores, level, top_n - len(above))])
+
+    def genres_of(self, index):
+        return [self.genres[g] for g in self.movie_genres[self.offsets[index]:self.offsets[index + 1]]]
+
+    def candidates(self, genre_ids):
+        """(movie ids, scores) of the movies with at least one of the genres, in catalog order"""
+        postings, posting_offsets = self.index()
+        lists = [postings[posting_offsets[g]:posting_offsets[g + 1]] for g in sorted(genre_ids)]
+        if not lists:
+            return np.zeros(0, dtype=postings.dtype), np.zeros(0, dtype=np.uint8)
+        if len(lists) == 1:
+            return lists[0], np.ones(len(lists[0]), dtype=np.uint8)
+        # A movie turns up once in the postings of each query genre it has
+        ids, counts = np.unique(np.concatenate(lists), return_counts=True)
+        return ids, counts.astype(np.uint8)
+
+    def matches(self, preferred_genres):
+        """(movie ids, scores) of every movie scoring above zero, in catalog order, by the cheaper path"""
+        genre_ids = self.query_ids(preferred_genres)
+        if not genre_ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint8)
+        if self._use_index(genre_ids):
+            return self.candidates(genre_ids)
+        scores = self._scores(genre_ids)
+        ids = np.flatnonzero(scores)
+        return ids, scores[ids]
+
+    def _use_index(self, genre_ids):
+        if len(genre_ids) == 1:
+            return True  # one posting list is already the answer, in order
+        posting_offsets = self.index()[1]
+        postings = sum(int(posting_offsets[g + 1] - posting_offsets[g]) for g in genre_ids)
+        return postings * INDEX_FRACTION < len(self)
+
+    def recommend(self, preferred_genres, top_n=5):
+        """[[title, genres, score], ...] for the best `top_n` movies, as recommend_movies returns them"""
+        genre_ids = self.query_ids(preferred_genres)
+        if not genre_ids or top_n <= 0:
+            return []
+        key = (genre_ids, top_n)
+        results = self.results.get(key, self.version)
+        if results is None:
+            if self._use_index(genre_ids):
+                ids, scores = self.candidates(genre_ids)
+                best = self.top(scores, top_n)
+                ids, scores = ids[best], scores[best]
+            else:
+                scores = self._scores(genre_ids)
+                ids = self.top(scores, top_n)
+                scores = scores[ids]
+            results = tuple((self.titles[i], tuple(self.genres_of(i)), int(score)) for i, score in zip(ids, scores))
+            self.results.put(key, results)
+        return [[title, list(genres), score] for title, genres, score in results]
+
+    def add_movies(self, titles, genre_lists):
+        """Append movies; genres not seen before join the end of the vocabulary.
+
+        Bumps `version`, which empties the result cache. The titles become a
+        plain list and the masks are copied, so this is for occasional
+        updates rather than bulk loading.
+        """
+        titles = list(titles)
+        genre_lists = [[normalize_genre(g) for g in genres] for genres in genre_lists]
+        if len(genre_lists) != len(titles):
+            raise ValueError("titles and genre lists differ in length")
+        for genres in genre_lists:
+            for genre in genres:
+                if genre not in self.genre_ids:
+                    self.genre_ids[genre] = len(self.genres)
+                    self.genres.append(genre)
+        movie_genres, offsets = self._flatten(genre_lists, self.genre_ids)
+
+        words = max(1, (len(self.genres) + 63) // 64)
+        masks = self.masks
+        if words > len(masks):
+            masks = np.concatenate([masks, np.zeros((words - len(masks), masks.shape[1]), dtype=np.uint64)])
+        self.words = words
+        self.masks = np.concatenate([masks, self._encode(movie_genres, offsets)], axis=1)
+        self.movie_genres = np.concatenate([self.movie_genres, movie_genres])
+        self.offsets = np.concatenate([self.offsets, offsets[1:] + self.offsets[-1]])
+        self.titles = list(self.titles) + titles
+        self._index = None
+        self.version += 1
@@ -1,13 +1,7 @@
-try:
-    import pandas as pd
-except ImportError:
-    raise ImportError("The pandas library is required to run this script. Please install it with 'pip install pandas'.")
-
-try:
-    import tkinter as tk
-    from tkinter import messagebox, simpledialog, scrolledtext
-except ImportError:
-    raise ImportError("The tkinter library is required to run this script. It is included with most Python installations.")
+import argparse
+import json
+import sys
+import time
 
 # Sample movie dataset
 data = {
@@ -25,83 +19,139 @@ data = {
     ]
 }
 
-movies = pd.DataFrame(data)
+# Nothing is built or imported at import time, so a headless query pays
+# neither for pandas and tkinter nor for setting up the GUI, and numpy
+# comes in with the catalog. `catalog`, `all_genres` and `movies` (the
+# sample data as a DataFrame) are module attributes that __getattr__
+# resolves on first use
+_catalog = None
+_movies = None
 
-# Preprocess genres for easier matching
-movies['genres'] = movies['genres'].apply(lambda x: [g.strip().lower() for g in x.split('|')])
+# Item-item model built from a ratings file by load_ratings(); None until then
+cf_model = None
 
-# Get all unique genres for GUI selection
-all_genres = sorted({genre for genres in movies['genres'] for genre in genres})
+def get_catalog():
+    # The catalog recommendations come from: the sample data unless load_catalog() replaced it.
+    # Genres are encoded once as bitmasks plus a genre -> movies index, and
+    # repeated queries are answered from the catalog's result cache
+    global _catalog
+    if _catalog is None:
+        from genre_engine import GenreCatalog
+        _catalog = GenreCatalog(data['title'], [genres.split('|') for genres in data['genres']])
+    return _catalog
 
-def recommend_movies(preferred_genres, top_n=5):
-    # Ensure preferred_genres are lowercased for matching
-    preferred_genres_set = set(g.strip().lower() for g in preferred_genres)
-    def score(genres):
-        return len(set(genres) & preferred_genres_set)
-    # Avoid SettingWithCopyWarning by working on a copy
-    movies_copy = movies.copy()
-    movies_copy['score'] = movies_copy['genres'].apply(score)
-    # Fix: sort_values expects keyword arguments, not lists
-    recommended = movies_copy[movies_copy['score'] > 0].sort_values(by='score', ascending=False)
-    if recommended.empty:
-        return []
-    else:
-        return recommended.head(top_n)[['title', 'genres', 'score']].values.tolist()
+def _sample_movies():
+    global _movies
+    if _movies is None:
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError("The pandas library is required to run this script. Please install it with 'pip install pandas'.")
+        _movies = pd.DataFrame(data)
+        # Preprocess genres for easier matching
+        _movies['genres'] = _movies['genres'].apply(lambda x: [g.strip().lower() for g in x.split('|')])
+    return _movies
 
-class MovieRecommenderGUI:
-    def __init__(self, master):
-        self.master = master
-        master.title("Movie Recommendation System")
-        master.configure(bg='#f0f4f7')
+def __getattr__(name):
+    if name == 'catalog':
+        return get_catalog()
+    if name == 'all_genres':
+        # All unique genres, for GUI selection
+        return sorted(get_catalog().genres)
+    if name == 'movies':
+        return _sample_movies()
+    if name in ('MovieRecommenderGUI', 'VirtualList'):
+        import recommender_gui
+        return getattr(recommender_gui, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-        self.label = tk.Label(master, text="Select your favorite genres:", bg='#f0f4f7', font=("Arial", 12, "bold"))
-        self.label.pack(pady=(10, 0))
+def load_catalog(path):
+    # Recommend from an external MovieLens-style CSV instead of the sample data;
+    # catalog_loader keeps a binary cache next to it for fast restarts
+    global _catalog, cf_model
+    import catalog_loader
+    _catalog = catalog_loader.load_catalog(path)
+    cf_model = None  # its ratings were matched against the old titles
 
-        self.genre_vars = []
-        self.genre_checks = []
-        genre_frame = tk.Frame(master, bg='#f0f4f7')
-        genre_frame.pack(pady=5)
-        for i, genre in enumerate(all_genres):
-            var = tk.BooleanVar()
-            chk = tk.Checkbutton(genre_frame, text=genre.title(), variable=var, bg='#f0f4f7', activebackground='#e0e7ef', font=("Arial", 10))
-            chk.grid(row=i//3, column=i%3, sticky='w', padx=5, pady=2)
-            self.genre_vars.append(var)
-            self.genre_checks.append(chk)
+def load_ratings(path, workers=1):
+    # Ratings (user, movie title, rating) for the blended mode; see collaborative.py
+    global cf_model
+    import collaborative
+    cf_model = collaborative.CollaborativeModel.from_csv(get_catalog(), path, workers=workers)
 
-        self.recommend_button = tk.Button(
-            master,
-            text="Get Recommendations",
-            command=self.show_recommendations,
-            bg='#1976d2', fg='white',
-            activebackground='#1565c0', activeforeground='white',
-            font=("Arial", 12, "bold"),
-            relief=tk.RAISED, bd=3
-        )
-        self.recommend_button.pack(pady=10)
+def recommend_movies(preferred_genres, top_n=5):
+    # Scores count the preferred genres each movie has (matching is case-insensitive);
+    # the best top_n above zero come back as [title, genres, score], ties in catalog order
+    return get_catalog().recommend(preferred_genres, top_n)
 
-        self.result_text = scrolledtext.ScrolledText(master, width=50, height=10, state='disabled', wrap='word', font=("Arial", 10), bg='#e3f2fd')
-        self.result_text.pack(padx=10, pady=(0, 10))
+def recommend_movies_blended(preferred_genres, top_n=5, liked=(), user=None, cf_weight=0.5):
+    # Genre overlap blended with item-item similarity from the loaded ratings:
+    # to the `liked` titles or the `user`'s ratings if given, else the movies'
+    # mean ratings break the genre ties. Same [title, genres, score] rows,
+    # with a 0..1 float score; falls back to recommend_movies without ratings
+    if cf_model is None:
+        return recommend_movies(preferred_genres, top_n)
+    return cf_model.recommend(preferred_genres, top_n, liked, user, cf_weight)
+
+def recommendation_cache_stats():
+    # Size, hits, misses and hit rate of the result cache; a newly loaded catalog starts a fresh one
+    return get_catalog().results.stats()
+
+def recommend_command(args):
+    # Headless query: JSON on stdout, optional timings on stderr. Cold, on the
+    # sample data, this is mostly the interpreter and numpy starting up
+    start = time.perf_counter()
+    if args.catalog:
+        load_catalog(args.catalog)
+    get_catalog()
+    if args.ratings:
+        load_ratings(args.ratings)
+    loaded = time.perf_counter()
+    genres = [g.strip() for g in args.genres.split(',') if g.strip()]
+    liked = [t.strip() for t in args.liked.split('|') if t.strip()]
+    if cf_model is not None:
+        results = recommend_movies_blended(genres, args.top, liked, args.user, args.cf_weight)
+    else:
+        results = recommend_movies(genres, args.top)
+    done = time.perf_counter()
+    json.dump({
+        'genres': genres,
+        'top': args.top,
+        'recommendations': [{'title': title, 'genres': movie_genres, 'score': score}
+                            for title, movie_genres, score in results],
+    }, sys.stdout, indent=args.indent)
+    sys.stdout.write('\n')
+    if args.timings:
+        print(f"catalog {(loaded - start) * 1000:.1f} ms, query {(done - loaded) * 1000:.2f} ms", file=sys.stderr)
 
-    def show_recommendations(self):
-        selected_genres = [genre for genre, var in zip(all_genres, self.genre_vars) if var.get()]
-        if not selected_genres:
-            messagebox.showwarning("No Genres Selected", "Please select at least one genre.")
-            return
-        recommendations = recommend_movies(selected_genres, top_n=5)
-        self.result_text.config(state='normal')
-        self.result_text.delete(1.0, tk.END)
-        if not recommendations:
-            self.result_text.insert(tk.END, "No recommendations found for your genres.\n")
-        else:
-            self.result_text.insert(tk.END, f"Top {len(recommendations)} movie recommendations for you:\n\n")
-            for title, genres, score in recommendations:
-                genre_str = ', '.join([g.title() for g in genres])
-                self.result_text.insert(tk.END, f"- {title} (Genres: {genre_str})\n")
-        self.result_text.config(state='disabled')
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Movie recommendation GUI, or a headless 'recommend' query.")
+    parser.add_argument('--catalog', help="CSV with 'title' and pipe-separated 'genres' columns (default: sample data)")
+    parser.add_argument('--ratings', help="CSV of user, movie (title) and rating, to blend into the ranking")
+    commands = parser.add_subparsers(dest='command')
+    query = commands.add_parser('recommend', help="print recommendations as JSON instead of opening the GUI")
+    # Also accepted after the command; SUPPRESS keeps them from hiding values given before it
+    query.add_argument('--catalog', default=argparse.SUPPRESS, help=argparse.SUPPRESS)
+    query.add_argument('--ratings', default=argparse.SUPPRESS, help=argparse.SUPPRESS)
+    query.add_argument('--genres', default='', help="comma-separated preferred genres, e.g. drama,comedy")
+    query.add_argument('--top', type=int, default=5)
+    query.add_argument('--liked', default='', help="'|'-separated titles to find similar movies to (needs --ratings)")
+    query.add_argument('--user', help="recommend for this user's ratings (needs --ratings)")
+    query.add_argument('--cf-weight', type=float, default=0.5)
+    query.add_argument('--indent', type=int, help="pretty-print the JSON")
+    query.add_argument('--timings', action='store_true', help="print load and query times to stderr")
+    args = parser.parse_args(argv)
 
-def main():
+    if args.command == 'recommend':
+        recommend_command(args)
+        return
+    if args.catalog:
+        load_catalog(args.catalog)
+    if args.ratings:
+        load_ratings(args.ratings)
+    from recommender_gui import MovieRecommenderGUI, tk
     root = tk.Tk()
-    app = MovieRecommenderGUI(root)
+    app = MovieRecommenderGUI(root, sorted(get_catalog().genres), recommend_movies_blended)
     root.mainloop()
 
 if __name__ == "__main__":
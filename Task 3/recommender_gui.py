@@ -0,0 +1,225 @@
+try:
+    import tkinter as tk
+    from tkinter import messagebox
+except ImportError:
+    raise ImportError("The tkinter library is required to run this script. It is included with most Python installations.")
+
+import queue
+import threading
+
+# How often the GUI looks for finished recommendations, and how long it
+# waits after a selection change before asking for new ones
+POLL_MS = 30
+DEBOUNCE_MS = 150
+
+class VirtualList(tk.Frame):
+    # A scrollable list of text rows that draws only the rows in view, so
+    # showing thousands of results costs no more than showing ten
+    def __init__(self, master, height=10, row_height=20, font=("Arial", 10), bg='#e3f2fd'):
+        super().__init__(master, bg=bg)
+        self.rows = []
+        self.row_height = row_height
+        self.font = font
+        self.offset = 0  # pixels scrolled past the top
+        self.canvas = tk.Canvas(self, height=height * row_height, bg=bg, highlightthickness=0)
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.canvas.bind('<Configure>', lambda event: self.redraw())
+        self.canvas.bind('<MouseWheel>', lambda event: self.yview('scroll', -1 if event.delta > 0 else 1, 'units'))
+        self.canvas.bind('<Button-4>', lambda event: self.yview('scroll', -1, 'units'))
+        self.canvas.bind('<Button-5>', lambda event: self.yview('scroll', 1, 'units'))
+
+    def set_rows(self, rows):
+        self.rows = rows
+        self.offset = 0
+        self.redraw()
+
+    def _view_height(self):
+        height = self.canvas.winfo_height()
+        return height if height > 1 else int(self.canvas['height'])
+
+    def yview(self, *args):
+        view, total = self._view_height(), len(self.rows) * self.row_height
+        if args[0] == 'moveto':
+            self.offset = float(args[1]) * total
+        elif args[0] == 'scroll':
+            step = self.row_height if args[2] == 'units' else view
+            self.offset += int(args[1]) * step
+        self.offset = int(max(0, min(self.offset, total - view)))
+        self.redraw()
+
+    def redraw(self):
+        self.canvas.delete('all')
+        view, total = self._view_height(), len(self.rows) * self.row_height
+        first = self.offset // self.row_height
+        last = min(len(self.rows), (self.offset + view) // self.row_height + 1)
+        for i in range(first, last):
+            y = i * self.row_height - self.offset + self.row_height // 2
+            self.canvas.create_text(6, y, text=self.rows[i], anchor='w', font=self.font)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + view) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+class MovieRecommenderGUI:
+    def __init__(self, master, genres=None, recommend=None):
+        # `genres` to pick from and the `recommend(genres, top_n=...)` to call;
+        # by default those of the movierecommender module
+        if genres is None or recommend is None:
+            import movierecommender
+            genres = movierecommender.all_genres if genres is None else genres
+            recommend = movierecommender.recommend_movies_blended if recommend is None else recommend
+        self.all_genres = list(genres)
+        self.recommend = recommend
+        self.master = master
+        master.title("Movie Recommendation System")
+        master.configure(bg='#f0f4f7')
+
+        self.label = tk.Label(master, text="Select your favorite genres:", bg='#f0f4f7', font=("Arial", 12, "bold"))
+        self.label.pack(pady=(10, 0))
+
+        # Filter-as-you-type picker: the list shows the genres matching the
+        # filter, and a selection survives the genre scrolling out of it
+        self.selected = set()
+        self.shown_genres = list(self.all_genres)
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add('write', lambda *args: self.refilter())
+        filter_frame = tk.Frame(master, bg='#f0f4f7')
+        filter_frame.pack(pady=5, padx=10, fill=tk.X)
+        tk.Label(filter_frame, text="Filter:", bg='#f0f4f7', font=("Arial", 10)).pack(side=tk.LEFT)
+        self.filter_entry = tk.Entry(filter_frame, textvariable=self.filter_var, font=("Arial", 10))
+        self.filter_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
+
+        list_frame = tk.Frame(master, bg='#f0f4f7')
+        list_frame.pack(padx=10, fill=tk.X)
+        self.genre_list = tk.Listbox(list_frame, selectmode=tk.MULTIPLE, exportselection=False, height=8,
+                                     font=("Arial", 10), activestyle='none')
+        genre_scroll = tk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.genre_list.yview)
+        self.genre_list.config(yscrollcommand=genre_scroll.set)
+        genre_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.genre_list.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.genre_list.bind('<<ListboxSelect>>', self.on_select)
+
+        self.selected_label = tk.Label(master, text="Selected: none", bg='#f0f4f7', font=("Arial", 10),
+                                       wraplength=400, justify=tk.LEFT)
+        self.selected_label.pack(padx=10, anchor='w')
+
+        controls = tk.Frame(master, bg='#f0f4f7')
+        controls.pack(pady=10)
+        tk.Label(controls, text="How many:", bg='#f0f4f7', font=("Arial", 10)).pack(side=tk.LEFT)
+        self.top_n_var = tk.StringVar(value='5')
+        tk.Spinbox(controls, from_=1, to=1000, width=5, textvariable=self.top_n_var,
+                   font=("Arial", 10)).pack(side=tk.LEFT, padx=(5, 15))
+        self.recommend_button = tk.Button(
+            controls,
+            text="Get Recommendations",
+            command=self.show_recommendations,
+            bg='#1976d2', fg='white',
+            activebackground='#1565c0', activeforeground='white',
+            font=("Arial", 12, "bold"),
+            relief=tk.RAISED, bd=3
+        )
+        self.recommend_button.pack(side=tk.LEFT)
+
+        self.status_label = tk.Label(master, text="", bg='#f0f4f7', font=("Arial", 10, "bold"))
+        self.status_label.pack(padx=10, anchor='w')
+        self.result_list = VirtualList(master, height=10)
+        self.result_list.pack(padx=10, pady=(0, 10), fill=tk.BOTH, expand=True)
+
+        # Scoring runs on a worker thread. Every request gets the next
+        # generation number; the worker skips requests already superseded
+        # and the GUI drops answers to anything but the latest one
+        self.generation = 0
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.pending = None
+        threading.Thread(target=self.worker, daemon=True).start()
+        self.refilter()
+        master.after(POLL_MS, self.poll_results)
+
+    def refilter(self):
+        text = self.filter_var.get().strip().lower()
+        self.shown_genres = [genre for genre in self.all_genres if text in genre]
+        self.genre_list.delete(0, tk.END)
+        for i, genre in enumerate(self.shown_genres):
+            self.genre_list.insert(tk.END, genre.title())
+            if genre in self.selected:
+                self.genre_list.selection_set(i)
+
+    def on_select(self, event=None):
+        chosen = set(self.genre_list.curselection())
+        for i, genre in enumerate(self.shown_genres):
+            if i in chosen:
+                self.selected.add(genre)
+            else:
+                self.selected.discard(genre)
+        names = ', '.join(g.title() for g in sorted(self.selected))
+        self.selected_label.config(text=f"Selected: {names or 'none'}")
+        # Recommend as the selection changes, once it settles
+        if self.pending is not None:
+            self.master.after_cancel(self.pending)
+            self.pending = None
+        if self.selected:
+            self.pending = self.master.after(DEBOUNCE_MS, self.request_recommendations)
+        else:
+            # Nothing left to recommend for: drop any answer still on its way
+            # along with the one on screen
+            self.generation += 1
+            self.status_label.config(text="")
+            self.result_list.set_rows([])
+
+    def top_n(self):
+        try:
+            return max(1, int(self.top_n_var.get()))
+        except ValueError:
+            return 5
+
+    def show_recommendations(self):
+        if not self.selected:
+            messagebox.showwarning("No Genres Selected", "Please select at least one genre.")
+            return
+        self.request_recommendations()
+
+    def request_recommendations(self):
+        self.pending = None
+        self.generation += 1
+        self.requests.put((self.generation, sorted(self.selected), self.top_n()))
+        self.status_label.config(text="Finding recommendations...")
+
+    def worker(self):
+        while True:
+            request = self.requests.get()
+            while not self.requests.empty():
+                request = self.requests.get()  # only the latest selection matters
+            generation, genres, top_n = request
+            try:
+                self.results.put((generation, self.recommend(genres, top_n=top_n), None))
+            except Exception as e:
+                self.results.put((generation, None, e))
+
+    def poll_results(self):
+        try:
+            while True:
+                generation, recommendations, error = self.results.get_nowait()
+                if generation == self.generation:
+                    self.display(recommendations, error)
+        except queue.Empty:
+            pass
+        self.master.after(POLL_MS, self.poll_results)
+
+    def display(self, recommendations, error):
+        if error is not None:
+            self.status_label.config(text="")
+            messagebox.showerror("Recommendation Failed", str(error))
+            return
+        if not recommendations:
+            self.status_label.config(text="No recommendations found for your genres.")
+            self.result_list.set_rows([])
+            return
+        self.status_label.config(text=f"Top {len(recommendations)} movie recommendations for you:")
+        rows = []
+        for title, genres, score in recommendations:
+            genre_str = ', '.join([g.title() for g in genres])
+            rows.append(f"- {title} (Genres: {genre_str})")
+        self.result_list.set_rows(rows)
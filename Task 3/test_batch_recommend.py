@@ -0,0 +1,70 @@
+"""Batch scoring against one recommend() call per profile."""
+import json
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from batch_recommend import rank_block, recommend_block, recommend_stream
+from benchmark_recommender import make_catalog, make_queries
+from genre_engine import GenreCatalog
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    titles, genres, movie_genres, offsets = make_catalog(6000, 30, seed=11, skew=1.2)
+    return GenreCatalog.from_arrays(titles, genres, movie_genres, offsets, cache_size=0)
+
+
+@pytest.mark.parametrize('top_n, matrix_entries', [(1, 1 << 22), (5, 1 << 22), (5, 4096), (40, 50000)])
+def test_rank_block_matches_recommend(catalog, top_n, matrix_entries):
+    # A small matrix budget walks the catalog in many movie blocks
+    queries = make_queries(catalog.genres, 300, seed=top_n, max_genres=5)
+    queries += [[], ['no such genre'], [catalog.genres[0], 'no such genre'], queries[0]]
+    ranked = rank_block(catalog, [catalog.query_ids(q) for q in queries], top_n, matrix_entries)
+    assert len(ranked) == len(queries)
+    for preferred, (ids, scores) in zip(queries, ranked):
+        rows = [[catalog.titles[i], catalog.genres_of(i), int(s)] for i, s in zip(ids, scores)]
+        assert rows == catalog.recommend(preferred, top_n), preferred
+
+
+def test_rank_block_edge_cases(catalog):
+    assert rank_block(catalog, [], 5) == []
+    (ids, scores), = rank_block(catalog, [catalog.query_ids(catalog.genres[:2])], 0)
+    assert len(ids) == len(scores) == 0
+
+
+def profile_lines(catalog):
+    queries = make_queries(catalog.genres, 120, seed=3)
+    lines = [json.dumps({'id': f"p{i}", 'genres': q}) for i, q in enumerate(queries)]
+    lines[5] = ','.join(queries[5])          # plain-text line
+    lines[9] = '{"id": "broken", "genres": "drama"}'
+    lines[13] = '{"id": '
+    lines.insert(20, '   ')                  # blank lines produce no output
+    return queries, lines
+
+
+def check_output(catalog, queries, lines, output):
+    records = [json.loads(line) for line in output]
+    assert [r['line'] for r in records] == [n for n, line in enumerate(lines, 1) if line.strip()]
+    for record in records:
+        number = record['line']
+        index = number - 1 if number < 21 else number - 2
+        if index in (9, 13):
+            assert 'error' in record
+            continue
+        assert record['id'] == (number if index == 5 else f"p{index}")
+        assert record['recommendations'] == catalog.recommend(queries[index], 5)
+
+
+def test_recommend_block(catalog):
+    queries, lines = profile_lines(catalog)
+    block = [(n, line.strip()) for n, line in enumerate(lines, 1) if line.strip()]
+    check_output(catalog, queries, lines, recommend_block(catalog, block, 5))
+
+
+@pytest.mark.parametrize('workers, block_size', [(1, 7), (2, 7), (3, 50)])
+def test_recommend_stream_keeps_input_order(catalog, workers, block_size):
+    queries, lines = profile_lines(catalog)
+    output = list(recommend_stream(iter(lines), catalog, 5, workers, block_size))
+    check_output(catalog, queries, lines, output)
@@ -0,0 +1,67 @@
+"""Smoke tests for the scaling benchmark: one tiny run, its JSON and --compare."""
+import json
+import sys
+
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+import benchmark_recommender
+from benchmark_recommender import COMPARED, RESULTS_VERSION, compare
+
+
+def run_main(monkeypatch, *argv):
+    monkeypatch.setattr(sys, 'argv', ['benchmark_recommender.py', '--sizes', '200,1e3', '--queries', '20',
+                                      '--check-queries', '5', *argv])
+    benchmark_recommender.main()
+
+
+def test_output_then_compare(monkeypatch, capsys, tmp_path):
+    first = tmp_path / 'first.json'
+    run_main(monkeypatch, '--no-isolate', '--output', str(first))
+    report = json.loads(first.read_text(encoding='utf-8'))
+    assert report['version'] == RESULTS_VERSION and report['config']['queries'] == 20
+    assert [r['titles'] for r in report['results']] == [200, 1000]
+    for result in report['results']:
+        assert set(COMPARED) <= set(result) and result['cache_bytes'] > 0
+        # Both sizes are small enough to be checked against the original ranking
+        assert result['checked_queries'] == 5 + 3
+    capsys.readouterr()
+
+    # The second run goes through a fresh process per size
+    second = tmp_path / 'second.json'
+    run_main(monkeypatch, '--output', str(second), '--compare', str(first), '--tolerance', '1000')
+    assert [r['titles'] for r in json.loads(second.read_text(encoding='utf-8'))['results']] == [200, 1000]
+    err = capsys.readouterr().err
+    assert "no metric regressed by more than 100000%" in err and "different configuration" not in err
+
+
+def test_compare_flags_regressions_beyond_tolerance_and_noise():
+    old = {'results': [{'titles': 1000, 'build_s': 0.1, 'p50_ms': 1.0, 'p99_ms': 1.0},
+                       {'titles': 5000, 'build_s': 0.1}]}
+    new = {'results': [{'titles': 1000, 'build_s': 0.2, 'p50_ms': 1.1, 'p99_ms': 1.3},
+                       {'titles': 9000, 'build_s': 9.0}]}
+    regressions = compare(old, new, 0.2)
+    # p50 is within tolerance, p99's rise is within noise, 9000 titles were not run before
+    assert len(regressions) == 1 and 'build_s' in regressions[0] and '+100%' in regressions[0]
+    assert compare(old, new, 1.5) == []
+
+
+def test_compare_exits_on_a_regression(monkeypatch, capsys, tmp_path):
+    first = tmp_path / 'first.json'
+    run_main(monkeypatch, '--no-isolate', '--output', str(first))
+    report = json.loads(first.read_text(encoding='utf-8'))
+    # An impossibly fast earlier run, with another configuration, and no noise floor
+    for result in report['results']:
+        result['build_s'] = 1e-12
+    report['config']['seed'] = 1
+    first.write_text(json.dumps(report), encoding='utf-8')
+    monkeypatch.setitem(COMPARED, 'build_s', 0.0)
+    capsys.readouterr()
+    with pytest.raises(SystemExit) as exit_info:
+        run_main(monkeypatch, '--no-isolate', '--output', str(tmp_path / 'second.json'), '--compare', str(first))
+    assert exit_info.value.code == 1
+    err = capsys.readouterr().err
+    assert "different configuration" in err and "metrics regressed by more than 20%" in err
+    assert "200 titles          build_s  1e-12 -> " in err and "1000 titles          build_s  1e-12 -> " in err
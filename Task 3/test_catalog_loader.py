@@ -0,0 +1,137 @@
+"""Streaming catalog CSVs and their binary cache: round trips and invalidation."""
+import json
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+import catalog_loader
+from catalog_loader import load_catalog, load_catalog_cache, read_catalog_csv, save_catalog_cache
+from genre_engine import GenreCatalog
+
+ROWS = [
+    ("Toy Story (1995)", "Adventure|Animation|Children|Comedy|Fantasy"),
+    ("Amélie (2001)", "Comedy|Romance"),
+    ("Heat (1995)", "Action|Crime|Thriller"),
+    ("Untitled, \"Quoted\" (2020)", "(no genres listed)"),
+    ("Le Samouraï (1967)", "crime| drama "),
+]
+QUERIES = [['comedy'], ['Crime', 'drama'], ['action', 'romance', 'unknown'], []]
+
+
+def write_csv(path, rows=ROWS):
+    import pandas as pd
+    pd.DataFrame(rows, columns=['title', 'genres']).to_csv(path, index=False)
+    return str(path)
+
+
+def expected_catalog(rows=ROWS):
+    return GenreCatalog([title for title, _ in rows],
+                        [[] if genres == "(no genres listed)" else genres.split('|') for _, genres in rows])
+
+
+def assert_same_catalog(catalog, expected):
+    assert list(catalog.titles) == list(expected.titles)
+    assert catalog.genres == expected.genres
+    assert [catalog.genres_of(i) for i in range(len(catalog))] == [expected.genres_of(i) for i in range(len(expected))]
+    for query in QUERIES:
+        assert catalog.recommend(query) == expected.recommend(query)
+
+
+def test_csv_is_read_in_chunks(tmp_path):
+    path = write_csv(tmp_path / 'movies.csv')
+    for chunk_size in (1, 2, 100):
+        assert_same_catalog(read_catalog_csv(path, chunk_size=chunk_size), expected_catalog())
+
+
+def test_title_table_indexing(tmp_path):
+    titles = read_catalog_csv(write_csv(tmp_path / 'movies.csv')).titles
+    assert len(titles) == 5
+    assert titles[1] == "Amélie (2001)" and titles[-1] == "Le Samouraï (1967)"
+    assert titles[1:3] == ["Amélie (2001)", "Heat (1995)"]
+
+
+def test_cache_round_trip(tmp_path):
+    path = write_csv(tmp_path / 'movies.csv')
+    first = load_catalog(path)
+    assert os.path.exists(os.path.join(path + '.cache', 'meta.json'))
+    cached = load_catalog_cache(path + '.cache')
+    # The cache is mapped from disk, not read into memory
+    assert isinstance(cached.masks, np.memmap)
+    assert_same_catalog(cached, expected_catalog())
+    assert_same_catalog(load_catalog(path), first)
+
+
+def test_edited_csv_invalidates_the_cache(tmp_path):
+    path = write_csv(tmp_path / 'movies.csv')
+    load_catalog(path)
+    rows = ROWS + [("Alien (1979)", "Horror|Sci-Fi")]
+    write_csv(path, rows)
+    assert load_catalog_cache(path + '.cache', catalog_loader._source_key(path)) is None
+    assert_same_catalog(load_catalog(path), expected_catalog(rows))
+    assert_same_catalog(load_catalog_cache(path + '.cache', catalog_loader._source_key(path)), expected_catalog(rows))
+
+
+def write_meta(path, meta):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(meta if isinstance(meta, str) else json.dumps(meta))
+
+
+def test_damaged_caches_are_ignored(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    save_catalog_cache(expected_catalog(), cache_dir)
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+
+    write_meta(meta_path, dict(meta, version=meta['version'] - 1))
+    assert load_catalog_cache(cache_dir) is None
+    write_meta(meta_path, dict(meta, movies=4))
+    assert load_catalog_cache(cache_dir) is None
+    write_meta(meta_path, '{"version": ')
+    assert load_catalog_cache(cache_dir) is None
+
+    write_meta(meta_path, meta)
+    assert load_catalog_cache(cache_dir) is not None
+    os.remove(os.path.join(cache_dir, f"masks.{meta['generation']}.npy"))
+    assert load_catalog_cache(cache_dir) is None
+
+
+def test_a_save_never_mixes_with_the_one_before(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    save_catalog_cache(expected_catalog(), cache_dir)
+    with open(meta_path, encoding='utf-8') as f:
+        old_meta = f.read()
+    rows = ROWS[:2] + [("Alien (1979)", "Horror|Sci-Fi"), ("Heat (1995)", "Drama")] + ROWS[3:]
+    save_catalog_cache(expected_catalog(rows), cache_dir)
+    # Only the new save's arrays are left beside the new meta.json
+    with open(meta_path, encoding='utf-8') as f:
+        generation = json.load(f)['generation']
+    npy_files = [entry for entry in os.listdir(cache_dir) if entry.endswith('.npy')]
+    assert len(npy_files) == len(catalog_loader._ARRAYS)
+    assert all(entry.endswith(f".{generation}.npy") for entry in npy_files)
+    assert_same_catalog(load_catalog_cache(cache_dir), expected_catalog(rows))
+
+    # A reader still holding the old meta.json gets no cache rather than the new arrays
+    write_meta(meta_path, old_meta)
+    assert load_catalog_cache(cache_dir) is None
+
+
+def test_without_the_cache(tmp_path):
+    path = write_csv(tmp_path / 'movies.csv')
+    assert_same_catalog(load_catalog(path, use_cache=False), expected_catalog())
+    assert not os.path.exists(path + '.cache')
+
+
+def test_command_line(monkeypatch, capsys, tmp_path):
+    path = write_csv(tmp_path / 'movies.csv')
+    for argv in ([], ['--rebuild']):
+        monkeypatch.setattr(sys, 'argv', ['catalog_loader.py', path, '--chunk-size', '2', *argv])
+        catalog_loader.main()
+        out = capsys.readouterr().out
+        assert "5 movies, 10 genres" in out
+        assert "'Toy Story (1995)': adventure, animation, children, comedy, fantasy" in out
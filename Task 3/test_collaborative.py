@@ -0,0 +1,149 @@
+"""Item-item neighbours: incremental updates against a full rebuild."""
+import pytest
+
+np = pytest.importorskip('numpy')
+sparse = pytest.importorskip('scipy.sparse')
+
+from benchmark_recommender import make_catalog
+from collaborative import CollaborativeModel, top_k_rows
+from genre_engine import GenreCatalog
+
+MOVIES = 400
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    titles, genres, movie_genres, offsets = make_catalog(MOVIES, 12, seed=3)
+    return GenreCatalog.from_arrays(list(titles), genres, movie_genres, offsets)
+
+
+def random_ratings(rng, users, count, movies=MOVIES, prefix='u'):
+    """(users, movie indexes, ratings) with each user sticking to a few popular-ish movies"""
+    user_ids = [f"{prefix}{i}" for i in rng.integers(0, users, count)]
+    movie_ids = (rng.zipf(1.3, count) - 1) % movies
+    ratings = rng.integers(1, 6, count).astype(np.float32)
+    return user_ids, movie_ids.tolist(), ratings
+
+
+def neighbour_lists(model):
+    similar = model.similar
+    similar.sort_indices()
+    lists = {}
+    for row in range(similar.shape[0]):
+        start, stop = similar.indptr[row], similar.indptr[row + 1]
+        lists[row] = dict(zip(similar.indices[start:stop].tolist(), similar.data[start:stop].tolist()))
+    return lists
+
+
+def assert_same_neighbours(patched, rebuilt):
+    patched_lists, rebuilt_lists = neighbour_lists(patched), neighbour_lists(rebuilt)
+    for row, expected in rebuilt_lists.items():
+        got = patched_lists[row]
+        assert set(got) == set(expected), row
+        assert np.allclose([got[c] for c in expected], list(expected.values()), atol=1e-5), row
+
+
+def model_from(catalog, model):
+    """A model rebuilt from scratch on `model`'s ratings"""
+    rebuilt = CollaborativeModel(catalog, neighbours=model.neighbours)
+    rebuilt.ratings = model.ratings.copy()
+    rebuilt.user_ids = dict(model.user_ids)
+    rebuilt.rebuild()
+    return rebuilt
+
+
+def test_top_k_rows_matches_a_sort_per_row():
+    rng = np.random.default_rng(0)
+    dense = rng.integers(-2, 4, (30, 40)).astype(np.float32) / 2
+    exclude = rng.integers(0, 40, 30)
+    rows, columns, values = top_k_rows(sparse.csr_matrix(dense), 5, exclude=exclude)
+    for row in range(30):
+        candidates = [(-dense[row, c], c) for c in range(40) if dense[row, c] > 0 and c != exclude[row]]
+        expected = [c for _, c in sorted(candidates)[:5]]
+        assert columns[rows == row].tolist() == expected
+        assert values[rows == row].tolist() == [dense[row, c] for c in expected]
+
+
+def test_chunked_and_parallel_rebuilds_agree(catalog):
+    rng = np.random.default_rng(1)
+    ratings = random_ratings(rng, 150, 3000)
+    serial = CollaborativeModel(catalog, neighbours=10)
+    serial.add_ratings(*ratings)
+    # Chunks of a few movies each, spread over two processes
+    parallel = CollaborativeModel(catalog, neighbours=10, workers=2, chunk_entries=MOVIES * 16)
+    parallel.add_ratings(*ratings)
+    assert_same_neighbours(parallel, serial)
+    assert serial.similar.nnz > 0
+
+
+@pytest.mark.parametrize('seed', [2, 3, 4])
+def test_patched_neighbours_match_a_full_rebuild(catalog, seed):
+    rng = np.random.default_rng(seed)
+    base = random_ratings(rng, 150, 3000)
+    model = CollaborativeModel(catalog, neighbours=10)
+    model.add_ratings(*base)
+
+    # New users rating a few movies, and a rating replaced: few enough
+    # touched movies that add_ratings patches instead of rebuilding
+    update_users = ['new1', 'new1', 'new2', 'new2', 'new2', base[0][0]]
+    update_movies = [5, 17, 17, 42, 99, base[1][0]]
+    update_ratings = np.array([5, 1, 4, 2, 5, 1], dtype=np.float32)
+    touched = len(np.unique(model.ratings[model.user_ids[base[0][0]]].indices)) + 4
+    assert touched <= 0.1 * MOVIES
+    version = model.version
+    model.add_ratings(update_users, update_movies, update_ratings)
+    assert model.version == version + 1
+
+    rebuilt = CollaborativeModel(catalog, neighbours=10)
+    rebuilt.add_ratings(list(base[0]) + update_users, list(base[1]) + update_movies,
+                        np.concatenate([base[2], update_ratings]))
+    assert (model.ratings != rebuilt.ratings).nnz == 0
+    assert_same_neighbours(model, rebuilt)
+    assert np.allclose(model.prior, rebuilt.prior)
+
+
+@pytest.mark.parametrize('seed, neighbours', [(7, 3), (8, 8), (9, 14)])
+def test_repeated_patches_stay_exact(catalog, seed, neighbours):
+    # Existing and new users rating again, update after update, small
+    # chunks so the changed movies span several products
+    rng = np.random.default_rng(seed)
+    model = CollaborativeModel(catalog, neighbours=neighbours, chunk_entries=MOVIES * 4)
+    model.add_ratings(*random_ratings(rng, 120, 2500))
+    for step in range(6):
+        count = int(rng.integers(1, 6))
+        users = [f"u{i}" if rng.random() < 0.5 else f"new{step}-{i}" for i in rng.integers(0, 120, count)]
+        model.add_ratings(users, ((rng.zipf(1.3, count) - 1) % MOVIES).tolist(),
+                          rng.integers(1, 6, count).astype(np.float32))
+        assert_same_neighbours(model, model_from(catalog, model))
+
+
+def test_large_update_matches_a_rebuild(catalog):
+    rng = np.random.default_rng(5)
+    model = CollaborativeModel(catalog, neighbours=10)
+    model.add_ratings(*random_ratings(rng, 100, 1000))
+    extra = random_ratings(rng, 100, 2000, prefix='v')
+    model.add_ratings(*extra)
+    assert_same_neighbours(model, model_from(catalog, model))
+
+
+def test_unknown_movies_are_skipped(catalog):
+    model = CollaborativeModel(catalog)
+    model.add_ratings(['a', 'a', 'b'], [catalog.titles[0], 'No Such Movie', 1], [4, 5, 3])
+    assert model.skipped == 1 and model.ratings.nnz == 2
+
+
+def test_recommend_blends_genres_with_similarity(catalog):
+    rng = np.random.default_rng(6)
+    model = CollaborativeModel(catalog, neighbours=10)
+    model.add_ratings(*random_ratings(rng, 150, 3000))
+    genre = catalog.genres[0]
+
+    # Without ratings to go on, a zero weight is the plain genre ranking
+    genre_only = model.recommend([genre], top_n=10, cf_weight=0)
+    assert [row[0] for row in genre_only] == [row[0] for row in catalog.recommend([genre], 10)]
+
+    liked = [catalog.titles[0], catalog.titles[1]]
+    blended = model.recommend([genre], top_n=10, liked=liked, cf_weight=1)
+    assert blended and not {row[0] for row in blended} & set(liked)
+    scores = [row[2] for row in blended]
+    assert scores == sorted(scores, reverse=True) and scores[0] == 1.0
@@ -0,0 +1,121 @@
+"""GenreCatalog against the pandas recommend_movies it replaced."""
+import itertools
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+from benchmark_recommender import check_ranking, make_catalog, make_queries, synthetic_titles
+from genre_engine import GenreCatalog
+import movierecommender
+
+
+def synthetic_catalog(titles, vocabulary, seed, **kwargs):
+    titles, genres, movie_genres, offsets = make_catalog(titles, vocabulary, seed=seed, **kwargs)
+    return GenreCatalog.from_arrays(titles, genres, movie_genres, offsets, cache_size=0)
+
+
+def test_sample_data_every_genre_pair():
+    catalog = movierecommender.get_catalog()
+    genres = sorted(catalog.genres)
+    queries = [list(q) for size in (1, 2, 3) for q in itertools.combinations(genres, size)]
+    for top_n in (1, 5, 15):
+        check_ranking(catalog, queries, top_n)
+
+
+def test_sample_data_matches_recommend_movies():
+    queries = [['Drama'], [' comedy ', 'ANIMATION'], ['sci-fi', 'action', 'unknown'], ['western'], []]
+    for preferred in queries:
+        result = movierecommender.recommend_movies(preferred)
+        assert result == movierecommender.get_catalog().recommend(preferred)
+        check_ranking(movierecommender.get_catalog(), [preferred], 5)
+
+
+@pytest.mark.parametrize('vocabulary, distribution', [(20, 'poisson'), (70, 'uniform'), (130, 'fixed')])
+def test_synthetic_catalogs(vocabulary, distribution):
+    # Beyond 64 genres a movie's mask takes several words
+    catalog = synthetic_catalog(3000, vocabulary, seed=vocabulary, distribution=distribution, genres_per_title=3)
+    queries = make_queries(catalog.genres, 60, seed=vocabulary, max_genres=6)
+    for top_n in (1, 5, 50):
+        check_ranking(catalog, queries, top_n)
+
+
+def test_scores_count_each_preferred_genre_once():
+    catalog = GenreCatalog(['a', 'b', 'c', 'd'], [['Drama', 'drama', 'Crime'], [], ['Crime'], ['Comedy']])
+    assert catalog.scores(['drama', 'crime', 'DRAMA']).tolist() == [2, 0, 1, 0]
+    assert catalog.recommend(['drama', 'crime']) == [['a', ['drama', 'drama', 'crime'], 2], ['c', ['crime'], 1]]
+    assert catalog.recommend(['horror']) == []
+    assert catalog.recommend(['crime'], top_n=0) == []
+
+
+def test_top_keeps_catalog_order_within_a_score():
+    scores = np.array([1, 3, 0, 3, 2, 1, 3, 2], dtype=np.uint8)
+    catalog = GenreCatalog([], [])
+    assert catalog.top(scores, 4).tolist() == [1, 3, 6, 4]
+    assert catalog.top(scores, 10).tolist() == [1, 3, 6, 4, 7, 0, 5]
+    assert catalog.top(np.zeros(5, dtype=np.uint8), 3).tolist() == []
+
+
+def test_synthetic_titles_read_back():
+    titles = synthetic_titles(1001)
+    assert len(titles) == 1001
+    assert titles[0] == 'Movie 0000' and titles[1000] == 'Movie 1000'
+
+
+def scan_recommend(catalog, preferred, top_n):
+    """recommend() forced through the full bitmask scan"""
+    scores = catalog.scores(preferred)
+    ids = catalog.top(scores, top_n)
+    return [[catalog.titles[i], catalog.genres_of(i), int(scores[i])] for i in ids]
+
+
+def test_index_gives_the_scan_results():
+    catalog = synthetic_catalog(5000, 40, seed=7, skew=1.5)
+    queries = make_queries(catalog.genres, 200, seed=7, skew=0)
+    used_index = 0
+    for preferred in queries:
+        genre_ids = catalog.query_ids(preferred)
+        used_index += catalog._use_index(genre_ids)
+        for top_n in (1, 5, 40):
+            assert catalog.recommend(preferred, top_n) == scan_recommend(catalog, preferred, top_n)
+        ids, scores = catalog.matches(preferred)
+        candidate_ids, candidate_scores = catalog.candidates(genre_ids)
+        full = catalog.scores(preferred)
+        assert ids.tolist() == candidate_ids.tolist() == np.flatnonzero(full).tolist()
+        assert scores.tolist() == candidate_scores.tolist() == full[ids].tolist()
+    # Both paths were exercised
+    assert 0 < used_index < len(queries)
+
+
+def test_index_lists_each_movie_once_per_genre():
+    catalog = GenreCatalog(['a', 'b', 'c'], [['drama', 'Drama', 'crime'], ['crime'], []])
+    postings, posting_offsets = catalog.index()
+    crime, drama = catalog.genre_ids['crime'], catalog.genre_ids['drama']
+    assert postings[posting_offsets[crime]:posting_offsets[crime + 1]].tolist() == [0, 1]
+    assert postings[posting_offsets[drama]:posting_offsets[drama + 1]].tolist() == [0]
+
+
+def test_cache_serves_repeats_and_empties_when_movies_are_added():
+    catalog = GenreCatalog(['a', 'b'], [['drama'], ['comedy', 'drama']], cache_size=2)
+    first = catalog.recommend(['Drama', 'comedy'])
+    assert catalog.recommend(['comedy', 'drama ']) == first
+    assert catalog.results.stats()['hits'] == 1
+    # Unknown genres do not split the cache key
+    assert catalog.recommend(['comedy', 'drama', 'western']) == first
+    assert catalog.results.stats()['hits'] == 2
+
+    catalog.add_movies(['c'], [['Comedy', 'Drama', 'Western']])
+    assert catalog.recommend(['comedy', 'drama', 'western'])[0] == ['c', ['comedy', 'drama', 'western'], 3]
+    assert catalog.recommend(['drama'], 5) == scan_recommend(catalog, ['drama'], 5)
+    stats = catalog.results.stats()
+    assert stats['invalidations'] == 1 and stats['hits'] == 2
+
+    catalog.recommend(['comedy'])
+    assert len(catalog.results) == 2 and catalog.results.stats()['evictions'] == 1
+
+
+def test_cache_off():
+    catalog = GenreCatalog(['a'], [['drama']], cache_size=0)
+    assert catalog.recommend(['drama']) == catalog.recommend(['drama']) == [['a', ['drama'], 1]]
+    assert len(catalog.results) == 0 and catalog.results.stats()['hits'] == 0
@@ -0,0 +1,45 @@
+"""The movierecommender module: lazy loading and the headless recommend command."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEAVY = ('numpy', 'pandas', 'tkinter', 'genre_engine', 'recommender_gui')
+
+
+def run_python(code):
+    """Run `code` in a fresh interpreter, which has imported nothing yet"""
+    done = subprocess.run([sys.executable, '-c', code], cwd=HERE, capture_output=True, text=True, timeout=60)
+    assert done.returncode == 0, done.stderr
+    return json.loads(done.stdout)
+
+
+def test_import_loads_nothing_heavy():
+    loaded = run_python(
+        "import json, sys, movierecommender\n"
+        f"print(json.dumps([name for name in {HEAVY!r} if name in sys.modules] + "
+        "[movierecommender._catalog is not None, movierecommender._movies is not None]))")
+    assert loaded == [False, False]
+
+
+def test_catalog_is_built_on_first_use():
+    pytest.importorskip('numpy')
+    loaded = run_python(
+        "import json, sys, movierecommender\n"
+        "genres = movierecommender.all_genres\n"
+        "print(json.dumps([sys.modules.get('numpy') is not None, movierecommender._catalog is not None,"
+        " 'pandas' in sys.modules, 'tkinter' in sys.modules, len(genres)]))")
+    assert loaded == [True, True, False, False, 11]
+
+
+def test_recommend_command(capsys):
+    pytest.importorskip('numpy')
+    import movierecommender
+    movierecommender.main(['recommend', '--genres', 'Crime, drama', '--top', '3'])
+    out = json.loads(capsys.readouterr().out)
+    assert out['genres'] == ['Crime', 'drama'] and out['top'] == 3
+    assert [r['title'] for r in out['recommendations']] == ['The Godfather', 'Pulp Fiction', 'The Dark Knight']
+    assert all(r['score'] == 2 for r in out['recommendations'])
@@ -0,0 +1,167 @@
+"""The GUI's request generations and debounce, driven without a display."""
+import queue
+import threading
+
+import pytest
+
+pytest.importorskip('tkinter')
+
+import recommender_gui
+from recommender_gui import DEBOUNCE_MS, MovieRecommenderGUI
+
+GENRES = ['action', 'comedy', 'drama']
+
+
+class FakeMaster:
+    """Collects after() callbacks so a test decides when they run"""
+
+    def __init__(self):
+        self.callbacks = {}
+        self.next_id = 0
+
+    def after(self, ms, callback):
+        self.next_id += 1
+        self.callbacks[self.next_id] = (ms, callback)
+        return self.next_id
+
+    def after_cancel(self, callback_id):
+        del self.callbacks[callback_id]
+
+    def run(self, ms):
+        for callback_id, (delay, callback) in list(self.callbacks.items()):
+            if delay == ms:
+                del self.callbacks[callback_id]
+                callback()
+
+
+class FakeWidget:
+    def __init__(self, selection=()):
+        self.text = None
+        self.rows = None
+        self.selection = selection
+
+    def config(self, text):
+        self.text = text
+
+    def set_rows(self, rows):
+        self.rows = rows
+
+    def curselection(self):
+        return self.selection
+
+
+def make_gui(recommend):
+    gui = MovieRecommenderGUI.__new__(MovieRecommenderGUI)
+    gui.master = FakeMaster()
+    gui.all_genres = gui.shown_genres = list(GENRES)
+    gui.recommend = recommend
+    gui.selected = set()
+    gui.genre_list = FakeWidget()
+    gui.selected_label, gui.status_label, gui.result_list = FakeWidget(), FakeWidget(), FakeWidget()
+    gui.top_n_var = FakeWidget()
+    gui.top_n_var.get = lambda: '5'
+    gui.generation = 0
+    gui.requests = queue.Queue()
+    gui.results = queue.Queue()
+    gui.pending = None
+    return gui
+
+
+def select(gui, *genres):
+    gui.genre_list.selection = [GENRES.index(genre) for genre in genres]
+    gui.on_select()
+
+
+def answer(genres, top_n=5):
+    return [(f"{genre} movie", [genre], 1.0) for genre in genres][:top_n]
+
+
+def start_worker(gui):
+    threading.Thread(target=gui.worker, daemon=True).start()
+
+
+def wait_for_results(gui, count):
+    answers = [gui.results.get(timeout=5) for _ in range(count)]
+    for item in answers:
+        gui.results.put(item)
+
+
+def test_changes_within_the_debounce_make_one_request():
+    gui = make_gui(answer)
+    select(gui, 'action')
+    select(gui, 'action', 'drama')
+    assert len(gui.master.callbacks) == 1
+    gui.master.run(DEBOUNCE_MS)
+    assert gui.requests.get_nowait() == (1, ['action', 'drama'], 5)
+    assert gui.requests.empty() and gui.status_label.text == "Finding recommendations..."
+
+
+def test_worker_answers_only_the_latest_request():
+    calls = []
+    gui = make_gui(lambda genres, top_n: calls.append(genres) or answer(genres, top_n))
+    for genres in (['action'], ['comedy'], ['drama']):
+        gui.selected = set(genres)
+        gui.request_recommendations()
+    start_worker(gui)
+    wait_for_results(gui, 1)
+    assert calls == [['drama']]
+    gui.poll_results()
+    assert gui.result_list.rows == ["- drama movie (Genres: Drama)"]
+    assert gui.status_label.text == "Top 1 movie recommendations for you:"
+
+
+def blocked_answer(started, release):
+    def recommend(genres, top_n):
+        started.set()
+        release.wait(5)
+        return answer(genres, top_n)
+    return recommend
+
+
+def test_superseded_answers_are_dropped():
+    started, release = threading.Event(), threading.Event()
+    gui = make_gui(blocked_answer(started, release))
+    start_worker(gui)
+    select(gui, 'action')
+    gui.master.run(DEBOUNCE_MS)
+    assert started.wait(5)
+    select(gui, 'comedy')
+    gui.master.run(DEBOUNCE_MS)
+    release.set()
+    wait_for_results(gui, 2)
+    gui.poll_results()
+    assert gui.result_list.rows == ["- comedy movie (Genres: Comedy)"]
+
+
+def test_clearing_the_selection_clears_the_results():
+    started, release = threading.Event(), threading.Event()
+    gui = make_gui(blocked_answer(started, release))
+    gui.result_list.rows, gui.status_label.text = ["- old"], "Top 1 movie recommendations for you:"
+    start_worker(gui)
+    select(gui, 'action')
+    gui.master.run(DEBOUNCE_MS)
+    select(gui)
+    assert gui.selected_label.text == "Selected: none"
+    assert gui.result_list.rows == [] and gui.status_label.text == ""
+    # The answer to the request made before still arrives, and is ignored
+    release.set()
+    wait_for_results(gui, 1)
+    gui.poll_results()
+    assert gui.result_list.rows == [] and gui.status_label.text == ""
+    assert not [ms for ms, _ in gui.master.callbacks.values() if ms == DEBOUNCE_MS]
+
+
+def test_errors_are_reported(monkeypatch):
+    shown = []
+    monkeypatch.setattr(recommender_gui.messagebox, 'showerror', lambda title, message: shown.append(message))
+
+    def fail(genres, top_n):
+        raise ValueError("catalog unavailable")
+
+    gui = make_gui(fail)
+    start_worker(gui)
+    select(gui, 'drama')
+    gui.master.run(DEBOUNCE_MS)
+    wait_for_results(gui, 1)
+    gui.poll_results()
+    assert shown == ["catalog unavailable"] and gui.status_label.text == ""